@@ -2,11 +2,15 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from flask_caching import Cache
 from config import Config
+from app.replica import ReplicaSession
 
-db = SQLAlchemy()
+# ReplicaSession manda as leituras das views de relatório para a réplica, quando houver (app/replica.py)
+db = SQLAlchemy(session_options={'class_': ReplicaSession})
 migrate = Migrate()
 login_manager = LoginManager()
+cache = Cache()
 login_manager.login_view = 'main.login'
 login_manager.login_message = 'Por favor, faça o login para acessar esta página.'
 login_manager.login_message_category = 'info'
@@ -19,10 +23,28 @@ def create_app(config_class=Config):
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    cache.init_app(app)
+
+    from app import database, query_budget, instrumentation, replica
+    database.init_app(app)
+    replica.init_app(app)
+    query_budget.init_app(app)
+    instrumentation.init_app(app)
+
+    from app import caching, changes, audit, sla, clients, rendering
+    caching.init_app(app)
+    changes.init_app(app)
+    audit.init_app(app)
+    sla.init_app(app)
+    clients.init_app(app)
+    rendering.init_app(app)
 
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp)
+
     return app
 
 from app import models
\ No newline at end of file
@@ -0,0 +1,195 @@
+from datetime import date
+from functools import wraps
+
+from flask import Blueprint, Response, current_app, jsonify, make_response, request
+from flask_login import current_user
+
+from werkzeug.datastructures import MultiDict
+
+from app import changes, stats, caching, events, trends, bulk, clients
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+CHANGES_PER_PAGE = 200
+CHANGES_MAX_PER_PAGE = 1000
+
+
+def supervisor_required(view):
+    """Como o login_required, mas responde JSON (401/403) em vez de redirecionar."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='Autenticação necessária.'), 401
+        if not current_user.is_supervisor:
+            return jsonify(error='Acesso negado.'), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def api_login_required(view):
+    """Como o login_required, mas responde JSON 401 em vez de redirecionar."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='Autenticação necessária.'), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _not_modified(etag):
+    """Retorna uma resposta 304 se o cliente já tem a versão `etag`, senão None."""
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def _search_date():
+    return request.args.get('search_date', type=date.fromisoformat) or date.today()
+
+
+def _serialize(interaction):
+    return {
+        'id': interaction.id,
+        'user_id': interaction.user_id,
+        'client_name': interaction.client_name,
+        'client_phone': interaction.client_phone,
+        'channel': interaction.channel,
+        'category': interaction.category,
+        'status': interaction.status,
+        'had_anydesk_session': bool(interaction.had_anydesk_session),
+        'start_time': interaction.start_time.isoformat(),
+        'end_time': interaction.end_time.isoformat() if interaction.end_time else None,
+    }
+
+
+@bp.route('/dashboard/stats')
+@supervisor_required
+def dashboard_stats():
+    """Estatísticas por status do dia, com ETag baseado no contador de alterações do dia."""
+    search_date_obj = _search_date()
+
+    # A versão sai do log de alterações; se nada mudou, nem olhamos os agregados
+    etag = f'{search_date_obj.isoformat()}-{changes.day_version(search_date_obj)}'
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    day_stats = caching.get_or_compute(
+        'admin_dashboard', lambda: stats.status_counts(day=search_date_obj), day=search_date_obj
+    )
+
+    response = jsonify(
+        date=search_date_obj.isoformat(),
+        stats=day_stats,
+        total=sum(day_stats.values()),
+        chart={'labels': list(day_stats.keys()), 'values': list(day_stats.values())},
+    )
+    response.set_etag(etag)
+    return response
+
+
+@bp.route('/reports/trends')
+@supervisor_required
+def report_trends():
+    """Séries por período (start_date, end_date e granularity: hour, day, week ou month)."""
+    try:
+        start, end, granularity = trends.range_from_args(request.args)
+        return jsonify(trends.trend_series(start, end, granularity))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+
+@bp.route('/interactions')
+@supervisor_required
+def interactions():
+    """Alterações de atendimentos desde o cursor `since` (id do log), opcionalmente de um único dia."""
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = request.args.get('limit', CHANGES_PER_PAGE, type=int)
+    limit = min(max(limit, 1), CHANGES_MAX_PER_PAGE)
+    day = request.args.get('search_date', type=date.fromisoformat)
+
+    latest = changes.day_version(day) if day else changes.latest_change_id()
+    etag = f'changes-{day.isoformat() if day else "all"}-{since}-{latest}-{limit}'
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    rows = changes.changes_since(since, limit, day=day) if latest > since else []
+
+    response = jsonify(
+        cursor=rows[-1][0].id if rows else since,
+        has_more=len(rows) == limit,
+        changes=[{
+            'change_id': change.id,
+            'action': change.action,
+            'interaction_id': change.interaction_id,
+            'day': change.day.isoformat(),
+            'interaction': _serialize(interaction) if interaction and change.action not in ('deleted', 'archived') else None,
+        } for change, interaction in rows],
+    )
+    response.set_etag(etag)
+    return response
+
+
+@bp.route('/interactions/bulk', methods=['POST'])
+@supervisor_required
+def bulk_interactions():
+    """Ação em massa: {"action": "status"|"reassign"|"delete", "ids": [...] ou "filters": {...},
+    "status": ..., "user_id": ...}. Responde com as contagens de bulk.apply."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error='Corpo JSON inválido.'), 400
+    ids = payload.get('ids')
+    # bool é subclasse de int no Python, mas true/false não são ids
+    if ids is not None and not (isinstance(ids, list)
+                                and all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        return jsonify(error='"ids" deve ser uma lista de números inteiros.'), 400
+    filters = payload.get('filters')
+    try:
+        result = bulk.apply(payload.get('action'), current_user.id, ids=ids,
+                            filters=MultiDict({key: str(value) for key, value in filters.items()})
+                            if isinstance(filters, dict) else None,
+                            status=payload.get('status'), user_id=payload.get('user_id'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result)
+
+
+@bp.route('/clients/suggest')
+@api_login_required
+def suggest_clients():
+    """Autocompletar do nome do cliente: prefixo do nome ou do telefone, sem consultar o banco."""
+    limit = min(request.args.get('limit', clients.SUGGEST_LIMIT, type=int), clients.SUGGEST_MAX_LIMIT)
+    return jsonify(clients=clients.suggest(request.args.get('q', ''), max(limit, 1)))
+
+
+@bp.route('/events')
+@supervisor_required
+def events_stream():
+    """Server-Sent Events com atendimentos criados, alterados e excluídos.
+
+    Acima do limite de assinantes responde 503; o painel então passa a consultar
+    /api/dashboard/stats periodicamente (com ETag).
+    """
+    app = current_app._get_current_object()
+
+    # Assina antes de ler o replay para não perder eventos publicados entre as duas etapas
+    subscriber = events.hub.subscribe(app)
+    if subscriber is None:
+        response = jsonify(error='Limite de conexões de eventos atingido; use /api/dashboard/stats.')
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('last_event_id', type=int)
+    replay = events.replay(last_event_id) if last_event_id is not None else []
+
+    response = Response(events.stream(app, subscriber, replay), mimetype='text/event-stream')
+    # Garante a remoção do assinante mesmo se o gerador nunca chegar a ser iniciado
+    response.call_on_close(lambda: events.hub.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
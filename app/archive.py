@@ -0,0 +1,114 @@
+from collections import namedtuple
+from datetime import datetime, time
+
+from sqlalchemy import delete, func, insert, select
+
+from app import db, audit, caching, changes
+from app.stats import RESOLVED_STATUS
+from app.models import User, Interaction, InteractionHistory, InteractionStatusTime, ArchivedInteraction
+
+# Colunas copiadas da tabela de atendimentos para o arquivo
+COPIED_COLUMNS = ('id', 'user_id', 'client_id', 'client_name', 'client_phone', 'channel', 'had_anydesk_session',
+                  'category', 'description', 'status', 'start_time', 'end_time', 'status_since')
+
+# Mesmos atributos de InteractionHistory usados em view_interaction.html
+HistoryEntry = namedtuple('HistoryEntry', 'timestamp user field_changed old_value new_value')
+
+
+def _history(ids):
+    history = {}
+    rows = db.session.execute(
+        select(InteractionHistory.interaction_id, InteractionHistory.timestamp, InteractionHistory.user_id,
+               InteractionHistory.field_changed, InteractionHistory.old_value, InteractionHistory.new_value)
+        .where(InteractionHistory.interaction_id.in_(ids))
+        .order_by(InteractionHistory.interaction_id, InteractionHistory.timestamp, InteractionHistory.id)
+    )
+    for interaction_id, timestamp, user_id, field_changed, old_value, new_value in rows:
+        history.setdefault(interaction_id, []).append(
+            [timestamp.isoformat() if timestamp else None, user_id, field_changed, old_value, new_value]
+        )
+    return history
+
+
+def _status_times(ids):
+    times = {}
+    rows = db.session.execute(
+        select(InteractionStatusTime.interaction_id, InteractionStatusTime.status, InteractionStatusTime.seconds)
+        .where(InteractionStatusTime.interaction_id.in_(ids))
+    )
+    for interaction_id, status, seconds in rows:
+        times.setdefault(interaction_id, {})[status] = seconds
+    return times
+
+
+def archive_before(before, batch_size=1000, progress=None):
+    """Move para o arquivo os atendimentos resolvidos abertos antes da data `before`.
+
+    Cada lote de `batch_size` é uma transação: copia os atendimentos, com o
+    histórico e os tempos por status embutidos, para archived_interactions e
+    apaga as linhas originais. Os agregados diários e o histograma de SLA não
+    mudam (os relatórios continuam contando os arquivados); a busca textual
+    deixa de encontrá-los. Cada atendimento arquivado entra no log de alterações
+    como 'archived', o que avança a versão do dia (snapshots do painel, ETags da
+    API e eventos SSE), e os dias saem do cache no commit do lote. Retorna
+    quantos atendimentos foram arquivados.
+    """
+    audit.flush() # O histórico ainda na fila precisa estar gravado para ser copiado
+    cutoff = datetime.combine(before, time.min)
+    # O maior id fica na tabela quente: sem AUTOINCREMENT, o SQLite reaproveitaria esse id no próximo atendimento
+    newest_id = db.session.scalar(select(func.max(Interaction.id))) or 0
+    columns = [getattr(Interaction, name) for name in COPIED_COLUMNS]
+
+    archived, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .where(Interaction.status == RESOLVED_STATUS, Interaction.start_time < cutoff,
+                   Interaction.id > last_id, Interaction.id < newest_id)
+            .order_by(Interaction.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        ids = [row.id for row in rows]
+        history, times = _history(ids), _status_times(ids)
+
+        # As listagens da tabela quente (API, SSE, painel) precisam saber que estas linhas saíram
+        changes.log_bulk(Interaction.query.filter(Interaction.id.in_(ids)), 'archived')
+        caching.invalidate_on_commit({row.start_time.date() for row in rows})
+        db.session.execute(insert(ArchivedInteraction), [
+            dict(row._mapping, history=history.get(row.id, []), status_times=times.get(row.id, {}))
+            for row in rows
+        ])
+        db.session.execute(delete(InteractionStatusTime).where(InteractionStatusTime.interaction_id.in_(ids)))
+        db.session.execute(delete(InteractionHistory).where(InteractionHistory.interaction_id.in_(ids)))
+        db.session.execute(
+            delete(Interaction).where(Interaction.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        archived += len(rows)
+        if progress:
+            progress(archived)
+    return archived
+
+
+def get(interaction_id):
+    """O atendimento arquivado com este id, ou None."""
+    return db.session.get(ArchivedInteraction, interaction_id)
+
+
+def history_entries(archived):
+    """O histórico embutido de um atendimento arquivado, com os autores carregados numa única query."""
+    user_ids = {entry[1] for entry in archived.history if entry[1] is not None}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    return [
+        HistoryEntry(datetime.fromisoformat(timestamp) if timestamp else None, users.get(user_id),
+                     field_changed, old_value, new_value)
+        for timestamp, user_id, field_changed, old_value, new_value in archived.history
+    ]
+
+
+def forget_user(user_id):
+    """Apaga os atendimentos arquivados de um atendente que será excluído."""
+    db.session.execute(delete(ArchivedInteraction).where(ArchivedInteraction.user_id == user_id))
@@ -0,0 +1,202 @@
+import atexit
+import queue
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, insert
+
+from app import db
+from app.models import InteractionHistory
+
+
+class AuditWriter:
+    """Fila em memória que grava o histórico de atendimentos em lotes (write-behind).
+
+    Os registros só entram na fila depois do commit da requisição (um rollback os
+    descarta) e uma thread os grava num único INSERT de várias linhas a cada
+    AUDIT_FLUSH_INTERVAL_MS ou AUDIT_BATCH_SIZE registros, o que vier primeiro.
+    Com a fila cheia, o registro é gravado na hora, numa transação própria, e a
+    fila é esvaziada no encerramento do processo (atexit).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config['AUDIT_FLUSH_INTERVAL_MS'] / 1000
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.queue = queue.Queue(maxsize=app.config['AUDIT_QUEUE_SIZE'])
+        self.counters = Counter()
+        self.flush_times = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._worker = None
+
+    def enqueue(self, rows):
+        self._ensure_worker()
+        overflow = []
+        for row in rows:
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                overflow.append(row)
+        with self._lock:
+            self.counters['queued'] += len(rows) - len(overflow)
+            self.counters['overflow_sync'] += len(overflow)
+        if overflow:
+            self._write(overflow)
+
+    def flush(self):
+        """Grava tudo o que está na fila e espera o lote que a thread estiver gravando."""
+        while self._write_batch(self._drain(block=False)):
+            pass
+        self.queue.join()
+
+    def stop(self):
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+        self.flush()
+
+    def metrics(self):
+        with self._lock:
+            times = list(self.flush_times)
+            data = dict(self.counters)
+        data.update(
+            enabled=True,
+            queue_depth=self.queue.qsize(),
+            queue_size=self.queue.maxsize,
+            last_flush_ms=round(times[-1], 2) if times else None,
+            avg_flush_ms=round(sum(times) / len(times), 2) if times else None,
+            max_flush_ms=round(max(times), 2) if times else None,
+        )
+        return data
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                    self._worker.start()
+
+    def _drain(self, block):
+        """Retira até batch_size registros; com block=True espera o primeiro e até `interval` pelos demais."""
+        rows = []
+        deadline = None
+        while len(rows) < self.batch_size:
+            try:
+                if block and not rows:
+                    rows.append(self.queue.get(timeout=self.interval))
+                    deadline = time.monotonic() + self.interval
+                elif block:
+                    rows.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                else:
+                    rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stopping.is_set():
+            rows = self._drain(block=True)
+            if rows:
+                self._write_batch(rows)
+
+    def _write_batch(self, rows):
+        if not rows:
+            return False
+        try:
+            self._write(rows)
+        finally:
+            for _ in rows:
+                self.queue.task_done()
+        return True
+
+    def _write(self, rows, attempts=3):
+        started = time.perf_counter()
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.app.app_context():
+                    db.session.execute(insert(InteractionHistory), rows)
+                    db.session.commit()
+                break
+            except Exception:
+                with self._lock:
+                    self.counters['errors'] += 1
+                if attempt == attempts:
+                    self.app.logger.exception('Falha ao gravar %d registros de histórico.', len(rows))
+                    with self._lock:
+                        self.counters['lost'] += len(rows)
+                    return
+                time.sleep(0.1 * attempt)
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.counters['flushed'] += len(rows)
+            self.counters['batches'] += 1
+            self.flush_times.append(elapsed)
+
+
+def _writer():
+    return current_app.extensions.get('audit_writer')
+
+
+def record(interaction, user_id, field_changed, old_value, new_value, timestamp=None):
+    """Registra uma alteração no histórico do atendimento.
+
+    Sem o write-behind (AUDIT_WRITE_BEHIND desligado) é um InteractionHistory
+    comum na sessão da requisição; com ele, a linha vai para a fila no commit.
+    `timestamp` (padrão: agora) permite gravar o mesmo instante usado em app/sla.py.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    if _writer() is None:
+        db.session.add(InteractionHistory(interaction=interaction, user_id=user_id, timestamp=timestamp,
+                                          field_changed=field_changed, old_value=old_value, new_value=new_value))
+        return
+
+    if interaction.id is None:
+        db.session.flush()
+    db.session.info.setdefault('audit_pending', []).append(dict(
+        interaction_id=interaction.id,
+        user_id=user_id,
+        timestamp=timestamp,
+        field_changed=field_changed,
+        old_value=old_value,
+        new_value=new_value,
+    ))
+
+
+def flush():
+    """Grava o que estiver na fila. Chamado antes de excluir atendimentos, para não deixar histórico órfão."""
+    writer = _writer()
+    if writer is not None:
+        writer.flush()
+
+
+def metrics():
+    writer = _writer()
+    return writer.metrics() if writer is not None else {'enabled': False}
+
+
+def _enqueue_committed(session):
+    rows = session.info.pop('audit_pending', None)
+    if rows:
+        _writer().enqueue(rows)
+
+
+def _discard_pending(session):
+    session.info.pop('audit_pending', None)
+
+
+def init_app(app):
+    """Liga o write-behind do histórico quando AUDIT_WRITE_BEHIND está ativo."""
+    if not app.config['AUDIT_WRITE_BEHIND']:
+        return
+
+    writer = AuditWriter(app)
+    app.extensions['audit_writer'] = writer
+    atexit.register(writer.stop)
+
+    if not event.contains(db.session, 'after_commit', _enqueue_committed):
+        event.listen(db.session, 'after_commit', _enqueue_committed)
+        event.listen(db.session, 'after_rollback', _discard_pending)
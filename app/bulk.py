@@ -0,0 +1,162 @@
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, insert, literal, select, update
+from werkzeug.datastructures import MultiDict
+
+from app import db, stats, sla, changes, caching, audit, deletion
+from app.deletion import ROW_COLUMNS
+from app.filters import filtered_interactions_query, FILTER_KEYS
+from app.forms import STATUS_CHOICES
+from app.models import User, Interaction, InteractionHistory
+
+ACTIONS = ('status', 'reassign', 'delete')
+
+
+def _target_rows(ids, filters):
+    """Lê (com lock, onde o banco suporta) os atendimentos selecionados por id ou pelos filtros."""
+    limit = current_app.config['BULK_MAX_ROWS']
+    if ids is not None:
+        # Uma string seria percorrida caractere a caractere ("123" viraria os ids 1, 2 e 3)
+        if isinstance(ids, (str, bytes)):
+            raise ValueError('Lista de atendimentos inválida.')
+        try:
+            ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            raise ValueError('Lista de atendimentos inválida.')
+        if not ids:
+            raise ValueError('Nenhum atendimento selecionado.')
+        if len(ids) > limit:
+            raise ValueError(f'Seleção grande demais ({len(ids)} atendimentos; máximo de {limit}).')
+        rows = []
+        for start in range(0, len(ids), sla.BATCH_SIZE):
+            rows += db.session.execute(
+                select(*ROW_COLUMNS).where(Interaction.id.in_(ids[start:start + sla.BATCH_SIZE]))
+                .order_by(Interaction.id).with_for_update()
+            ).all()
+        return rows
+
+    if not any(filters.get(key) for key in FILTER_KEYS):
+        raise ValueError('Informe ao menos um filtro para aplicar a todos os resultados.')
+    query = filtered_interactions_query(filters).with_entities(*ROW_COLUMNS).order_by(Interaction.id)
+    rows = db.session.execute(query.limit(limit + 1).with_for_update().statement).all()
+    if len(rows) > limit:
+        raise ValueError(f'Os filtros selecionam mais de {limit} atendimentos; refine a busca.')
+    return rows
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), sla.BATCH_SIZE):
+        yield ids[start:start + sla.BATCH_SIZE]
+
+
+def _stats_key(row, **changes):
+    values = dict(day=row.start_time.date(), user_id=row.user_id, status=row.status, category=row.category,
+                  channel=row.channel, had_anydesk_session=bool(row.had_anydesk_session))
+    values.update(changes)
+    return tuple(values[field] for field in stats.KEY_FIELDS)
+
+
+def _log_history(ids, actor_id, when, field_changed, old_value, new_value):
+    """Histórico de todos os atendimentos do lote com um único INSERT ... SELECT."""
+    source = select(Interaction.id, literal(actor_id), literal(when), literal(field_changed),
+                    old_value, literal(new_value)).where(Interaction.id.in_(ids))
+    if old_value is User.username:
+        source = source.join(User, User.id == Interaction.user_id)
+    db.session.execute(insert(InteractionHistory).from_select(
+        ['interaction_id', 'user_id', 'timestamp', 'field_changed', 'old_value', 'new_value'], source
+    ))
+
+
+def _change_status(rows, new_status, actor_id, when):
+    rows = [row for row in rows if row.status != new_status]
+    deltas = {}
+    for row in rows:
+        old_key, new_key = _stats_key(row), _stats_key(row, status=new_status)
+        deltas[old_key] = deltas.get(old_key, 0) - 1
+        deltas[new_key] = deltas.get(new_key, 0) + 1
+    stats.record_bulk(deltas)
+    sla.bulk_status_change(rows, new_status, when)
+
+    ids = [row.id for row in rows]
+    for chunk in _chunks(ids):
+        _log_history(chunk, actor_id, when, 'Status', Interaction.status, new_status)
+        changes.log_bulk(Interaction.query.filter(Interaction.id.in_(chunk)), 'status_changed')
+        # end_time como em sla.record_changed(): preenchido ao resolver, limpo ao reabrir
+        if new_status == stats.RESOLVED_STATUS:
+            end_time = literal(when)
+        else:
+            end_time = case((Interaction.status == stats.RESOLVED_STATUS, None), else_=Interaction.end_time)
+        db.session.execute(
+            update(Interaction).where(Interaction.id.in_(chunk))
+            .values(status=new_status, status_since=when, end_time=end_time)
+            .execution_options(synchronize_session=False)
+        )
+    return rows
+
+
+def _reassign(rows, new_user, actor_id, when):
+    rows = [row for row in rows if row.user_id != new_user.id]
+    deltas = {}
+    for row in rows:
+        old_key, new_key = _stats_key(row), _stats_key(row, user_id=new_user.id)
+        deltas[old_key] = deltas.get(old_key, 0) - 1
+        deltas[new_key] = deltas.get(new_key, 0) + 1
+    stats.record_bulk(deltas)
+    sla.bulk_reassign(rows, new_user.id)
+
+    ids = [row.id for row in rows]
+    for chunk in _chunks(ids):
+        _log_history(chunk, actor_id, when, 'Atendente', User.username, new_user.username)
+        changes.log_bulk(Interaction.query.filter(Interaction.id.in_(chunk)), 'updated')
+        db.session.execute(
+            update(Interaction).where(Interaction.id.in_(chunk)).values(user_id=new_user.id)
+            .execution_options(synchronize_session=False)
+        )
+    return rows
+
+
+def _delete(rows):
+    audit.flush() # Histórico ainda na fila seria gravado depois dos atendimentos excluídos
+    deletion.delete_rows(rows)
+    return rows
+
+
+def apply(action, actor_id, ids=None, filters=None, status=None, user_id=None):
+    """Aplica uma mudança de status, troca de atendente ou exclusão a vários atendimentos de uma vez.
+
+    Os atendimentos vêm de `ids` ou, sem eles, dos `filters` (um MultiDict com
+    os mesmos filtros do histórico geral; ao menos um é obrigatório). Cada lote
+    de até sla.BATCH_SIZE atendimentos é um UPDATE/DELETE, com o histórico num
+    único INSERT ... SELECT; agregados, tempos por status e log de alterações
+    são ajustados na mesma transação, que é confirmada aqui. Atendimentos que
+    já estão no estado pedido são contados, mas não alterados.
+    Retorna {'action', 'matched', 'affected', 'unchanged'}; erros de validação
+    geram ValueError.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Ação inválida: {action!r}.')
+    if action == 'status' and status not in {value for value, _ in STATUS_CHOICES}:
+        raise ValueError('Status inválido.')
+    new_user = None
+    if action == 'reassign':
+        try:
+            new_user = db.session.get(User, int(user_id)) if user_id else None
+        except (TypeError, ValueError):
+            new_user = None
+        if new_user is None:
+            raise ValueError('Atendente inválido.')
+
+    rows = _target_rows(ids, filters if filters is not None else MultiDict())
+    when = datetime.utcnow()
+    if action == 'status':
+        affected = _change_status(rows, status, actor_id, when)
+    elif action == 'reassign':
+        affected = _reassign(rows, new_user, actor_id, when)
+    else:
+        affected = _delete(rows)
+    caching.invalidate_on_commit({row.start_time.date() for row in affected})
+    db.session.commit()
+
+    return {'action': action, 'matched': len(rows), 'affected': len(affected),
+            'unchanged': len(rows) - len(affected)}
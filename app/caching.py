@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import OrderedDict, Counter
+
+from flask import current_app
+from flask_caching.backends.base import BaseCache
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import cache, db, replica
+from app.models import User, Interaction, InteractionHistory
+
+# Views cujos agregados ficam em cache e se dependem do dia pesquisado
+CACHED_VIEWS = {'admin_dashboard': True, 'reports': False}
+ROLES = ('supervisor', 'attendant')
+# Colunas do usuário guardadas no cache do user_loader (o hash da senha fica de fora)
+USER_CACHED_FIELDS = ('id', 'username', 'is_supervisor', 'active')
+# Colunas do usuário que aparecem nas views em cache (nomes e perfis dos atendentes em reports)
+USER_VIEW_FIELDS = ('username', 'is_supervisor')
+# Acima de tantos dias alterados num commit, limpar o cache inteiro sai mais barato
+INVALIDATE_ALL_AFTER_DAYS = 31
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+class LRUCache(BaseCache):
+    """Cache em memória do processo com expulsão do item menos usado recentemente.
+
+    Diferente do SimpleCache, mantém a ordem de acesso e é protegido por lock,
+    então funciona bem com as threads do waitress.
+    """
+
+    def __init__(self, threshold=500, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self._threshold = threshold
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(threshold=config['CACHE_THRESHOLD'])
+        return cls(*args, **kwargs)
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout > 0 else None
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._items[key] = (self._expires_at(timeout), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self._threshold:
+                self._items.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._items.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        return True
+
+
+def _role():
+    return 'supervisor' if current_user.is_authenticated and current_user.is_supervisor else 'attendant'
+
+
+def make_key(view, day=None, role=None):
+    """Chave de cache no formato view:dia:perfil ('all' quando a view não depende do dia)."""
+    return f'view:{view}:{day.isoformat() if day else "all"}:{role or _role()}'
+
+
+def get_or_compute(view, compute, day=None):
+    """Devolve o valor em cache para (view, dia, perfil) ou calcula e guarda."""
+    key = make_key(view, day)
+    value = cache.get(key)
+    with _counters_lock:
+        _counters[f'{view}.{"hits" if value is not None else "misses"}'] += 1
+    if value is None:
+        value = compute()
+        # Calculado numa réplica defasada (app/replica.py): serve esta resposta, mas não fica em cache
+        if not replica.stale_reads():
+            cache.set(key, value)
+    return value
+
+
+def invalidate_day(day):
+    """Remove do cache tudo que depende do dia informado (e as views sem dia, como reports)."""
+    for view, per_day in CACHED_VIEWS.items():
+        for role in ROLES:
+            cache.delete(make_key(view, day if per_day else None, role))
+    with _counters_lock:
+        _counters['invalidations'] += 1
+
+
+def invalidate_all():
+    """Usado após deletes em massa, quando não sabemos quais dias foram afetados."""
+    cache.clear()
+    with _counters_lock:
+        _counters['invalidations'] += 1
+
+
+def counters():
+    with _counters_lock:
+        return dict(_counters)
+
+
+def _user_key(user_id):
+    return f'user:{user_id}'
+
+
+def load_user(user_id):
+    """user_loader com cache: evita o SELECT do usuário logado em toda requisição.
+
+    O cache guarda só as colunas (USER_CACHED_FIELDS) e o objeto é reanexado à
+    sessão atual com merge(load=False), sem ir ao banco. Alterações no usuário
+    invalidam a entrada no commit (veja _collect_changes); USER_CACHE_TIMEOUT
+    limita o tempo de vida nos demais processos quando o cache não é compartilhado.
+    """
+    timeout = current_app.config['USER_CACHE_TIMEOUT']
+    if not timeout:
+        return db.session.get(User, user_id)
+
+    key = _user_key(user_id)
+    values = cache.get(key)
+    with _counters_lock:
+        _counters[f'user_loader.{"hits" if values is not None else "misses"}'] += 1
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            cache.set(key, {field: getattr(user, field) for field in USER_CACHED_FIELDS}, timeout=timeout)
+        return user
+
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+def _affected_day(obj):
+    if isinstance(obj, InteractionHistory):
+        obj = obj.interaction
+    if isinstance(obj, Interaction) and obj.start_time is not None:
+        return obj.start_time.date()
+    return None
+
+
+def _user_shown_in_views(user, deleted):
+    if deleted:
+        return True
+    attrs = inspect(user).attrs
+    return any(attrs[field].history.has_changes() for field in USER_VIEW_FIELDS)
+
+
+def _collect_changes(session, flush_context):
+    days = session.info.setdefault('cache_dirty_days', set())
+    users = session.info.setdefault('cache_dirty_users', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            users.add(obj.id)
+            # Renomear, mudar o perfil ou excluir um usuário muda os agregados por atendente
+            if _user_shown_in_views(obj, obj in session.deleted):
+                session.info['cache_dirty_views'] = True
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        day = _affected_day(obj)
+        if day is not None:
+            days.add(day)
+
+
+def invalidate_on_commit(days):
+    """Invalida os dias no próximo commit, para alterações em massa que não passam pelo flush do ORM."""
+    db.session.info.setdefault('cache_dirty_days', set()).update(days)
+
+
+def _invalidate_committed(session):
+    days = session.info.pop('cache_dirty_days', ())
+    if session.info.pop('cache_dirty_views', False):
+        # As chaves por dia não são enumeráveis; usuários mudam raramente
+        invalidate_all()
+        session.info.pop('cache_dirty_users', None)
+        return
+    if len(days) > INVALIDATE_ALL_AFTER_DAYS:
+        invalidate_all()
+    else:
+        for day in days:
+            invalidate_day(day)
+    for user_id in session.info.pop('cache_dirty_users', ()):
+        invalidate_user(user_id)
+
+
+def _discard_pending(session):
+    session.info.pop('cache_dirty_days', None)
+    session.info.pop('cache_dirty_users', None)
+    session.info.pop('cache_dirty_views', None)
+
+
+def init_app(app):
+    """Registra os eventos de sessão que invalidam o cache quando atendimentos ou usuários são gravados."""
+    if not event.contains(db.session, 'after_flush', _collect_changes):
+        event.listen(db.session, 'after_flush', _collect_changes)
+        event.listen(db.session, 'after_commit', _invalidate_committed)
+        event.listen(db.session, 'after_rollback', _discard_pending)
@@ -0,0 +1,74 @@
+from datetime import datetime
+from sqlalchemy import event, func, insert, inspect, literal
+from app import db
+from app.models import Interaction, InteractionHistory, InteractionChange
+
+
+def _pending_changes(session):
+    """Extrai {interaction_id: (dia, ação)} dos objetos gravados no flush atual."""
+    changes = {}
+    for obj in session.new:
+        if isinstance(obj, Interaction):
+            changes[obj.id] = (obj.start_time.date(), 'created')
+    for obj in session.dirty:
+        if isinstance(obj, Interaction) and session.is_modified(obj, include_collections=False):
+            status_changed = inspect(obj).attrs.status.history.has_changes()
+            changes.setdefault(obj.id, (obj.start_time.date(), 'status_changed' if status_changed else 'updated'))
+    for obj in session.new:
+        if isinstance(obj, InteractionHistory) and obj.interaction is not None:
+            changes.setdefault(obj.interaction.id, (obj.interaction.start_time.date(), 'updated'))
+    for obj in session.deleted:
+        if isinstance(obj, Interaction):
+            changes[obj.id] = (obj.start_time.date(), 'deleted')
+    return changes
+
+
+def _log_changes(session, flush_context):
+    changes = _pending_changes(session)
+    if not changes:
+        return
+    now = datetime.utcnow()
+    session.connection().execute(insert(InteractionChange), [
+        dict(interaction_id=interaction_id, day=day, action=action, timestamp=now)
+        for interaction_id, (day, action) in changes.items()
+    ])
+
+
+def log_bulk(query, action):
+    """Registra `action` para os atendimentos de uma query alterados em massa (sem passar pelo flush)."""
+    source = query.with_entities(
+        Interaction.id, func.date(Interaction.start_time), literal(action), literal(datetime.utcnow())
+    ).statement
+    db.session.execute(insert(InteractionChange).from_select(
+        ['interaction_id', 'day', 'action', 'timestamp'], source
+    ))
+
+
+def log_bulk_delete(query):
+    """Registra como 'deleted' os atendimentos de uma query antes de um delete em massa."""
+    log_bulk(query, 'deleted')
+
+
+def day_version(day):
+    """Contador de alterações do dia: o maior id do log para aquele dia (0 se nunca mudou)."""
+    return db.session.query(func.max(InteractionChange.id)) \
+        .filter(InteractionChange.day == day).scalar() or 0
+
+
+def latest_change_id():
+    return db.session.query(func.max(InteractionChange.id)).scalar() or 0
+
+
+def changes_since(cursor, limit, day=None):
+    """Alterações com id maior que o cursor, junto com o estado atual do atendimento (se ainda existir)."""
+    query = db.session.query(InteractionChange, Interaction) \
+        .outerjoin(Interaction, Interaction.id == InteractionChange.interaction_id) \
+        .filter(InteractionChange.id > cursor)
+    if day is not None:
+        query = query.filter(InteractionChange.day == day)
+    return query.order_by(InteractionChange.id).limit(limit).all()
+
+
+def init_app(app):
+    if not event.contains(db.session, 'after_flush', _log_changes):
+        event.listen(db.session, 'after_flush', _log_changes)
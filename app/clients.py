@@ -0,0 +1,329 @@
+import heapq
+import threading
+import time as clock
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, exc, func, insert, inspect, select, update
+from sqlalchemy.orm import joinedload
+
+from app import cache, db
+from app.models import Client, Interaction, ArchivedInteraction
+from app.phones import normalize_phone
+
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+# Candidatos por prefixo examinados para escolher os mais usados (limita o custo de prefixos curtos)
+SUGGEST_SCAN = 500
+# Clientes recentes na página inicial e quantos atendimentos do atendente são lidos para achá-los
+RECENT_CLIENTS = 8
+RECENT_SCAN = 50
+
+
+def fold(text):
+    """Forma de comparação de nomes: sem acentos, sem diferença de caixa e com espaços simples."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+# --- Cadastro ---
+
+def resolve(name, phone):
+    """O cliente do telefone informado, criado na hora se ainda não existir (None sem dígitos no telefone).
+
+    O nome do cadastro é o da primeira ocorrência; grafias diferentes no
+    atendimento não o alteram. O INSERT vai num savepoint: se outro atendente
+    gravou o mesmo telefone entre a consulta e o INSERT, a violação do índice
+    único desfaz só o savepoint e o cliente gravado por ele é usado.
+    """
+    phone_normalized = normalize_phone(phone)
+    if not phone_normalized:
+        return None
+    client = Client.query.filter_by(phone_normalized=phone_normalized).first()
+    if client is not None:
+        return client
+    client = Client(name=name.strip(), phone=phone.strip())
+    try:
+        with db.session.begin_nested():
+            db.session.add(client)
+    except exc.IntegrityError:
+        client = Client.query.filter_by(phone_normalized=phone_normalized).one()
+    return client
+
+
+def backfill():
+    """Cria os clientes que faltam e liga a eles os atendimentos ainda sem cliente.
+
+    Um cliente por telefone normalizado, com o nome e o telefone do atendimento
+    mais recente daquele número. Idempotente (usado pela migração, pelo import e
+    pelo seed); não faz commit. Retorna quantos atendimentos foram ligados.
+    """
+    latest = select(
+        Interaction.client_phone_normalized.label('phone_normalized'),
+        func.max(Interaction.id).label('last_id'),
+        func.min(Interaction.start_time).label('first_seen'),
+    ).where(
+        Interaction.client_id.is_(None),
+        Interaction.client_phone_normalized.is_not(None),
+        Interaction.client_phone_normalized != '',
+    ).group_by(Interaction.client_phone_normalized).subquery()
+
+    source = select(Interaction.client_name, Interaction.client_phone, latest.c.phone_normalized, latest.c.first_seen) \
+        .join(latest, Interaction.id == latest.c.last_id) \
+        .where(~select(Client.id).where(Client.phone_normalized == latest.c.phone_normalized).exists())
+    db.session.execute(insert(Client).from_select(['name', 'phone', 'phone_normalized', 'created_at'], source))
+
+    linked = db.session.execute(
+        update(Interaction)
+        .where(Interaction.client_id.is_(None), Interaction.client_phone_normalized == Client.phone_normalized)
+        .values(client_id=Client.id)
+        .execution_options(synchronize_session=False)
+    )
+    _index.expire()
+    return linked.rowcount
+
+
+def timeline(client, user_id=None):
+    """Atendimentos do cliente, do mais recente ao mais antigo (índice client_id + start_time).
+
+    Os arquivados (app/archive.py) vêm numa segunda lista, também pelo índice de client_id.
+    """
+    interactions = client.interactions.options(joinedload(Interaction.user))
+    archived = ArchivedInteraction.query.options(joinedload(ArchivedInteraction.user)) \
+        .filter(ArchivedInteraction.client_id == client.id)
+    if user_id is not None:
+        interactions = interactions.filter(Interaction.user_id == user_id)
+        archived = archived.filter(ArchivedInteraction.user_id == user_id)
+    return (interactions.order_by(Interaction.start_time.desc()).all(),
+            archived.order_by(ArchivedInteraction.start_time.desc()).all())
+
+
+# --- Índice em memória para o autocompletar ---
+
+class _SuggestIndex:
+    """Pares distintos (nome, telefone) digitados nos atendimentos, buscados por prefixo com bisect.
+
+    Cada par (nome sem acentos, telefone normalizado) fica em duas listas
+    ordenadas, uma por nome e outra por telefone, e num OrderedDict em ordem
+    de uso: um atendimento novo com o par o leva para o fim, e acima de
+    CLIENT_INDEX_MAX_ENTRIES sai o usado há mais tempo. As buscas não tocam
+    no banco; o índice é montado na primeira busca do processo (ou no `serve`)
+    e atualizado no commit das sessões que gravam atendimentos. Depois de
+    CLIENT_INDEX_TTL segundos (ou de um backfill) ele é remontado numa thread,
+    para incluir o que outros processos e as cargas em lote gravaram; enquanto
+    isso, as buscas continuam no índice anterior.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Uma montagem por vez; a consulta roda fora de _lock, que só protege a troca das estruturas
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+        self.reset()
+
+    def reset(self):
+        self.entries = None # {(nome sem acentos, telefone normalizado): [nome, telefone, client_id, usos]}
+        self.by_name = []
+        self.by_phone = []
+        self.built_at = 0
+        self.stale = False
+        # Pares gravados durante uma remontagem, reaplicados no índice novo (None fora da remontagem)
+        self._pending = None
+
+    def expire(self):
+        """Pede uma remontagem em segundo plano na próxima busca (as buscas seguem no índice atual)."""
+        self.stale = True
+
+    @staticmethod
+    def _load():
+        max_entries = current_app.config['CLIENT_INDEX_MAX_ENTRIES']
+        last_id = func.max(Interaction.id)
+        rows = db.session.execute(
+            select(Interaction.client_name, Interaction.client_phone_normalized, func.max(Interaction.client_phone),
+                   func.max(Interaction.client_id), func.count())
+            .where(Interaction.client_phone_normalized.is_not(None), Interaction.client_phone_normalized != '')
+            .group_by(Interaction.client_name, Interaction.client_phone_normalized)
+            .order_by(last_id.desc()).limit(max_entries)
+        ).all()
+        entries = OrderedDict()
+        # Do menos para o mais recente, que fica no fim do OrderedDict
+        for name, phone_normalized, phone, client_id, uses in reversed(rows):
+            key = (fold(name), phone_normalized)
+            entry = entries.pop(key, None)
+            entries[key] = [name, phone, client_id, uses + (entry[3] if entry else 0)]
+        return entries, sorted(entries), sorted((phone_normalized, name) for name, phone_normalized in entries)
+
+    def _build(self, initial=False):
+        with self._build_lock:
+            if initial and self.entries is not None:
+                # Outra busca montou o índice enquanto esta esperava
+                return
+            with self._lock:
+                self.stale = False
+                self._pending = []
+            try:
+                entries, by_name, by_phone = self._load()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self.entries, self.by_name, self.by_phone = entries, by_name, by_phone
+                self.built_at = clock.monotonic()
+                # Um par commitado antes da consulta pode contar um uso a mais; só afeta a ordem das sugestões
+                self._record(pending)
+
+    def _refresh(self, app):
+        try:
+            with app.app_context():
+                self._build()
+        except Exception:
+            app.logger.exception('Falha ao remontar o índice do autocompletar de clientes.')
+            # Nova tentativa só depois de outro CLIENT_INDEX_TTL
+            self.built_at = clock.monotonic()
+        finally:
+            self._refreshing = False
+
+    def _ensure(self):
+        if self.entries is None:
+            # Primeira busca do processo: não há índice anterior para servir
+            self._build(initial=True)
+            return
+        ttl = current_app.config['CLIENT_INDEX_TTL']
+        if (self.stale or (ttl and clock.monotonic() - self.built_at > ttl)) and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh, args=(current_app._get_current_object(),),
+                             name='client-index-refresh', daemon=True).start()
+
+    @staticmethod
+    def _discard(keys, key):
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def record(self, pairs):
+        """Conta um uso de cada (nome, telefone, client_id) de atendimentos gravados."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(pairs)
+            if self.entries is not None:
+                self._record(pairs)
+
+    def _record(self, pairs):
+        max_entries = current_app.config['CLIENT_INDEX_MAX_ENTRIES']
+        for name, phone, client_id in pairs:
+            key = (fold(name), normalize_phone(phone))
+            if not key[1]:
+                continue
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[:3] = name, phone, client_id or entry[2]
+                entry[3] += 1
+                self.entries.move_to_end(key)
+                continue
+            self.entries[key] = [name, phone, client_id, 1]
+            insort(self.by_name, key)
+            insort(self.by_phone, (key[1], key[0]))
+            while len(self.entries) > max_entries:
+                (folded, phone_normalized), _ = self.entries.popitem(last=False)
+                self._discard(self.by_name, (folded, phone_normalized))
+                self._discard(self.by_phone, (phone_normalized, folded))
+
+    def search(self, query, limit):
+        self._ensure()
+        with self._lock:
+            digits = normalize_phone(query) if _looks_like_phone(query) else ''
+            keys, prefix = (self.by_phone, digits) if digits else (self.by_name, fold(query))
+            candidates = []
+            i = bisect_left(keys, (prefix,))
+            while i < len(keys) and len(candidates) < SUGGEST_SCAN and keys[i][0].startswith(prefix):
+                candidates.append(keys[i] if not digits else (keys[i][1], keys[i][0]))
+                i += 1
+            # Os mais usados primeiro; entre os candidatos vistos (SUGGEST_SCAN), não no índice inteiro
+            best = heapq.nlargest(limit, candidates, key=lambda key: self.entries[key][3])
+            return [tuple(self.entries[key][:3]) for key in best]
+
+
+def _looks_like_phone(query):
+    """Busca por telefone quando há mais dígitos que letras ("(11) 9", "+55 11"); "Loja 2" continua sendo nome."""
+    digits = sum(c.isdigit() for c in query)
+    return digits > sum(c.isalpha() for c in query)
+
+
+_index = _SuggestIndex()
+
+
+def warm_up():
+    """Monta o índice do autocompletar já na subida do servidor, e não na primeira busca."""
+    _index._ensure()
+
+
+def suggest(query, limit=SUGGEST_LIMIT):
+    """Até `limit` pares (nome, telefone) mais usados cujo nome (ou telefone, se a busca for quase só dígitos) começa com `query`."""
+    query = (query or '').strip()
+    if not query:
+        return []
+    return [{'id': client_id, 'name': name, 'phone': phone} for name, phone, client_id in _index.search(query, limit)]
+
+
+# --- Clientes recentes do atendente ---
+
+def _recent_key(user_id):
+    return f'recent_clients:{user_id}'
+
+
+def recent(user_id):
+    """Os últimos RECENT_CLIENTS clientes distintos do atendente, em cache até o próximo atendimento dele."""
+    key = _recent_key(user_id)
+    values = cache.get(key)
+    if values is None:
+        # Servido pelo índice user_id + start_time; RECENT_SCAN linhas bastam para achar os distintos
+        rows = db.session.execute(
+            select(Interaction.client_name, Interaction.client_phone, Interaction.client_phone_normalized)
+            .where(Interaction.user_id == user_id)
+            .order_by(Interaction.start_time.desc()).limit(RECENT_SCAN)
+        ).all()
+        values, seen = [], set()
+        for name, phone, phone_normalized in rows:
+            if phone_normalized and phone_normalized not in seen and len(values) < RECENT_CLIENTS:
+                seen.add(phone_normalized)
+                values.append({'name': name, 'phone': phone})
+        cache.set(key, values)
+    return values
+
+
+def _collect_interactions(session, flush_context):
+    pending = session.info.setdefault('clients_pending', [])
+    for obj in session.new:
+        if isinstance(obj, Interaction):
+            pending.append((obj.user_id, obj.client_name, obj.client_phone, obj.client_id))
+    for obj in session.dirty:
+        if isinstance(obj, Interaction) and (inspect(obj).attrs.client_name.history.has_changes()
+                                             or inspect(obj).attrs.client_phone.history.has_changes()):
+            pending.append((obj.user_id, obj.client_name, obj.client_phone, obj.client_id))
+
+
+def _apply_committed(session):
+    pending = session.info.pop('clients_pending', None)
+    if pending:
+        _index.record([(name, phone, client_id) for _user_id, name, phone, client_id in pending])
+        for user_id in {user_id for user_id, *_ in pending}:
+            cache.delete(_recent_key(user_id))
+
+
+def _discard_pending(session):
+    session.info.pop('clients_pending', None)
+
+
+def init_app(app):
+    """Registra os eventos de sessão que mantêm o autocompletar e os clientes recentes em dia."""
+    if not event.contains(db.session, 'after_flush', _collect_interactions):
+        event.listen(db.session, 'after_flush', _collect_interactions)
+        event.listen(db.session, 'after_commit', _apply_committed)
+        event.listen(db.session, 'after_rollback', _discard_pending)
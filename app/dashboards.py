@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as day_time, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, union_all
+
+from app import db, stats, changes
+from app.models import User, Interaction, ArchivedInteraction, InteractionChange, DashboardSnapshot
+
+# Mesmos atributos de Interaction usados na listagem de admin/dashboard.html
+ListingRow = namedtuple('ListingRow', 'id user client_name category status')
+
+
+def _day_bounds(day):
+    return datetime.combine(day, day_time.min), datetime.combine(day, day_time.max)
+
+
+def build(day):
+    """Monta (ou remonta) o snapshot do painel de `day`; não faz commit.
+
+    A versão é lida antes dos dados: uma alteração que chegue no meio deixa o
+    snapshot com versão antiga, e ele é descartado em vez de servir dados velhos.
+    A listagem inclui os atendimentos arquivados do dia, que os cartões (lidos
+    dos agregados) também contam.
+    """
+    version = changes.day_version(day)
+    start_of_day, end_of_day = _day_bounds(day)
+    rows = union_all(*(
+        select(model.id, model.user_id, model.client_name, model.category, model.status, model.start_time)
+        .where(model.start_time >= start_of_day, model.start_time <= end_of_day)
+        for model in (Interaction, ArchivedInteraction)
+    )).subquery()
+    rows = db.session.execute(
+        select(rows.c.id, rows.c.user_id, rows.c.client_name, rows.c.category, rows.c.status)
+        .order_by(rows.c.start_time.desc())
+    ).all()
+    snapshot = db.session.merge(DashboardSnapshot(
+        day=day,
+        version=version,
+        built_at=datetime.utcnow(),
+        stats=stats.status_counts(day=day),
+        agents=sorted(stats.user_counts(day).items()),
+        rows=[list(row) for row in rows],
+    ))
+    return snapshot
+
+
+def get(day):
+    """O snapshot de um dia já encerrado, se existir e o dia não tiver mudado desde a montagem."""
+    if day >= date.today():
+        return None
+    snapshot = db.session.get(DashboardSnapshot, day)
+    if snapshot is None or snapshot.version != changes.day_version(day):
+        return None
+    return snapshot
+
+
+def listing(snapshot):
+    """As linhas da listagem do snapshot, com o atendente (um SELECT dos usuários, não um por linha)."""
+    users = {user.id: user for user in User.query}
+    return [ListingRow(interaction_id, users.get(user_id), client_name, category, status)
+            for interaction_id, user_id, client_name, category, status in snapshot.rows]
+
+
+def refresh(days=None, progress=None):
+    """Monta os snapshots que faltam ou ficaram velhos nos últimos `days` dias encerrados.
+
+    `days` é DASHBOARD_SNAPSHOT_DAYS por padrão. As versões de todos os dias saem
+    de uma query só (índice day + id do log); cada dia remontado é um commit.
+    Retorna quantos snapshots foram montados.
+    """
+    days = days if days is not None else current_app.config['DASHBOARD_SNAPSHOT_DAYS']
+    today = date.today()
+    first_day = today - timedelta(days=days)
+    versions = dict(db.session.execute(
+        select(InteractionChange.day, func.max(InteractionChange.id))
+        .where(InteractionChange.day >= first_day, InteractionChange.day < today)
+        .group_by(InteractionChange.day)
+    ).all())
+    built_versions = dict(db.session.execute(
+        select(DashboardSnapshot.day, DashboardSnapshot.version)
+        .where(DashboardSnapshot.day >= first_day, DashboardSnapshot.day < today)
+    ).all())
+
+    built = 0
+    for offset in range(days, 0, -1):
+        day = today - timedelta(days=offset)
+        if day in built_versions and built_versions[day] == versions.get(day, 0):
+            continue
+        build(day)
+        db.session.commit()
+        built += 1
+        if progress:
+            progress(day)
+    return built
+
+
+class SnapshotWorker:
+    """Thread que chama refresh() a cada DASHBOARD_SNAPSHOT_INTERVAL segundos.
+
+    Logo depois da virada do dia ela monta o dia que acabou de encerrar, e
+    remonta os dias que tiveram atendimentos editados ou excluídos.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config['DASHBOARD_SNAPSHOT_INTERVAL']
+        self._thread = None
+
+    def start(self):
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dashboard-snapshots', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    refresh()
+            except Exception:
+                self.app.logger.exception('Falha ao montar os snapshots do painel.')
+            time.sleep(self.interval)
+
+
+def start_worker(app):
+    """Inicia a montagem periódica dos snapshots (manage.py serve)."""
+    worker = app.extensions.setdefault('dashboard_snapshots', SnapshotWorker(app))
+    worker.start()
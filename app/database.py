@@ -0,0 +1,38 @@
+from sqlalchemy import event
+
+from app import db
+
+
+def _sqlite_pragmas(app):
+    """Lista de pragmas do SQLite a partir da configuração (SQLITE_*)."""
+    return [
+        f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA cache_size={int(app.config['SQLITE_CACHE_SIZE'])}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def init_app(app):
+    """Configura as conexões do SQLite para escrita concorrente.
+
+    Em WAL os leitores não bloqueiam o escritor (e vice-versa), synchronous=NORMAL
+    é seguro em WAL e evita um fsync por commit, e o busy_timeout faz uma escrita
+    concorrente esperar pela trava em vez de falhar com "database is locked".
+    journal_mode fica gravado no arquivo; os demais valem por conexão, por isso
+    tudo é aplicado no evento "connect" do pool.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = _sqlite_pragmas(app)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,89 @@
+from flask import current_app
+from sqlalchemy import delete, select, update
+
+from app import db, stats, sla, changes, caching, audit, archive
+from app.models import User, Interaction, InteractionHistory, InteractionStatusTime
+
+# Colunas que as exclusões e operações em massa leem dos atendimentos antes de alterá-los:
+# o suficiente para stats.stats_key() e para as funções sla.bulk_*
+ROW_COLUMNS = (Interaction.id, Interaction.user_id, Interaction.status, Interaction.category, Interaction.channel,
+               Interaction.had_anydesk_session, Interaction.start_time, Interaction.status_since)
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _delete_ids(ids):
+    """DELETEs por conjunto do log de alterações, tempos por status, histórico e dos próprios atendimentos."""
+    changes.log_bulk_delete(Interaction.query.filter(Interaction.id.in_(ids)))
+    db.session.execute(delete(InteractionStatusTime).where(InteractionStatusTime.interaction_id.in_(ids)))
+    db.session.execute(delete(InteractionHistory).where(InteractionHistory.interaction_id.in_(ids)))
+    db.session.execute(
+        delete(Interaction).where(Interaction.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+
+
+def delete_rows(rows):
+    """Exclui os atendimentos de `rows` (lidas com ROW_COLUMNS) com o histórico e os tempos por status.
+
+    Desconta os agregados diários e o histograma de SLA na mesma transação e
+    marca os dias para o cache dos painéis ser invalidado no commit, que fica
+    com quem chama. Quem chama deve rodar audit.flush() antes, para o histórico
+    ainda na fila não ser gravado depois da exclusão.
+    """
+    caching.invalidate_on_commit({row.start_time.date() for row in rows})
+    deltas = {}
+    for row in rows:
+        key = stats.stats_key(row)
+        deltas[key] = deltas.get(key, 0) - 1
+    stats.record_bulk(deltas)
+    sla.bulk_delete(rows)
+    for chunk in _chunks([row.id for row in rows], sla.BATCH_SIZE):
+        _delete_ids(chunk)
+
+
+def delete_interactions(ids):
+    """Exclui os atendimentos `ids` (ver delete_rows()). Retorna as linhas excluídas."""
+    audit.flush()
+    rows = []
+    for chunk in _chunks(sorted(set(ids)), sla.BATCH_SIZE):
+        rows += db.session.execute(select(*ROW_COLUMNS).where(Interaction.id.in_(chunk))).all()
+    delete_rows(rows)
+    return rows
+
+
+def delete_user(user_id, chunk_size=None):
+    """Exclui um usuário e todos os atendimentos dele, em lotes com um commit cada.
+
+    Cada lote de `chunk_size` atendimentos (DELETE_CHUNK_SIZE por padrão) é uma
+    transação curta, para não segurar o lock de escrita do SQLite enquanto
+    dezenas de milhares de linhas são apagadas. Os agregados e os arquivados do
+    atendente, o próprio usuário e a autoria do histórico que ele registrou em atendimentos
+    de outros (que fica vazia) saem no último commit; até lá os painéis ainda
+    contam os atendimentos já apagados. Se o processo for interrompido, basta
+    repetir a exclusão. Retorna quantos atendimentos foram excluídos.
+    """
+    chunk_size = chunk_size or current_app.config['DELETE_CHUNK_SIZE']
+    audit.flush()
+    deleted = 0
+    while True:
+        ids = db.session.scalars(
+            select(Interaction.id).where(Interaction.user_id == user_id).order_by(Interaction.id).limit(chunk_size)
+        ).all()
+        if not ids:
+            break
+        _delete_ids(ids)
+        db.session.commit()
+        deleted += len(ids)
+
+    stats.forget_user(user_id)
+    sla.forget_user(user_id)
+    archive.forget_user(user_id)
+    db.session.execute(update(InteractionHistory).where(InteractionHistory.user_id == user_id).values(user_id=None))
+    # Pelo ORM, para o commit também tirar o usuário do cache do user_loader
+    db.session.delete(db.session.get(User, user_id))
+    db.session.commit()
+    caching.invalidate_all()
+    return deleted
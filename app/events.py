@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from collections import deque
+
+from flask import current_app, request, url_for
+
+from app import db, changes
+from app.models import Interaction, InteractionChange
+
+# Máximo de eventos reenviados a partir do Last-Event-ID; acima disso o cliente recebe um 'resync'
+REPLAY_LIMIT = 500
+
+
+class Subscriber:
+    """Fila limitada de eventos de um cliente conectado.
+
+    Se o cliente não der conta e a fila transbordar, os eventos dela são trocados
+    por um único 'resync' (veja EventHub.take). `notify`, quando houver, é chamado
+    a cada publicação: é como o servidor assíncrono (app/events_server.py) acorda
+    a conexão, sem thread esperando.
+    """
+
+    def __init__(self, maxlen, notify=None):
+        self.queue = deque(maxlen=maxlen)
+        self.overflowed = False
+        self.notify = notify
+
+
+class EventHub:
+    """Distribui os eventos de atendimentos para os clientes SSE conectados neste processo.
+
+    Os assinantes são apenas filas em memória (não há thread de pub/sub por cliente)
+    e uma única thread por processo lê o log interaction_changes e faz o fan-out.
+    Como o log fica no banco, ele funciona como broker entre vários processos do waitress.
+
+    Um assinante de /api/events no waitress prende uma thread do servidor WSGI
+    enquanto a conexão durar, por isso esses assinantes são limitados
+    (max_subscribers) bem abaixo das threads. Os do servidor assíncrono
+    (EVENTS_PORT) não prendem thread e têm o próprio limite,
+    EVENTS_SERVER_MAX_SUBSCRIBERS.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._subscribers = set()
+        self._poller = None
+        self._app = None
+        self.last_id = 0
+
+    def subscribe(self, app, notify=None):
+        """Registra um novo assinante, iniciando a leitura do log na primeira assinatura.
+
+        Retorna None quando o limite do tipo de conexão já foi atingido neste
+        processo: max_subscribers(app) para as que prendem uma thread e
+        EVENTS_SERVER_MAX_SUBSCRIBERS para as do servidor assíncrono (com `notify`).
+        """
+        subscriber = Subscriber(app.config['EVENTS_QUEUE_SIZE'], notify)
+        if notify is None:
+            limit = max_subscribers(app)
+        else:
+            limit = app.config['EVENTS_SERVER_MAX_SUBSCRIBERS']
+        with self._condition:
+            if sum(1 for other in self._subscribers if (other.notify is None) == (notify is None)) >= limit:
+                return None
+            self._subscribers.add(subscriber)
+            if self._poller is None or not self._poller.is_alive():
+                self._start_poller(app)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._condition:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._condition:
+            return len(self._subscribers)
+
+    def publish(self, events):
+        """Entrega os eventos para todos os assinantes e acorda quem estiver esperando."""
+        if not events:
+            return
+        with self._condition:
+            for subscriber in self._subscribers:
+                if len(subscriber.queue) + len(events) > subscriber.queue.maxlen:
+                    subscriber.overflowed = True
+                subscriber.queue.extend(events)
+                if subscriber.notify is not None:
+                    subscriber.notify()
+            self._condition.notify_all()
+
+    def wait(self, subscriber, timeout):
+        """Bloqueia até haver eventos para o assinante (ou até o timeout) e os retorna (veja take())."""
+        with self._condition:
+            self._condition.wait_for(lambda: subscriber.queue, timeout)
+            return self._take(subscriber)
+
+    def take(self, subscriber):
+        """Esvazia a fila do assinante, sem bloquear.
+
+        Se a fila transbordou, parte dos eventos se perdeu: em vez deles vai um
+        único 'resync' com o id do evento mais novo, e o cliente recarrega o estado.
+        """
+        with self._condition:
+            return self._take(subscriber)
+
+    def _take(self, subscriber):
+        events = list(subscriber.queue)
+        subscriber.queue.clear()
+        if subscriber.overflowed and events:
+            subscriber.overflowed = False
+            return [resync_event(events[-1]['id'])]
+        return events
+
+    def _start_poller(self, app):
+        self._app = app
+        with app.app_context():
+            self.last_id = db.session.query(db.func.max(InteractionChange.id)).scalar() or 0
+        self._poller = threading.Thread(target=self._poll_forever, name='events-poller', daemon=True)
+        self._poller.start()
+
+    def _poll_forever(self):
+        interval = self._app.config['EVENTS_POLL_INTERVAL']
+        while True:
+            time.sleep(interval)
+            if not self.subscriber_count():
+                continue
+            try:
+                with self._app.app_context():
+                    events = fetch_events(self.last_id)
+            except Exception:
+                self._app.logger.exception('Falha ao ler o log de alterações para os eventos.')
+                continue
+            if events:
+                self.last_id = events[-1]['id']
+                self.publish(events)
+
+
+hub = EventHub()
+
+
+def max_subscribers(app):
+    """Conexões SSE aceitas por processo: EVENTS_MAX_SUBSCRIBERS ou um quarto das threads do waitress."""
+    limit = app.config['EVENTS_MAX_SUBSCRIBERS']
+    return limit if limit is not None else app.config['WAITRESS_THREADS'] // 4
+
+
+def stream_url():
+    """Endereço do stream de eventos para o navegador do painel.
+
+    EVENTS_URL quando configurado; senão o servidor asyncio (app/events_server.py)
+    no mesmo host do painel, se estiver rodando; senão /api/events do waitress.
+    """
+    app = current_app
+    if app.config['EVENTS_URL']:
+        return app.config['EVENTS_URL']
+    server = app.extensions.get('events_server')
+    if server is None:
+        return url_for('api.events_stream')
+    from app.events_server import EVENTS_PATH
+    host = request.host.rsplit(':', 1)[0] if not request.host.endswith(']') else request.host
+    return f'{request.scheme}://{host}:{server.port}{EVENTS_PATH}'
+
+
+def fetch_events(after_id, limit=REPLAY_LIMIT):
+    """Lê do log as alterações com id maior que `after_id`, já no formato dos eventos."""
+    rows = db.session.query(InteractionChange, Interaction) \
+        .outerjoin(Interaction, Interaction.id == InteractionChange.interaction_id) \
+        .filter(InteractionChange.id > after_id) \
+        .order_by(InteractionChange.id).limit(limit).all()
+    return [{
+        'id': change.id,
+        'event': change.action,
+        'data': {
+            'interaction_id': change.interaction_id,
+            'day': change.day.isoformat(),
+            'user_id': interaction.user_id if interaction else None,
+            'client_name': interaction.client_name if interaction else None,
+            'status': interaction.status if interaction else None,
+        },
+    } for change, interaction in rows]
+
+
+def resync_event(last_id):
+    """Evento que manda o cliente recarregar o estado: os eventos até `last_id` não serão reenviados."""
+    return {'id': last_id, 'event': 'resync', 'data': {'last_event_id': last_id}}
+
+
+def replay(after_id, limit=REPLAY_LIMIT):
+    """Eventos perdidos desde `after_id` (o Last-Event-ID do cliente).
+
+    Se forem mais que `limit`, o cliente ficou tempo demais desconectado: em vez
+    deles vai um único 'resync' com o id mais recente do log.
+    """
+    events = fetch_events(after_id, limit + 1)
+    if len(events) > limit:
+        return [resync_event(changes.latest_change_id())]
+    return events
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def stream(app, subscriber, replay=()):
+    """Gerador da resposta SSE: reenvia `replay` e depois entrega os eventos do hub."""
+    heartbeat = app.config['EVENTS_HEARTBEAT']
+    try:
+        # Pede ao navegador para reconectar em 3s caso a conexão caia
+        yield 'retry: 3000\n\n'
+        last_sent = 0
+        for event in replay:
+            last_sent = event['id']
+            yield format_sse(event)
+        while True:
+            events = hub.wait(subscriber, heartbeat)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                # Evita duplicar o que já foi reenviado a partir do Last-Event-ID
+                if event['event'] == 'resync' or event['id'] > last_sent:
+                    yield format_sse(event)
+    finally:
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import threading
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+from flask_login.utils import decode_cookie
+from itsdangerous import BadSignature
+
+from app import db, events
+from app.models import load_user
+
+EVENTS_PATH = '/api/events'
+# Tempo máximo para o cliente mandar a requisição inteira, e o tamanho máximo dela
+HEADER_TIMEOUT = 10
+HEADER_LIMIT = 16 * 1024
+
+_REASONS = {200: 'OK', 204: 'No Content', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+            405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+class EventServer:
+    """Servidor SSE num loop asyncio, numa única thread, para os eventos de /api/events.
+
+    O waitress dedica uma thread a cada conexão aberta; aqui uma conexão é só uma
+    corrotina e uma fila no EventHub, então milhares de painéis abertos custam
+    memória, não threads. Os eventos vêm da mesma thread de leitura do log de
+    alterações (events.hub). A sessão é a do Flask (o cookie de sessão ou o
+    'lembrar-me' do Flask-Login), conferida numa thread auxiliar, como o replay.
+    """
+
+    def __init__(self, app, host, port):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self._ready = threading.Event()
+        self._error = None
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._tasks = set()
+
+    def start(self):
+        """Sobe o loop numa thread daemon e espera a porta abrir (erros de bind sobem aqui)."""
+        self._thread = threading.Thread(target=self._run, name='events-server', daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        """Fecha a porta e as conexões abertas, tirando os assinantes do hub."""
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join(5)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port, limit=HEADER_LIMIT)
+        # Com a porta 0 o sistema escolhe uma livre
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await self._stopping.wait()
+            # Encerra as conexões abertas aqui, antes do asyncio.run(): uma tarefa de
+            # conexão cancelada por ele vira traceback no log do asyncio.streams
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._tasks.add(asyncio.current_task())
+        subscriber = None
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HEADER_TIMEOUT)
+                method, target, headers = _parse_head(head)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                return
+            path, _, query = target.partition('?')
+            cors = _cors_headers(headers)
+            if path != EVENTS_PATH:
+                return await _respond(writer, 404, {'error': 'Não encontrado.'}, cors)
+            if method == 'OPTIONS':
+                return await _respond(writer, 204, None, cors)
+            if method != 'GET':
+                return await _respond(writer, 405, {'error': 'Método não permitido.'}, cors)
+
+            status = await self._loop.run_in_executor(None, self._authorize, headers.get('cookie', ''))
+            if status == 401:
+                return await _respond(writer, 401, {'error': 'Autenticação necessária.'}, cors)
+            if status == 403:
+                return await _respond(writer, 403, {'error': 'Acesso negado.'}, cors)
+
+            wakeup = asyncio.Event()
+            notify = lambda: self._loop.call_soon_threadsafe(wakeup.set)
+            last_event_id = _last_event_id(headers, query)
+            subscriber, replay = await self._loop.run_in_executor(None, self._subscribe, notify, last_event_id)
+            if subscriber is None:
+                cors['Retry-After'] = '60'
+                return await _respond(writer, 503, {'error': 'Limite de conexões de eventos atingido.'}, cors)
+
+            _write_head(writer, 200, dict(cors, **{
+                'Content-Type': 'text/event-stream; charset=utf-8',
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',
+            }))
+            await self._stream(writer, subscriber, wakeup, replay)
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # Cancelada por stop(): fim normal da conexão
+            if not self._stopping.is_set():
+                raise
+        finally:
+            self.connections -= 1
+            self._tasks.discard(asyncio.current_task())
+            if subscriber is not None:
+                events.hub.unsubscribe(subscriber)
+            writer.close()
+
+    async def _stream(self, writer, subscriber, wakeup, replay):
+        """Mesmo protocolo de events.stream(): replay, depois os eventos do hub e keep-alives."""
+        heartbeat = self.app.config['EVENTS_HEARTBEAT']
+        writer.write(b'retry: 3000\n\n')
+        last_sent = 0
+        for event in replay:
+            last_sent = event['id']
+            writer.write(events.format_sse(event).encode())
+        await writer.drain()
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                writer.write(b': keep-alive\n\n')
+                await writer.drain()
+                continue
+            wakeup.clear()
+            for event in events.hub.take(subscriber):
+                if event['event'] == 'resync' or event['id'] > last_sent:
+                    writer.write(events.format_sse(event).encode())
+            await writer.drain()
+
+    def _authorize(self, cookie_header):
+        """200 para um supervisor logado, 401 sem sessão válida e 403 para os demais."""
+        app = self.app
+        cookies = {name: morsel.value for name, morsel in SimpleCookie(cookie_header).items()}
+        with app.app_context():
+            try:
+                user_id = None
+                session_cookie = cookies.get(app.config['SESSION_COOKIE_NAME'])
+                if session_cookie:
+                    serializer = app.session_interface.get_signing_serializer(app)
+                    try:
+                        data = serializer.loads(session_cookie,
+                                                max_age=int(app.permanent_session_lifetime.total_seconds()))
+                        user_id = data.get('_user_id')
+                    except BadSignature:
+                        pass
+                remember_cookie = cookies.get(app.config.get('REMEMBER_COOKIE_NAME', 'remember_token'))
+                if user_id is None and remember_cookie:
+                    user_id = decode_cookie(remember_cookie)
+                user = load_user(user_id) if user_id is not None else None
+                if user is None:
+                    return 401
+                return 200 if user.is_supervisor else 403
+            finally:
+                db.session.remove()
+
+    def _subscribe(self, notify, last_event_id):
+        # Assina antes de ler o replay para não perder eventos publicados entre as duas etapas
+        with self.app.app_context():
+            try:
+                subscriber = events.hub.subscribe(self.app, notify)
+                if subscriber is None:
+                    return None, []
+                return subscriber, events.replay(last_event_id) if last_event_id is not None else []
+            finally:
+                db.session.remove()
+
+
+def _parse_head(head):
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _version = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+def _last_event_id(headers, query):
+    value = headers.get('last-event-id') or parse_qs(query).get('last_event_id', [None])[0]
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _cors_headers(headers):
+    """CORS para o painel servido pelo waitress em outra porta do mesmo host (o cookie é o mesmo)."""
+    origin = headers.get('origin')
+    host = headers.get('host', '')
+    if not origin or urlsplit(origin).hostname != urlsplit(f'//{host}').hostname:
+        return {}
+    return {
+        'Access-Control-Allow-Origin': origin,
+        'Access-Control-Allow-Credentials': 'true',
+        'Access-Control-Allow-Headers': 'Last-Event-ID, Cache-Control',
+        'Access-Control-Allow-Methods': 'GET',
+        'Vary': 'Origin',
+    }
+
+
+def _write_head(writer, status, headers):
+    # Sem Content-Length nem chunked: o corpo vai até a conexão fechar
+    lines = [f'HTTP/1.1 {status} {_REASONS[status]}', 'Connection: close']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+
+async def _respond(writer, status, body, headers):
+    headers = dict(headers)
+    payload = b''
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers['Content-Type'] = 'application/json'
+    headers['Content-Length'] = str(len(payload))
+    _write_head(writer, status, headers)
+    writer.write(payload)
+    await writer.drain()
+
+
+def start(app, host, port):
+    """Sobe o servidor de eventos (manage.py serve com EVENTS_PORT) e o guarda em app.extensions."""
+    server = EventServer(app, host, port)
+    server.start()
+    app.extensions['events_server'] = server
+    return server
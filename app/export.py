@@ -0,0 +1,93 @@
+import csv
+import io
+
+from openpyxl import Workbook
+
+from app import db
+from app.models import User, Interaction, InteractionHistory
+
+# Quantidade de linhas lidas do banco (e escritas no CSV) por vez
+CHUNK_SIZE = 1000
+
+INTERACTION_HEADER = ['ID', 'Data', 'Atendente', 'Cliente', 'Telefone', 'Canal', 'Categoria',
+                      'Status', 'AnyDesk', 'Encerrado em', 'Descrição']
+HISTORY_HEADER = ['ID', 'Atendimento', 'Data', 'Usuário', 'Campo', 'Valor Anterior', 'Novo Valor']
+
+
+def _format_datetime(value):
+    return value.strftime('%d/%m/%Y %H:%M') if value else ''
+
+
+def interaction_rows(query):
+    """Gera as linhas dos atendimentos lendo o banco em blocos (yield_per usa cursor no servidor)."""
+    query = query.order_by(Interaction.start_time, Interaction.id).yield_per(CHUNK_SIZE)
+    for interaction in query:
+        yield [
+            interaction.id,
+            _format_datetime(interaction.start_time),
+            interaction.user.username,
+            interaction.client_name,
+            interaction.client_phone,
+            interaction.channel,
+            interaction.category,
+            interaction.status,
+            'Sim' if interaction.had_anydesk_session else 'Não',
+            _format_datetime(interaction.end_time),
+            interaction.description,
+        ]
+
+
+def history_rows(query):
+    """Gera as linhas do histórico dos atendimentos selecionados pela mesma `query` de filtros."""
+    history = db.session.query(
+        InteractionHistory.id,
+        InteractionHistory.interaction_id,
+        InteractionHistory.timestamp,
+        User.username,
+        InteractionHistory.field_changed,
+        InteractionHistory.old_value,
+        InteractionHistory.new_value,
+    ).join(Interaction, Interaction.id == InteractionHistory.interaction_id) \
+        .outerjoin(User, User.id == InteractionHistory.user_id)
+    if query.whereclause is not None:
+        history = history.filter(query.whereclause)
+    history = history.order_by(InteractionHistory.interaction_id, InteractionHistory.id).yield_per(CHUNK_SIZE)
+
+    for history_id, interaction_id, timestamp, username, field, old_value, new_value in history:
+        yield [history_id, interaction_id, _format_datetime(timestamp), username, field, old_value, new_value]
+
+
+def csv_chunks(header, rows):
+    """Converte as linhas em pedaços de CSV (separado por ';', com BOM para o Excel abrir em UTF-8)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(target, query, include_history=False):
+    """Escreve a planilha em `target` (caminho ou arquivo) no modo write-only do openpyxl.
+
+    Nesse modo as linhas vão direto para o arquivo, então a memória não cresce com o volume.
+    """
+    workbook = Workbook(write_only=True)
+
+    sheet = workbook.create_sheet('Atendimentos')
+    sheet.append(INTERACTION_HEADER)
+    for row in interaction_rows(query):
+        sheet.append(row)
+
+    if include_history:
+        sheet = workbook.create_sheet('Histórico')
+        sheet.append(HISTORY_HEADER)
+        for row in history_rows(query):
+            sheet.append(row)
+
+    workbook.save(target)
@@ -0,0 +1,38 @@
+from datetime import date, datetime, time
+from sqlalchemy.orm import joinedload
+from app.models import Interaction
+
+# Filtros aceitos na query string das listagens e exportações
+FILTER_KEYS = ('status', 'category', 'user_id', 'search_date', 'start_date', 'end_date')
+
+
+def filtered_interactions_query(args):
+    """Aplica os filtros de status, categoria, atendente e período vindos da query string.
+
+    `args` é um MultiDict (request.args ou equivalente montado pelo manage.py).
+    `search_date` filtra um único dia, como no painel; `start_date`/`end_date` um intervalo.
+    """
+    query = Interaction.query.options(joinedload(Interaction.user))
+
+    status = args.get('status')
+    if status:
+        query = query.filter(Interaction.status == status)
+
+    category = args.get('category')
+    if category:
+        query = query.filter(Interaction.category == category)
+
+    user_id = args.get('user_id', type=int)
+    if user_id:
+        query = query.filter(Interaction.user_id == user_id)
+
+    # Datas inválidas são ignoradas (o get retorna None quando a conversão falha)
+    search_date = args.get('search_date', type=date.fromisoformat)
+    start_date = args.get('start_date', type=date.fromisoformat) or search_date
+    end_date = args.get('end_date', type=date.fromisoformat) or search_date
+    if start_date:
+        query = query.filter(Interaction.start_time >= datetime.combine(start_date, time.min))
+    if end_date:
+        query = query.filter(Interaction.start_time <= datetime.combine(end_date, time.max))
+
+    return query
@@ -3,6 +3,14 @@ from wtforms import StringField, PasswordField, BooleanField, SubmitField, Selec
 from wtforms.validators import DataRequired, EqualTo, ValidationError
 from app.models import User
 
+# Opções compartilhadas entre o formulário, os filtros das listagens e os relatórios
+CHANNEL_CHOICES = [('WhatsApp', 'WhatsApp')]
+CATEGORY_CHOICES = [
+    ('Dúvida Técnica', 'Dúvida Técnica'),
+    ('Suporte', 'Suporte'),
+]
+STATUS_CHOICES = [('Aberto', 'Aberto'), ('Em Andamento', 'Em Andamento'), ('Resolvido', 'Resolvido'), ('Pendente', 'Pendente')]
+
 class LoginForm(FlaskForm):
     """Formulario para login de usuarios"""
     username = StringField('Usuário', validators=[DataRequired(message="Campo obrigatorio.")])
@@ -29,13 +37,10 @@ class InteractionForm(FlaskForm):
     """Formulário para registrar um novo atendimento."""
     client_name = StringField('Nome do Cliente', validators=[DataRequired()])
     client_phone = StringField('Telefone (WhatsApp)', validators=[DataRequired()])
-    channel = SelectField('Canal', choices=[('WhatsApp', 'WhatsApp')], validators=[DataRequired()])
-    category = SelectField('Categoria', choices=[
-        ('Dúvida Técnica', 'Dúvida Técnica'),
-        ('Suporte', 'Suporte'),
-    ], validators=[DataRequired()])
+    channel = SelectField('Canal', choices=CHANNEL_CHOICES, validators=[DataRequired()])
+    category = SelectField('Categoria', choices=CATEGORY_CHOICES, validators=[DataRequired()])
     description = TextAreaField('Descrição do Atendimento', validators=[DataRequired()])
-    status = SelectField('Status', choices=[('Aberto', 'Aberto'), ('Em Andamento', 'Em Andamento'), ('Resolvido', 'Resolvido'), ('Pendente', 'Pendente')], validators=[DataRequired()])
+    status = SelectField('Status', choices=STATUS_CHOICES, validators=[DataRequired()])
     had_anydesk_session = BooleanField('Houve acesso via AnyDesk?')
     submit_interaction = SubmitField('Registrar Atendimento')
 
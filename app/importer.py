@@ -0,0 +1,236 @@
+import csv
+import json
+import os
+import time as clock
+from datetime import date, datetime
+from itertools import islice
+
+from sqlalchemy import insert
+
+from app import db, stats, caching, sla, clients
+from app.phones import normalize_phone
+from app.forms import CHANNEL_CHOICES, CATEGORY_CHOICES, STATUS_CHOICES
+from app.models import User, Interaction, InteractionHistory, InteractionChange, ImportCheckpoint
+
+# Cabeçalhos da exportação (app/export.py) aceitos como sinônimos dos nomes dos campos
+HEADER_ALIASES = {
+    'Data': 'start_time',
+    'Atendente': 'username',
+    'Cliente': 'client_name',
+    'Telefone': 'client_phone',
+    'Canal': 'channel',
+    'Categoria': 'category',
+    'Status': 'status',
+    'AnyDesk': 'had_anydesk_session',
+    'Encerrado em': 'end_time',
+    'Descrição': 'description',
+}
+REQUIRED_FIELDS = ('username', 'client_name', 'client_phone', 'channel', 'category', 'description', 'status', 'start_time')
+VALID_CHOICES = {
+    'channel': {value for value, _ in CHANNEL_CHOICES},
+    'category': {value for value, _ in CATEGORY_CHOICES},
+    'status': {value for value, _ in STATUS_CHOICES},
+}
+TRUE_VALUES = {'1', 'true', 'sim', 's', 'yes', 'y'}
+
+
+class ImportErrorRow(ValueError):
+    """Linha rejeitada na validação."""
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, '%d/%m/%Y %H:%M')
+
+
+def _read_records(path):
+    """Lê o arquivo registro a registro (JSONL ou CSV separado por ',' ou ';')."""
+    with open(path, encoding='utf-8-sig', newline='') as source:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        first_line = source.readline()
+        source.seek(0)
+        delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+        for record in csv.DictReader(source, delimiter=delimiter):
+            yield {HEADER_ALIASES.get(key, key): value for key, value in record.items()}
+
+
+def _validate(record, user_ids):
+    """Converte um registro bruto nos valores de Interaction, com as mesmas regras do InteractionForm.
+
+    Valores de tipo inesperado (listas ou objetos no JSONL) também viram ImportErrorRow.
+    """
+    if not isinstance(record, dict):
+        raise ImportErrorRow(f'registro não é um objeto: {record!r}')
+    try:
+        return _convert(record, user_ids)
+    except (TypeError, AttributeError) as e:
+        raise ImportErrorRow(f'valor de tipo inválido: {e}')
+
+
+def _convert(record, user_ids):
+    missing = [field for field in REQUIRED_FIELDS if not str(record.get(field) or '').strip()]
+    if missing:
+        raise ImportErrorRow(f'campos obrigatórios vazios: {", ".join(missing)}')
+
+    for field, choices in VALID_CHOICES.items():
+        if record[field] not in choices:
+            raise ImportErrorRow(f'{field} inválido: {record[field]!r}')
+
+    user_id = user_ids.get(record['username'])
+    if user_id is None:
+        raise ImportErrorRow(f'atendente desconhecido: {record["username"]!r}')
+
+    history = record.get('history') or []
+    if not isinstance(history, list) or not all(isinstance(entry, dict) for entry in history):
+        raise ImportErrorRow('history deve ser uma lista de objetos')
+
+    try:
+        start_time = _parse_datetime(record['start_time'])
+        end_time = _parse_datetime(record.get('end_time'))
+        for entry in history:
+            _parse_datetime(entry.get('timestamp'))
+    except ValueError as e:
+        raise ImportErrorRow(f'data inválida: {e}')
+
+    anydesk = record.get('had_anydesk_session')
+    return dict(
+        user_id=user_id,
+        client_name=str(record['client_name']).strip()[:128],
+        client_phone=str(record['client_phone']).strip()[:40],
+        client_phone_normalized=normalize_phone(str(record['client_phone']))[:40],
+        channel=record['channel'],
+        category=record['category'],
+        description=record['description'],
+        status=record['status'],
+        had_anydesk_session=anydesk if isinstance(anydesk, bool) else str(anydesk or '').strip().lower() in TRUE_VALUES,
+        start_time=start_time,
+        end_time=end_time,
+    )
+
+
+def _history_rows(interaction_id, values, record, user_ids):
+    """Histórico do atendimento importado: a criação (como no index()) e, no JSONL, as alterações."""
+    rows = [dict(interaction_id=interaction_id, user_id=values['user_id'], timestamp=values['start_time'],
+                 field_changed='status', old_value='N/A', new_value=values['status'])]
+    for entry in record.get('history') or ():
+        rows.append(dict(
+            interaction_id=interaction_id,
+            user_id=user_ids.get(entry.get('username'), values['user_id']),
+            timestamp=_parse_datetime(entry.get('timestamp')) or values['start_time'],
+            field_changed=str(entry.get('field_changed') or '')[:50],
+            old_value=str(entry.get('old_value') or '')[:100],
+            new_value=str(entry.get('new_value') or '')[:100],
+        ))
+    return rows
+
+
+def _insert_batch(batch, user_ids):
+    """Insere um lote com inserts em massa do Core (um executemany por tabela)."""
+    values = [v for _, v in batch]
+    inserted = db.session.execute(
+        insert(Interaction).returning(Interaction.id, sort_by_parameter_order=True), values
+    ).scalars().all()
+
+    history, changes = [], []
+    now = datetime.utcnow()
+    for interaction_id, (record, row) in zip(inserted, batch):
+        history.extend(_history_rows(interaction_id, row, record, user_ids))
+        changes.append(dict(interaction_id=interaction_id, day=row['start_time'].date(),
+                            action='created', timestamp=now))
+    db.session.execute(insert(InteractionHistory), history)
+    db.session.execute(insert(InteractionChange), changes)
+    return {row['start_time'].date() for row in values}
+
+
+def _save_checkpoint(source, position, days):
+    checkpoint = db.session.get(ImportCheckpoint, source) or ImportCheckpoint(source=source)
+    checkpoint.position = position
+    checkpoint.pending_days = sorted(day.isoformat() for day in days)
+    db.session.add(checkpoint)
+
+
+def import_file(path, batch_size=5000, resume=True, rejects_path=None, progress=print):
+    """Importa atendimentos de um CSV/JSONL em lotes, retomando do último checkpoint.
+
+    Cada lote (atendimentos, histórico, log de alterações e checkpoint) é gravado
+    em uma única transação, então uma importação interrompida pode ser retomada
+    sem duplicar registros. Os dias afetados vão no checkpoint junto com cada
+    lote, e os agregados recalculados no fim incluem os dias de execuções
+    interrompidas. Retorna um dicionário com os totais.
+    """
+    source = os.path.abspath(path)
+    checkpoint = db.session.get(ImportCheckpoint, source)
+    start_position = checkpoint.position if (checkpoint and resume) else 0
+    user_ids = dict(db.session.query(User.username, User.id).all())
+
+    records = islice(_read_records(path), start_position, None)
+    position, imported, rejected = start_position, 0, 0
+    # Dias já gravados por uma execução interrompida e ainda sem os agregados recalculados
+    days = {date.fromisoformat(day) for day in (checkpoint.pending_days or ())} if checkpoint else set()
+    rejects = open(rejects_path, 'a', encoding='utf-8') if rejects_path else None
+    started = clock.perf_counter()
+
+    try:
+        while True:
+            chunk = list(islice(records, batch_size))
+            if not chunk:
+                break
+            batch, batch_rejects = [], []
+            for offset, record in enumerate(chunk, start=position + 1):
+                try:
+                    batch.append((record, _validate(record, user_ids)))
+                except ImportErrorRow as e:
+                    batch_rejects.append({'line': offset, 'error': str(e), 'record': record})
+            if batch:
+                days |= _insert_batch(batch, user_ids)
+            position += len(chunk)
+            imported += len(batch)
+            rejected += len(batch_rejects)
+            _save_checkpoint(source, position, days)
+            db.session.commit()
+            # Só depois do commit: um lote interrompido é relido na retomada e não duplica as rejeições
+            if rejects:
+                for reject in batch_rejects:
+                    rejects.write(json.dumps(reject, ensure_ascii=False, default=str) + '\n')
+
+            elapsed = clock.perf_counter() - started
+            progress(f'{position} registros lidos, {imported} importados, {rejected} rejeitados '
+                     f'({imported / elapsed:.0f} linhas/s)')
+    finally:
+        if rejects:
+            rejects.close()
+
+    # Cadastro dos clientes novos; agregados, tempos por status e cache dos dias afetados (com muitos dias, um rebuild completo sai mais barato)
+    clients.backfill()
+    if len(days) > 31:
+        stats.rebuild()
+        sla.rebuild()
+    else:
+        for day in sorted(days):
+            stats.rebuild(day)
+            sla.rebuild(day)
+    # Agregados em dia: o checkpoint não tem mais dias pendentes
+    _save_checkpoint(source, position, ())
+    db.session.commit()
+    if days:
+        caching.invalidate_all()
+
+    elapsed = clock.perf_counter() - started
+    return {
+        'read': position - start_position,
+        'imported': imported,
+        'rejected': rejected,
+        'resumed_from': start_position,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(imported / elapsed) if elapsed else imported,
+    }
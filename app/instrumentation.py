@@ -0,0 +1,242 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import Response, abort, g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+
+from app import db
+
+# Limites (em segundos) do histograma de duração das requisições
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    """Métricas por endpoint acumuladas no processo, no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration_sum = Counter()
+        self.duration_count = Counter()
+        self.sql_count = Counter()
+        self.sql_seconds = Counter()
+        self.rows = Counter()
+        self.slow_queries = Counter()
+        self.profiles = Counter()
+
+    def observe(self, endpoint, method, status, seconds, sql_count, sql_seconds, rows):
+        with self._lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            buckets = self.buckets[endpoint]
+            for i, limit in enumerate(DURATION_BUCKETS):
+                if seconds <= limit:
+                    buckets[i] += 1
+            self.duration_sum[endpoint] += seconds
+            self.duration_count[endpoint] += 1
+            self.sql_count[endpoint] += sql_count
+            self.sql_seconds[endpoint] += sql_seconds
+            self.rows[endpoint] += rows
+
+    def count(self, counter, endpoint):
+        with self._lock:
+            getattr(self, counter)[endpoint] += 1
+
+    def render(self, extra=()):
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        with self._lock:
+            family('http_requests_total', 'counter', 'Requisições atendidas.',
+                   [((('endpoint', e), ('method', m), ('status', s)), n)
+                    for (e, m, s), n in sorted(self.requests.items())])
+
+            lines.append('# HELP http_request_duration_seconds Duração das requisições.')
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for endpoint in sorted(self.buckets):
+                label = f'endpoint="{_escape(endpoint)}"'
+                for limit, n in zip(DURATION_BUCKETS, self.buckets[endpoint]):
+                    lines.append(f'http_request_duration_seconds_bucket{{{label},le="{limit}"}} {n}')
+                lines.append(f'http_request_duration_seconds_bucket{{{label},le="+Inf"}} {self.duration_count[endpoint]}')
+                lines.append(f'http_request_duration_seconds_sum{{{label}}} {self.duration_sum[endpoint]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{label}}} {self.duration_count[endpoint]}')
+
+            for name, counter, help_text in (
+                ('db_queries_total', self.sql_count, 'Queries SQL executadas.'),
+                ('db_query_duration_seconds_total', self.sql_seconds, 'Tempo gasto em queries SQL.'),
+                ('db_orm_rows_total', self.rows, 'Objetos carregados pelo ORM e linhas afetadas por INSERT/UPDATE/DELETE '
+                 '(linhas de SELECTs do Core, como agregados e exportações, não entram).'),
+                ('db_slow_queries_total', self.slow_queries, 'Queries acima de SLOW_QUERY_MS.'),
+                ('profiles_saved_total', self.profiles, 'Perfis do cProfile gravados.'),
+            ):
+                family(name, 'counter', help_text,
+                       [((('endpoint', e),), round(v, 6) if isinstance(v, float) else v)
+                        for e, v in sorted(counter.items())])
+
+        for name, kind, help_text, value in extra:
+            family(name, kind, help_text, [((), value)])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _explain(cursor, statement, parameters, dialect):
+    """Plano de execução da query, executado direto no DBAPI para não disparar os eventos de novo."""
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        return '\n'.join(' | '.join(str(col) for col in row) for row in explain_cursor.fetchall())
+    except Exception as e:
+        return f'(plano indisponível: {e})'
+    finally:
+        explain_cursor.close()
+
+
+def _count_loaded(target, context):
+    if has_request_context() and 'instrumentation' in g:
+        g.instrumentation['rows'] += 1
+
+
+def init_app(app):
+    """Liga a instrumentação por requisição quando INSTRUMENTATION está ativo.
+
+    Mede tempo total, quantidade e tempo de SQL e linhas por endpoint, registra
+    no log as queries acima de SLOW_QUERY_MS com o plano de execução, publica
+    tudo em /metrics e grava perfis do cProfile de uma amostra das requisições
+    que passarem de PROFILE_THRESHOLD_MS.
+
+    /metrics responde a supervisores logados e, com METRICS_TOKEN, a quem mandar
+    `Authorization: Bearer <token>` (o coletor do Prometheus).
+    """
+    if not app.config['INSTRUMENTATION']:
+        return
+
+    metrics = Metrics()
+    app.extensions['instrumentation'] = metrics
+    slow_query = app.config['SLOW_QUERY_MS'] / 1000
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    profile_threshold = app.config['PROFILE_THRESHOLD_MS'] / 1000
+    profile_dir = app.config['PROFILE_DIR']
+    # Só um perfil por vez: o cProfile não lida bem com várias requisições perfiladas em paralelo
+    profile_lock = threading.Lock()
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if has_request_context() and 'instrumentation' in g:
+            stats = g.instrumentation
+            stats['sql_count'] += 1
+            stats['sql_seconds'] += elapsed
+            # Linhas afetadas por DML; as lidas são contadas pelos objetos carregados pelo ORM (_count_loaded)
+            if context is not None and (context.isinsert or context.isupdate or context.isdelete) \
+                    and cursor.rowcount > 0:
+                stats['rows'] += cursor.rowcount
+        if elapsed >= slow_query:
+            endpoint = _endpoint() if has_request_context() else '-'
+            metrics.count('slow_queries', endpoint)
+            plan = '' if executemany or not statement.lstrip().upper().startswith('SELECT') \
+                else _explain(cursor, statement, parameters, engine.dialect.name)
+            app.logger.warning('Query lenta (%.1f ms) em %s:\n%s\nParâmetros: %r\nPlano:\n%s',
+                               elapsed * 1000, endpoint, statement, parameters, plan)
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_query_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+    if not event.contains(db.Model, 'load', _count_loaded):
+        event.listen(db.Model, 'load', _count_loaded, propagate=True)
+
+    @app.before_request
+    def start_request_timer():
+        g.instrumentation = Counter()
+        g.instrumentation_started = time.perf_counter()
+        g.profiler = None
+        if sample_rate and random.random() < sample_rate and profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request(response):
+        if 'instrumentation_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.instrumentation_started
+        stats = g.instrumentation
+        endpoint = _endpoint()
+        metrics.observe(endpoint, request.method, response.status_code, elapsed,
+                        stats['sql_count'], stats['sql_seconds'], stats['rows'])
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={stats["sql_seconds"] * 1000:.1f};desc="{stats["sql_count"]} queries"'
+        )
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            profile_lock.release()
+            if elapsed >= profile_threshold:
+                os.makedirs(profile_dir, exist_ok=True)
+                path = os.path.join(profile_dir, '{}_{}_{:.0f}ms.prof'.format(
+                    datetime.now().strftime('%Y%m%d-%H%M%S-%f'), endpoint, elapsed * 1000))
+                profiler.dump_stats(path)
+                metrics.count('profiles', endpoint)
+                app.logger.warning('Requisição lenta em %s (%.0f ms); perfil gravado em %s',
+                                   endpoint, elapsed * 1000, path)
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        # Se a requisição falhou antes do after_request, o profiler ainda está ligado
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            profile_lock.release()
+
+    def metrics_view():
+        # Sem token configurado, só supervisores: as métricas expõem rotas, tempos e a fila do histórico
+        token = app.config['METRICS_TOKEN']
+        if not (token and request.headers.get('Authorization') == f'Bearer {token}'):
+            if not current_user.is_authenticated:
+                abort(401)
+            if not current_user.is_supervisor:
+                abort(403)
+        from app import audit
+        extra = []
+        audit_metrics = audit.metrics()
+        if audit_metrics['enabled']:
+            extra = [
+                ('audit_queue_depth', 'gauge', 'Registros de histórico aguardando gravação.',
+                 audit_metrics['queue_depth']),
+                ('audit_flushed_total', 'counter', 'Registros de histórico gravados em lote.',
+                 audit_metrics.get('flushed', 0)),
+            ]
+        return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -1,11 +1,20 @@
 from datetime  import datetime
 from app import db, login_manager
+from app.phones import normalize_phone
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
+from app.passwords import hash_password, verify_password, needs_rehash
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    from app import caching
+    try:
+        user = caching.load_user(int(user_id))
+    except (TypeError, ValueError):
+        # Id de sessão malformado ou de formato antigo: sessão anônima, não erro 500
+        return None
+    # Conta desativada depois do login: a sessão deixa de valer
+    return user if user is not None and user.is_active else None
 
 class User(db.Model, UserMixin):
     """Modelo para os Usuarios do sistema"""
@@ -15,20 +24,52 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(64), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(256))
     is_supervisor = db.Column(db.Boolean, default=False, nullable=False)
+    # Conta desativada: não entra no sistema, mas os atendimentos e o histórico continuam
+    active = db.Column(db.Boolean, default=True, server_default='1', nullable=False)
 
     interactions = db.relationship('Interaction', backref='user', lazy='dynamic')
 
+    @property
+    def is_active(self):
+        """Usado pelo Flask-Login: contas desativadas não fazem login"""
+        return self.active
+
     def set_password(self, password):
-        """Cria um hash seguro para a senha"""
-        self.password_hash = generate_password_hash(password)
+        """Cria um hash seguro para a senha (esquema e custo definidos na configuração)"""
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Verifica se a senha fornecida corresponde ao hash"""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Indica se o hash salvo está num esquema/custo diferente do configurado"""
+        return needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
 
+class Client(db.Model):
+    """Cadastro de clientes, um por telefone normalizado (ver app/clients.py)."""
+    __tablename__ = 'clients'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), nullable=False)
+    phone = db.Column(db.String(40), nullable=False)
+    # Chave de deduplicação: os dígitos do telefone (app/phones.normalize_phone)
+    phone_normalized = db.Column(db.String(40), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    interactions = db.relationship('Interaction', backref='client', lazy='dynamic')
+
+    @validates('phone')
+    def _normalize_phone(self, key, value):
+        self.phone_normalized = normalize_phone(value)
+        return value
+
+    def __repr__(self):
+        return f'<Client {self.name}>'
+
 # app/models.py
 
 class Interaction(db.Model):
@@ -40,6 +81,10 @@ class Interaction(db.Model):
 
     client_name = db.Column(db.String(128), nullable=False, index=True)
     client_phone = db.Column(db.String(40), nullable=False)
+    # Apenas os dígitos do telefone, para buscas independentes da formatação
+    client_phone_normalized = db.Column(db.String(40), index=True)
+    # Cliente do cadastro (app/clients.py); o nome e o telefone acima ficam como foram digitados
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=True)
 
     channel = db.Column(db.String(50), nullable=False)
     had_anydesk_session = db.Column(db.Boolean, default=False)
@@ -48,14 +93,31 @@ class Interaction(db.Model):
     status = db.Column(db.String(50), default='Aberto', nullable=False)
     start_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     end_time = db.Column(db.DateTime, nullable=True)
+    # Quando o status atual começou (mantido por app/sla.py; vazio = desde start_time)
+    status_since = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Índice composto usado na paginação por cursor (start_time, id) do histórico geral
+        db.Index('ix_interactions_start_time_id', 'start_time', 'id'),
+        # Índice composto da listagem diária do atendente na página inicial
+        db.Index('ix_interactions_user_id_start_time', 'user_id', 'start_time'),
+        # Índice composto da linha do tempo do cliente
+        db.Index('ix_interactions_client_id_start_time', 'client_id', 'start_time'),
+    )
+
+    @validates('client_phone')
+    def _normalize_client_phone(self, key, value):
+        self.client_phone_normalized = normalize_phone(value)
+        return value
 
     def __repr__(self):
         return f'<Interaction {self.id}>'
 class InteractionHistory(db.Model):
     __tablename__ = 'interaction_history'
     id = db.Column(db.Integer, primary_key=True)
-    interaction_id = db.Column(db.Integer, db.ForeignKey('interactions.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    interaction_id = db.Column(db.Integer, db.ForeignKey('interactions.id'), nullable=False, index=True)
+    # Vazio quando o autor foi excluído (app/deletion.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     field_changed = db.Column(db.String(50)) # Ex: 'status'
     old_value = db.Column(db.String(100))
@@ -66,4 +128,192 @@ class InteractionHistory(db.Model):
     interaction = db.relationship('Interaction', backref=db.backref('history', lazy='dynamic', cascade='all, delete-orphan'))
 
     def __repr__(self):
-        return f'<History for Interaction {self.interaction_id}>'
\ No newline at end of file
+        return f'<History for Interaction {self.interaction_id}>'
+
+class InteractionDailyStats(db.Model):
+    """Contagem pré-agregada de atendimentos por dia, atendente, status, categoria, canal e AnyDesk.
+
+    Mantida incrementalmente pelas rotas (ver app/stats.py) para que os painéis
+    leiam O(dias) linhas em vez de varrer a tabela de atendimentos.
+    """
+    __tablename__ = 'interaction_daily_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    channel = db.Column(db.String(50), nullable=False)
+    had_anydesk_session = db.Column(db.Boolean, nullable=False)
+    total = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'status', 'category', 'channel', 'had_anydesk_session',
+                            name='uq_interaction_daily_stats_key'),
+    )
+
+    def __repr__(self):
+        return f'<DailyStats {self.day} user={self.user_id} {self.status}: {self.total}>'
+
+class InteractionDailyTotals(db.Model):
+    """Totais diários por atendente e categoria, com resolvidos e sessões AnyDesk já somados.
+
+    Resumo de InteractionDailyStats sem status/canal/AnyDesk como dimensões
+    (~8x menos linhas), para os relatórios por período (ver app/trends.py).
+    Mantida junto com os agregados diários por app/stats.py.
+    """
+    __tablename__ = 'interaction_daily_totals'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    resolved = db.Column(db.Integer, default=0, nullable=False)
+    anydesk = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'category', name='uq_interaction_daily_totals_key'),
+    )
+
+    def __repr__(self):
+        return f'<DailyTotals {self.day} user={self.user_id} {self.category}: {self.total}>'
+
+class InteractionStatusTime(db.Model):
+    """Tempo acumulado (em segundos) de um atendimento em cada status já encerrado.
+
+    O status sla.RESOLUTION guarda o tempo até a resolução (start_time -> end_time).
+    Mantida por app/sla.py junto com o histograma InteractionDurationStats.
+    """
+    __tablename__ = 'interaction_status_times'
+
+    id = db.Column(db.Integer, primary_key=True)
+    interaction_id = db.Column(db.Integer, db.ForeignKey('interactions.id'), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    seconds = db.Column(db.Float, nullable=False)
+
+    interaction = db.relationship('Interaction', backref=db.backref('status_times', lazy='dynamic', cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        db.UniqueConstraint('interaction_id', 'status', name='uq_interaction_status_times_key'),
+    )
+
+    def __repr__(self):
+        return f'<StatusTime {self.interaction_id} {self.status}: {self.seconds:.0f}s>'
+
+class InteractionDurationStats(db.Model):
+    """Histograma dos tempos por status, por dia de abertura, atendente e categoria.
+
+    Cada atendimento conta uma vez por status em `bucket` (faixa de duração, ver
+    sla.DURATION_BUCKETS), para o relatório de SLA estimar mediana e p90 sem
+    varrer o histórico a cada requisição.
+    """
+    __tablename__ = 'interaction_duration_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    bucket = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'category', 'status', 'bucket',
+                            name='uq_interaction_duration_stats_key'),
+    )
+
+    def __repr__(self):
+        return f'<DurationStats {self.day} user={self.user_id} {self.status}[{self.bucket}]: {self.total}>'
+
+class ArchivedInteraction(db.Model):
+    """Atendimento resolvido movido para o arquivo frio por `manage.py archive` (ver app/archive.py).
+
+    Uma linha por atendimento, com o histórico e os tempos por status embutidos
+    em JSON no lugar das linhas de interaction_history/interaction_status_times.
+    Os agregados diários e o histograma de SLA continuam contando o atendimento,
+    então painéis e relatórios cobrem também os períodos arquivados.
+    """
+    __tablename__ = 'archived_interactions'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False) # O mesmo id da tabela de atendimentos
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=True, index=True)
+    client_name = db.Column(db.String(128), nullable=False)
+    client_phone = db.Column(db.String(40), nullable=False)
+    channel = db.Column(db.String(50), nullable=False)
+    had_anydesk_session = db.Column(db.Boolean, default=False)
+    category = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
+    end_time = db.Column(db.DateTime, nullable=True)
+    status_since = db.Column(db.DateTime, nullable=True)
+    # [[timestamp ISO, user_id, campo, valor antigo, valor novo], ...] em ordem cronológica
+    history = db.Column(db.JSON, nullable=False)
+    # {status: segundos}, como em InteractionStatusTime
+    status_times = db.Column(db.JSON, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<ArchivedInteraction {self.id}>'
+
+class InteractionChange(db.Model):
+    """Log de alterações em atendimentos, usado como cursor pela API de polling.
+
+    Não tem chave estrangeira para interactions de propósito: as exclusões também
+    ficam registradas aqui.
+    """
+    __tablename__ = 'interaction_changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    interaction_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    action = db.Column(db.String(20), nullable=False) # 'created', 'updated', 'status_changed', 'deleted' ou 'archived'
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Serve tanto a versão do dia (max(id) por dia) quanto o polling por dia
+        db.Index('ix_interaction_changes_day_id', 'day', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Change {self.id} {self.action} interaction={self.interaction_id}>'
+
+class DashboardSnapshot(db.Model):
+    """Painel de um dia já encerrado, montado em segundo plano (ver app/dashboards.py).
+
+    `version` é o contador de alterações do dia (changes.day_version) no momento
+    da montagem: se um atendimento do dia for editado ou excluído, o contador
+    muda e o snapshot deixa de ser usado até ser remontado.
+    """
+    __tablename__ = 'dashboard_snapshots'
+
+    day = db.Column(db.Date, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    built_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    stats = db.Column(db.JSON, nullable=False) # {status: quantidade}
+    agents = db.Column(db.JSON, nullable=False) # [[user_id, quantidade], ...]
+    # [[id, user_id, cliente, categoria, status], ...] na ordem da listagem (start_time decrescente)
+    rows = db.Column(db.JSON, nullable=False)
+
+    def __repr__(self):
+        return f'<DashboardSnapshot {self.day} v{self.version}>'
+
+class ImportCheckpoint(db.Model):
+    """Posição já importada de cada arquivo, gravada na mesma transação de cada lote.
+
+    pending_days guarda os dias (ISO) com atendimentos importados cujos agregados
+    ainda não foram recalculados, para uma importação retomada recalculá-los também.
+    """
+    __tablename__ = 'import_checkpoints'
+
+    source = db.Column(db.String(255), primary_key=True)
+    position = db.Column(db.Integer, default=0, nullable=False)
+    pending_days = db.Column(db.JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImportCheckpoint {self.source}: {self.position}>'
@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+import bcrypt
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+def _is_bcrypt(password_hash):
+    return password_hash.startswith(BCRYPT_PREFIXES)
+
+
+def hash_password(password):
+    """Gera o hash da senha no esquema configurado em PASSWORD_HASH_METHOD."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method == 'bcrypt':
+        salt = bcrypt.gensalt(current_app.config['BCRYPT_LOG_ROUNDS'])
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('ascii')
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(password_hash, password):
+    """Confere a senha com o hash, qualquer que seja o esquema em que ele foi gravado."""
+    if not password_hash:
+        return False
+    if _is_bcrypt(password_hash):
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+    return check_password_hash(password_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _werkzeug_prefix(method):
+    # 'scrypt' vira 'scrypt:32768:8:1' no hash gravado; calcula uma vez por método
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """Indica se o hash foi gerado com outro esquema ou custo que o configurado."""
+    if not password_hash:
+        return False
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method == 'bcrypt':
+        rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+        return not (_is_bcrypt(password_hash) and int(password_hash[4:6]) == rounds)
+    return _is_bcrypt(password_hash) or password_hash.split('$', 1)[0] != _werkzeug_prefix(method)
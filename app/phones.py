@@ -0,0 +1,16 @@
+import re
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(phone):
+    """Reduz um telefone aos dígitos, sem o código do país (55) e sem o zero de longa distância.
+
+    '+55 (11) 98765-4321', '011 98765 4321' e '11987654321' viram '11987654321'.
+    """
+    digits = _NON_DIGITS.sub('', phone or '')
+    if digits.startswith('55') and (len(digits) in (12, 13) or (phone or '').lstrip().startswith('+')):
+        digits = digits[2:]
+    elif len(digits) in (11, 12) and digits.startswith('0'):
+        digits = digits[1:]
+    return digits
@@ -0,0 +1,58 @@
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Contador guardado no environ da requisição: o corpo de um stream_template roda num
+# contexto de aplicação novo (outro `g`), mas com o mesmo objeto de requisição
+COUNT_KEY = 'app.query_count'
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Erro levantado quando uma página executa mais queries do que o orçamento permitido."""
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        environ = request.environ
+        environ[COUNT_KEY] = environ.get(COUNT_KEY, 0) + 1
+
+
+def init_app(app):
+    """Ativa o contador de queries por requisição quando QUERY_BUDGET está configurado.
+
+    Nos testes e no modo debug, qualquer página que passe do orçamento falha, o
+    que denuncia rapidamente um N+1 nas listagens; em produção o excesso só vai
+    para o log, sem derrubar a requisição.
+
+    Páginas em streaming (stream_template, ?stream=1) executam as queries depois
+    do after_request, enquanto o corpo é enviado: para elas a conferência roda
+    quando a resposta é fechada e o cabeçalho X-Query-Count não é enviado.
+    """
+    budget = app.config.get('QUERY_BUDGET')
+    if not budget:
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    def check(endpoint, count):
+        if count > budget:
+            message = f'{endpoint} executou {count} queries (orçamento: {budget}).'
+            if app.testing or app.debug:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+
+    @app.before_request
+    def reset_query_count():
+        request.environ[COUNT_KEY] = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        environ, endpoint = request.environ, request.endpoint
+        if response.is_streamed:
+            response.call_on_close(lambda: check(endpoint, environ.get(COUNT_KEY, 0)))
+            return response
+        count = environ.get(COUNT_KEY, 0)
+        response.headers['X-Query-Count'] = str(count)
+        check(endpoint, count)
+        return response
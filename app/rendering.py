@@ -0,0 +1,94 @@
+import os
+import re
+from functools import lru_cache
+
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+# Classe do badge de cada status; status fora da lista usam a do 'Aberto', como os templates faziam
+STATUS_BADGE_CLASSES = {
+    'Resolvido': 'status-resolvido',
+    'Pendente': 'status-pendente',
+    'Em Andamento': 'status-andamento',
+    'Aberto': 'status-aberto',
+}
+DEFAULT_BADGE_CLASS = 'status-aberto'
+
+# HTML pronto dos badges dos status conhecidos, montado uma vez na importação
+_BADGES = {
+    status: Markup('<span class="badge {}">{}</span>').format(css_class, status)
+    for status, css_class in STATUS_BADGE_CLASSES.items()
+}
+
+DATETIME_FORMAT = '%d/%m/%Y %H:%M'
+DATE_FORMAT = '%d/%m/%Y'
+
+# Diretivas do strftime que viram campos do datetime num template de % (sem depender do locale)
+_DIRECTIVES = {
+    'd': ('%02d', 'day'),
+    'm': ('%02d', 'month'),
+    'Y': ('%04d', 'year'),
+    'H': ('%02d', 'hour'),
+    'M': ('%02d', 'minute'),
+    'S': ('%02d', 'second'),
+}
+
+
+def status_badge(status):
+    """O `<span class="badge ...">` do status, tirado da tabela pronta (um dict em vez de um if/elif por linha)."""
+    badge = _BADGES.get(status)
+    if badge is None:
+        badge = Markup('<span class="badge {}">{}</span>').format(DEFAULT_BADGE_CLASS, status)
+    return badge
+
+
+@lru_cache(maxsize=32)
+def _compile(fmt):
+    """Template de % e atributos equivalentes ao formato do strftime, ou None se usar outra diretiva."""
+    template, fields = [], []
+    for literal, directive in re.findall(r'([^%]*)(%.|$)', fmt):
+        template.append(literal.replace('%', '%%'))
+        if not directive:
+            continue
+        if directive == '%%':
+            template.append('%%')
+        elif directive[1] in _DIRECTIVES:
+            spec, field = _DIRECTIVES[directive[1]]
+            template.append(spec)
+            fields.append(field)
+        else:
+            return None
+    return ''.join(template), tuple(fields)
+
+
+def format_datetime(value, fmt=DATETIME_FORMAT):
+    """Data no formato `fmt`; o mesmo texto do strftime, sem chamar o strftime a cada linha. '' para None."""
+    if value is None:
+        return ''
+    compiled = _compile(fmt)
+    if compiled is None:
+        return value.strftime(fmt)
+    template, fields = compiled
+    return template % tuple([getattr(value, field) for field in fields])
+
+
+def format_date(value):
+    return format_datetime(value, DATE_FORMAT)
+
+
+def init_app(app):
+    """Registra os filtros `status_badge`, `datetime` e `date` e configura o ambiente do Jinja.
+
+    Com JINJA_BYTECODE_CACHE_DIR, os templates compilados ficam em disco e um
+    processo novo não recompila tudo na primeira requisição. Fora do debug (e sem
+    TEMPLATES_AUTO_RELOAD) o Flask já não confere a data dos arquivos a cada
+    render; o `manage.py serve` desliga isso explicitamente.
+    """
+    app.add_template_filter(status_badge, 'status_badge')
+    app.add_template_filter(format_datetime, 'datetime')
+    app.add_template_filter(format_date, 'date')
+
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
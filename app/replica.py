@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc, func, select
+
+# Engine das leituras da requisição atual, guardado em session.info por read_only()
+READ_ENGINE_KEY = 'replica_read_engine'
+BIND_KEY = 'replica'
+
+
+class ReplicaSession(Session):
+    """Sessão do Flask-SQLAlchemy que manda os SELECTs para a réplica nas views com read_only().
+
+    Flush, UPDATE/DELETE em massa e session.connection() continuam no banco
+    principal, então uma view de leitura que grave algo não escreve na réplica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = self.info.get(READ_ENGINE_KEY)
+        if engine is not None and bind is None and not self._flushing and getattr(clause, 'is_select', False):
+            return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _db():
+    return current_app.extensions['sqlalchemy']
+
+
+class ReplicaRouter:
+    """Decide se as leituras podem ir para a réplica (bind 'replica' em SQLALCHEMY_BINDS).
+
+    A defasagem é a idade da alteração mais antiga do log (interaction_changes)
+    que a réplica ainda não tem: o maior id da réplica é comparado com o do
+    principal. Acima de REPLICA_MAX_STALENESS segundos, ou se a réplica não
+    responder, as leituras voltam para o principal. A verificação é refeita a
+    cada REPLICA_CHECK_INTERVAL segundos, não em toda requisição.
+
+    Com REPLICA_SNAPSHOT_PATH e o principal em SQLite, a réplica é uma cópia
+    local do arquivo feita pela API de backup do SQLite, renovada por uma
+    thread a cada REPLICA_SNAPSHOT_INTERVAL segundos (0 deixa a renovação para
+    o `manage.py snapshot-replica`, num cron).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.max_staleness = app.config['REPLICA_MAX_STALENESS']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.snapshot_path = app.config['REPLICA_SNAPSHOT_PATH']
+        self.snapshot_interval = app.config['REPLICA_SNAPSHOT_INTERVAL']
+        self.counters = Counter()
+        self.lag = None
+        self.snapshot_at = None
+        self._usable = False
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._worker = None
+
+    @property
+    def engine(self):
+        return _db().engines[BIND_KEY]
+
+    def read_engine(self):
+        """O engine para as leituras agora: a réplica, se estiver em dia, ou None (o principal)."""
+        if self.snapshot_path and self.snapshot_interval:
+            self._ensure_worker()
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                self._usable = self._check()
+                self._checked_at = now
+            usable = self._usable
+            self.counters['replica_reads' if usable else 'primary_reads'] += 1
+        return self.engine if usable else None
+
+    def mark_failed(self):
+        """Manda as leituras para o principal até a próxima verificação."""
+        with self._lock:
+            self._usable = False
+            self._checked_at = time.monotonic()
+            self.counters['failures'] += 1
+
+    def _check(self):
+        from app.models import InteractionChange
+
+        try:
+            with self.engine.connect() as connection:
+                replica_last = connection.execute(select(func.max(InteractionChange.id))).scalar() or 0
+            with _db().engines[None].connect() as connection:
+                oldest_missing = connection.execute(
+                    select(func.min(InteractionChange.timestamp)).where(InteractionChange.id > replica_last)
+                ).scalar()
+        except exc.DBAPIError:
+            self.app.logger.warning('Réplica indisponível; leituras no banco principal.', exc_info=True)
+            self.counters['failures'] += 1
+            self.lag = None
+            return False
+        self.lag = (datetime.utcnow() - oldest_missing).total_seconds() if oldest_missing else 0.0
+        if self.lag > self.max_staleness:
+            self.counters['stale'] += 1
+            return False
+        return True
+
+    # --- Cópia local do SQLite ---
+
+    def refresh_snapshot(self):
+        """Copia o banco principal (SQLite) para REPLICA_SNAPSHOT_PATH sem bloquear os escritores.
+
+        A cópia vai para um arquivo temporário e substitui o snapshot anterior de
+        uma vez (os.replace); as conexões da réplica são descartadas para abrirem
+        o arquivo novo.
+        """
+        primary = _db().engines[None]
+        if primary.dialect.name != 'sqlite' or not primary.url.database or primary.url.database == ':memory:':
+            raise RuntimeError('O snapshot da réplica exige o banco principal num arquivo SQLite.')
+
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            temporary = f'{self.snapshot_path}.tmp'
+            source = sqlite3.connect(primary.url.database)
+            target = sqlite3.connect(temporary)
+            try:
+                # Num passo só: em WAL a leitura não bloqueia os escritores, e em vários passos a
+                # cópia recomeçaria a cada escrita feita no meio dela
+                source.backup(target)
+                # O snapshot é só leitura: sem WAL, não sobram -wal/-shm do arquivo substituído
+                target.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                target.close()
+                source.close()
+            os.replace(temporary, self.snapshot_path)
+            self.engine.dispose()
+            with self._lock:
+                self._checked_at = None
+                self.snapshot_at = datetime.utcnow()
+                self.counters['snapshots'] += 1
+            return time.perf_counter() - started
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._snapshot_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='replica-snapshot', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.refresh_snapshot()
+            except Exception:
+                self.app.logger.exception('Falha ao renovar o snapshot da réplica.')
+                with self._lock:
+                    self.counters['snapshot_errors'] += 1
+            time.sleep(self.snapshot_interval)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.counters)
+            data.update(
+                enabled=True,
+                using_replica=self._usable,
+                lag_seconds=round(self.lag, 1) if self.lag is not None else None,
+                max_staleness=self.max_staleness,
+                snapshot_at=self.snapshot_at.isoformat() if self.snapshot_at else None,
+            )
+        return data
+
+
+def _router():
+    return current_app.extensions.get('replica_router')
+
+
+def _stream_response(rv, session, router):
+    """Mantém as leituras na réplica até o fim de uma resposta em streaming (stream_template).
+
+    As queries dessas respostas rodam enquanto o corpo é enviado, depois que a
+    view retornou. Uma falha da réplica nesse ponto não tem como ser repetida no
+    principal (parte da página já saiu), mas a marca como indisponível para as
+    próximas requisições. Retorna None se `rv` não for uma resposta em streaming.
+    """
+    # stream_template devolve um gerador, que o Flask só transforma em Response depois da view
+    if isinstance(rv, (str, bytes, dict, list, tuple)) or not (isinstance(rv, Response) or hasattr(rv, '__next__')):
+        return None
+    response = current_app.make_response(rv)
+    if not response.is_streamed:
+        return None
+
+    body = response.response
+
+    def guarded():
+        try:
+            yield from body
+        except exc.OperationalError:
+            router.mark_failed()
+            raise
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    response.response = guarded()
+    # O dict da sessão desta requisição: no fechamento o contexto da aplicação pode já ter saído
+    info = session.info
+    response.call_on_close(lambda: info.pop(READ_ENGINE_KEY, None))
+    return response
+
+
+def read_only(view):
+    """Roda a view com os SELECTs na réplica (quando configurada e em dia).
+
+    Se a réplica falhar no meio da view, ela é marcada como indisponível e a
+    view roda de novo no principal; por isso só serve para views sem escrita.
+    Respostas em streaming continuam lendo da réplica até serem fechadas.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = _router()
+        engine = router.read_engine() if router is not None else None
+        if engine is None:
+            return view(*args, **kwargs)
+
+        session = _db().session
+        session.info[READ_ENGINE_KEY] = engine
+        streaming = None
+        try:
+            rv = view(*args, **kwargs)
+            streaming = _stream_response(rv, session, router)
+            return streaming if streaming is not None else rv
+        except exc.OperationalError:
+            current_app.logger.warning('Falha na réplica; repetindo a leitura no banco principal.', exc_info=True)
+            router.mark_failed()
+            session.info.pop(READ_ENGINE_KEY, None)
+            session.rollback()
+            return view(*args, **kwargs)
+        finally:
+            if streaming is None:
+                session.info.pop(READ_ENGINE_KEY, None)
+    return wrapper
+
+
+def stale_reads():
+    """True se as leituras desta requisição vêm de uma réplica que ainda não tem tudo do principal.
+
+    Usado pelo cache dos painéis para não guardar valores calculados na réplica defasada.
+    """
+    router = _router()
+    return (router is not None and READ_ENGINE_KEY in _db().session.info
+            and (router.lag is None or router.lag > 0))
+
+
+def refresh_snapshot():
+    """Renova o snapshot local da réplica (manage.py snapshot-replica); retorna os segundos gastos."""
+    router = _router()
+    if router is None or not router.snapshot_path:
+        raise RuntimeError('REPLICA_SNAPSHOT_PATH não está configurado.')
+    return router.refresh_snapshot()
+
+
+def metrics():
+    router = _router()
+    return router.metrics() if router is not None else {'enabled': False}
+
+
+def init_app(app):
+    """Liga o roteamento de leituras quando há um bind 'replica' em SQLALCHEMY_BINDS."""
+    if BIND_KEY not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+    app.extensions['replica_router'] = ReplicaRouter(app)
@@ -1,10 +1,14 @@
-from flask import render_template, flash, redirect, url_for, request, Blueprint
+from flask import render_template, stream_template, stream_with_context, flash, redirect, url_for, request, jsonify, send_file, Response, Blueprint, abort
 from flask_login import login_user, logout_user, current_user, login_required
-from app import db
-from app.models import User, Interaction, InteractionHistory
-from app.forms import LoginForm, RegistrationForm, InteractionForm, EditUserForm
-from sqlalchemy import func
+from app import db, stats, caching, export, search, audit, trends, sla, bulk, deletion, archive, clients, replica, dashboards, events
+from app.models import User, Client, Interaction, InteractionHistory
+from app.phones import normalize_phone
+from app.filters import filtered_interactions_query, FILTER_KEYS
+from app.forms import LoginForm, RegistrationForm, InteractionForm, EditUserForm, STATUS_CHOICES, CATEGORY_CHOICES
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
 from datetime import date, datetime, time
+import tempfile
 
 bp = Blueprint('main', __name__)
 
@@ -23,17 +27,14 @@ def index():
             category=interaction_form.category.data,
             description=interaction_form.description.data,
             status=interaction_form.status.data,
-            had_anydesk_session=interaction_form.had_anydesk_session.data
+            had_anydesk_session=interaction_form.had_anydesk_session.data,
+            client=clients.resolve(interaction_form.client_name.data, interaction_form.client_phone.data)
         )
         db.session.add(new_interaction)
-        history_log = InteractionHistory(
-            interaction=new_interaction,
-            user_id=current_user.id,
-            field_changed='status',
-            old_value='N/A',
-            new_value=new_interaction.status
-        )
-        db.session.add(history_log)
+        db.session.flush() # Garante o id e o start_time preenchidos para o histórico e os agregados
+        audit.record(new_interaction, current_user.id, 'status', 'N/A', new_interaction.status)
+        stats.record_created(new_interaction)
+        sla.record_created(new_interaction)
 
         db.session.commit() # Commit final
         flash('Atendimento registrado com sucesso!', 'success')
@@ -53,15 +54,12 @@ def index():
     end_of_day = datetime.combine(search_date_obj, time.max)
 
     # Query base, agora filtrando por um intervalo de tempo
-    query = Interaction.query.filter(
+    query = Interaction.query.options(joinedload(Interaction.user)).filter(
         Interaction.start_time >= start_of_day,
         Interaction.start_time <= end_of_day
     )
 
-    query = query.filter_by(user_id=current_user.id)
-
-    interactions = query.order_by(Interaction.start_time.desc()).all()
-
+    # Atendentes veem apenas os próprios atendimentos (servido pelo índice user_id + start_time)
     if not current_user.is_supervisor:
         query = query.filter_by(user_id=current_user.id)
     interactions = query.order_by(Interaction.start_time.desc()).all()
@@ -69,8 +67,21 @@ def index():
     return render_template('index.html',
                            interaction_form=interaction_form,
                            interactions=interactions,
+                           recent_clients=clients.recent(current_user.id),
                            today=date.today().isoformat())
 
+@bp.route('/search')
+@login_required
+def search_interactions():
+    q = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    # Atendentes só encontram os próprios atendimentos, como na página inicial
+    user_id = None if current_user.is_supervisor else current_user.id
+    interactions, has_next = search.search_interactions(q, page=page, user_id=user_id)
+
+    return render_template('search.html', q=q, page=page, has_next=has_next, interactions=interactions)
+
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -82,7 +93,15 @@ def login():
         if user is None or not user.check_password(form.password.data):
             flash('Usuário ou senha inválidos', 'danger')
             return redirect(url_for('main.login'))
+        if not user.is_active:
+            flash('Esta conta está desativada. Procure um administrador.', 'danger')
+            return redirect(url_for('main.login'))
         
+        if user.password_needs_rehash():
+            # Senha conferida: regrava o hash no esquema/custo atual da configuração
+            user.set_password(form.password.data)
+            db.session.commit()
+
         login_user(user, remember=form.remember_me.data)
         flash('Login efetuado com sucesso!', 'success')
         if user.is_supervisor:
@@ -121,6 +140,11 @@ def edit_interaction(interaction_id):
     form = InteractionForm(obj=interaction)
 
     if form.validate_on_submit():
+        old_stats_key = stats.stats_key(interaction)
+        old_sla_key = sla.sla_key(interaction)
+        # Mesmo instante no histórico e nos tempos por status (app/sla.py)
+        changed_at = datetime.utcnow()
+
         # Dicionário dos campos que queremos monitorar e seus nomes amigáveis
         tracked_fields = {
             'client_name': 'Nome do Cliente',
@@ -138,27 +162,18 @@ def edit_interaction(interaction_id):
     
             if old_value != new_value:
                 # Se houver mudança, cria um registro no histórico
-                history_log = InteractionHistory(
-                    interaction=interaction,
-                    user_id=current_user.id,
-                    field_changed=friendly_name,
-                    old_value=old_value,
-                    new_value=new_value
-                )
-                db.session.add(history_log)
+                audit.record(interaction, current_user.id, friendly_name, old_value, new_value, timestamp=changed_at)
     
         # Trata o campo booleano "AnyDesk" separadamente para um log mais claro
         if interaction.had_anydesk_session != form.had_anydesk_session.data:
-            history_log = InteractionHistory(
-                interaction=interaction,
-                user_id=current_user.id,
-                field_changed='Acesso via AnyDesk',
-                old_value='Sim' if interaction.had_anydesk_session else 'Não',
-                new_value='Sim' if form.had_anydesk_session.data else 'Não'
-            )
-            db.session.add(history_log)
+            audit.record(interaction, current_user.id, 'Acesso via AnyDesk',
+                         'Sim' if interaction.had_anydesk_session else 'Não',
+                         'Sim' if form.had_anydesk_session.data else 'Não', timestamp=changed_at)
     
         # Após registrar o histórico, finalmente atualiza o atendimento com os novos dados
+        # Telefone diferente (além da formatação) liga o atendimento a outro cliente
+        if interaction.client_id is None or interaction.client_phone_normalized != normalize_phone(form.client_phone.data):
+            interaction.client = clients.resolve(form.client_name.data, form.client_phone.data)
         interaction.client_name = form.client_name.data
         interaction.client_phone = form.client_phone.data
         interaction.channel = form.channel.data
@@ -166,6 +181,8 @@ def edit_interaction(interaction_id):
         interaction.description = form.description.data
         interaction.status = form.status.data
         interaction.had_anydesk_session = form.had_anydesk_session.data
+        stats.record_changed(old_stats_key, interaction)
+        sla.record_changed(old_sla_key, interaction, changed_at)
     
         db.session.commit()
         flash('Atendimento atualizado com sucesso!', 'success')
@@ -182,7 +199,8 @@ def delete_interaction(interaction_id):
         flash('Você não tem permissão para excluir este atendimento.', 'danger')
         return redirect(url_for('main.index'))
 
-    db.session.delete(interaction)
+    # DELETEs por conjunto do histórico e dos tempos, sem carregar cada registro pela relação
+    deletion.delete_interactions([interaction.id])
     db.session.commit()
     flash('Atendimento excluído com sucesso!', 'success')
     return redirect(url_for('main.index'))
@@ -190,7 +208,11 @@ def delete_interaction(interaction_id):
 @bp.route('/interaction/<int:interaction_id>/view')
 @login_required
 def view_interaction(interaction_id):
-    interaction = Interaction.query.get_or_404(interaction_id)
+    interaction = db.session.get(Interaction, interaction_id, options=[joinedload(Interaction.user)])
+    # Atendimentos arquivados (manage.py archive) são lidos do arquivo, só para consulta
+    archived = interaction is None
+    if archived:
+        interaction = archive.get(interaction_id) or abort(404)
 
     if not current_user.is_supervisor and current_user.id != interaction.user_id:
         flash('Você não tem permissão para visualizar este atendimento.', 'danger')
@@ -198,9 +220,21 @@ def view_interaction(interaction_id):
 
     history = []
     if current_user.is_supervisor:
-        history = interaction.history.order_by(InteractionHistory.timestamp.asc()).all()
+        if archived:
+            history = archive.history_entries(interaction)
+        else:
+            history = interaction.history.options(joinedload(InteractionHistory.user)).order_by(InteractionHistory.timestamp.asc()).all()
+
+    return render_template('view_interaction.html', interaction=interaction, history=history, archived=archived)
 
-    return render_template('view_interaction.html', interaction=interaction, history=history)
+@bp.route('/client/<int:client_id>')
+@login_required
+def client_timeline(client_id):
+    client = Client.query.get_or_404(client_id)
+    # Atendentes veem apenas os próprios atendimentos do cliente
+    user_id = None if current_user.is_supervisor else current_user.id
+    interactions, archived = clients.timeline(client, user_id)
+    return render_template('client_timeline.html', client=client, interactions=interactions, archived=archived)
 
 @bp.route('/admin/dashboard')
 @login_required
@@ -221,28 +255,28 @@ def admin_dashboard():
     start_of_day = datetime.combine(search_date_obj, time.min)
     end_of_day = datetime.combine(search_date_obj, time.max)
 
-    # --- NOVAS QUERIES ---
-
-    # 1. Busca todos os atendimentos do dia
-    interactions = Interaction.query.filter(
-        Interaction.start_time >= start_of_day,
-        Interaction.start_time <= end_of_day
-    ).order_by(Interaction.start_time.desc()).all()
-
-    # 2. Calcula as estatísticas por status para os cartões e para o gráfico
-    status_counts = db.session.query(
-        Interaction.status, func.count(Interaction.id)
-    ).filter(
-        Interaction.start_time >= start_of_day,
-        Interaction.start_time <= end_of_day
-    ).group_by(Interaction.status).all()
-
-    # Dicionário de estatísticas para fácil acesso
-    stats = {status: count for status, count in status_counts}
+    # Dias encerrados vêm do snapshot montado em segundo plano, enquanto o dia não mudar (app/dashboards.py)
+    snapshot = dashboards.get(search_date_obj)
+    if snapshot is not None:
+        interactions = dashboards.listing(snapshot)
+        day_stats = snapshot.stats
+        agent_counts = dict(snapshot.agents)
+    else:
+        # 1. Busca todos os atendimentos do dia (já com o atendente, evitando uma query por linha)
+        interactions = Interaction.query.options(joinedload(Interaction.user)).filter(
+            Interaction.start_time >= start_of_day,
+            Interaction.start_time <= end_of_day
+        ).order_by(Interaction.start_time.desc()).all()
+
+        # 2. Estatísticas por status para os cartões e para o gráfico (lidas dos agregados diários)
+        day_stats = caching.get_or_compute(
+            'admin_dashboard', lambda: stats.status_counts(day=search_date_obj), day=search_date_obj
+        )
+        agent_counts = stats.user_counts(search_date_obj)
 
     # Dados para o gráfico de pizza
-    chart_labels = list(stats.keys())
-    chart_values = list(stats.values())
+    chart_labels = list(day_stats.keys())
+    chart_values = list(day_stats.values())
 
     # 3. Busca a lista de atendentes
     users = User.query.filter_by(is_supervisor=False).all()
@@ -250,28 +284,32 @@ def admin_dashboard():
     return render_template('admin/dashboard.html', 
                            interactions=interactions,
                            users=users,
-                           stats=stats,
+                           agent_counts=agent_counts,
+                           stats=day_stats,
                            chart_labels=chart_labels,
                            chart_values=chart_values,
+                           events_url=events.stream_url(),
                            today=search_date_obj.isoformat())
 
 @bp.route('/admin/user/<int:user_id>')
 @login_required
+@replica.read_only
 def user_details(user_id):
     # Acesso restrito para administradores
     if not current_user.is_supervisor:
         flash('Acesso negado.', 'danger')
         return redirect(url_for('main.index'))
     user = User.query.get_or_404(user_id)
-    interactions = Interaction.query.filter_by(user_id=user.id).order_by(Interaction.start_time.desc()).all()
-    status_counts = db.session.query(
-        Interaction.status, func.count(Interaction.id)
-    ).filter(Interaction.user_id == user.id).group_by(Interaction.status).all()
-
-    stats = {status: count for status, count in status_counts}
-    stats['Total'] = sum(stats.values())
+    # Listagem paginada por cursor, como em all_interactions (índice user_id + start_time)
+    interactions, next_cursor, per_page = _keyset_page(
+        Interaction.query.filter_by(user_id=user.id).order_by(Interaction.start_time.desc(), Interaction.id.desc())
+    )
+    # Os contadores vêm dos agregados, que incluem os atendimentos arquivados (app/archive.py)
+    user_stats = stats.status_counts(user_id=user.id)
+    user_stats['Total'] = sum(user_stats.values())
 
-    return render_template('admin/user_details.html', user=user, interactions=interactions, stats=stats)
+    return render_template('admin/user_details.html', user=user, interactions=interactions, stats=user_stats,
+                           next_cursor=next_cursor, per_page=per_page)
 
 @bp.route('/admin/users')
 @login_required
@@ -359,60 +397,255 @@ def delete_user(user_id):
         return redirect(url_for('main.user_management'))
 
     user_to_delete = User.query.get_or_404(user_id)
+    username = user_to_delete.username
+
+    # Apaga os atendimentos (com histórico) em lotes e, no fim, o próprio usuário
+    deleted = deletion.delete_user(user_to_delete.id)
+
+    flash(f'O usuário {username} e todos os seus {deleted} atendimentos foram excluídos com sucesso.', 'success')
+    return redirect(url_for('main.user_management'))
 
-    # Antes de deletar o usuário, deleta os atendimentos associados a ele
-    Interaction.query.filter_by(user_id=user_to_delete.id).delete()
+@bp.route('/admin/user/<int:user_id>/toggle_active', methods=['POST'])
+@login_required
+def toggle_active(user_id):
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
 
-    db.session.delete(user_to_delete)
+    if user_id == current_user.id:
+        flash('Você não pode desativar sua própria conta.', 'danger')
+        return redirect(url_for('main.user_management'))
+
+    # Alternativa à exclusão: a conta deixa de entrar, mas os atendimentos continuam nos relatórios
+    user_to_toggle = User.query.get_or_404(user_id)
+    user_to_toggle.active = not user_to_toggle.active
     db.session.commit()
 
-    flash(f'O usuário {user_to_delete.username} e todos os seus atendimentos foram excluídos com sucesso.', 'success')
+    if user_to_toggle.active:
+        flash(f'O usuário {user_to_toggle.username} foi reativado.', 'success')
+    else:
+        flash(f'O usuário {user_to_toggle.username} foi desativado.', 'success')
+
     return redirect(url_for('main.user_management'))
 
+ALL_INTERACTIONS_PER_PAGE = 50
+ALL_INTERACTIONS_MAX_PER_PAGE = 200
+
+def _parse_cursor(cursor):
+    """Decodifica o cursor 'start_time_id' usado na paginação do histórico geral."""
+    try:
+        start_time_str, interaction_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(start_time_str), int(interaction_id)
+    except (AttributeError, ValueError):
+        return None
+
+def _make_cursor(interaction):
+    return f'{interaction.start_time.isoformat()}_{interaction.id}'
+
+def _keyset_page(query):
+    """Página de `query` (ordenada por start_time e id decrescentes) a partir do cursor e do per_page da URL.
+
+    Retorna (atendimentos, próximo cursor ou None, per_page).
+    """
+    per_page = request.args.get('per_page', ALL_INTERACTIONS_PER_PAGE, type=int)
+    per_page = min(max(per_page, 1), ALL_INTERACTIONS_MAX_PER_PAGE)
+
+    # Paginação por cursor (start_time, id): cada página continua de onde a anterior parou
+    cursor = _parse_cursor(request.args.get('cursor'))
+    if cursor:
+        cursor_time, cursor_id = cursor
+        query = query.filter(or_(
+            Interaction.start_time < cursor_time,
+            and_(Interaction.start_time == cursor_time, Interaction.id < cursor_id)
+        ))
+
+    # Busca um registro a mais apenas para saber se existe próxima página
+    interactions = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(interactions) > per_page:
+        interactions = interactions[:per_page]
+        next_cursor = _make_cursor(interactions[-1])
+    return interactions, next_cursor, per_page
+
 @bp.route('/admin/all_interactions')
 @login_required
+@replica.read_only
 def all_interactions():
     # Acesso restrito para administradores
     if not current_user.is_supervisor:
         flash('Acesso negado.', 'danger')
         return redirect(url_for('main.index'))
 
-    # Busca TODOS os atendimentos, sem filtro de data, ordenados do mais novo para o mais antigo.
-    interactions = Interaction.query.order_by(Interaction.start_time.desc()).all()
+    query = filtered_interactions_query(request.args).order_by(
+        Interaction.start_time.desc(), Interaction.id.desc()
+    )
+
+    filters = {key: request.args[key] for key in FILTER_KEYS if request.args.get(key)}
+    template_args = dict(
+        filters=filters,
+        users=User.query.order_by(User.username).all(),
+        status_choices=STATUS_CHOICES,
+        category_choices=CATEGORY_CHOICES,
+    )
+
+    # Modo streaming: envia a tabela inteira aos poucos, sem carregar tudo em memória
+    if request.args.get('stream'):
+        return stream_template('admin/all_interactions.html',
+                               interactions=query.yield_per(500),
+                               next_cursor=None,
+                               streaming=True,
+                               **template_args)
+
+    interactions, next_cursor, per_page = _keyset_page(query)
+
+    return render_template('admin/all_interactions.html',
+                           interactions=interactions,
+                           next_cursor=next_cursor,
+                           per_page=per_page,
+                           streaming=False,
+                           **template_args)
+
+@bp.route('/admin/interactions/bulk', methods=['POST'])
+@login_required
+def bulk_interactions():
+    # Acesso restrito para administradores
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+
+    # scope=filters aplica a todos os resultados dos filtros; senão, aos atendimentos marcados
+    filters = {key: request.form[key] for key in FILTER_KEYS if request.form.get(key)}
+    ids = None if request.form.get('scope') == 'filters' else request.form.getlist('ids')
+    try:
+        result = bulk.apply(request.form.get('action'), current_user.id, ids=ids,
+                            filters=request.form if ids is None else None,
+                            status=request.form.get('new_status'),
+                            user_id=request.form.get('new_user_id', type=int))
+    except ValueError as e:
+        flash(str(e), 'danger')
+    else:
+        flash(f'{result["affected"]} atendimento(s) alterado(s); '
+              f'{result["unchanged"]} já estava(m) na situação pedida.', 'success')
+    return redirect(url_for('main.all_interactions', **filters))
+
+@bp.route('/admin/export')
+@login_required
+def export_interactions():
+    # Acesso restrito para administradores
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+
+    # Mesmos filtros do histórico geral e do painel (status, categoria, atendente, datas)
+    query = filtered_interactions_query(request.args)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+
+    if request.args.get('format') == 'xlsx':
+        # O XLSX é um zip e só fica válido no final: gera em arquivo temporário e envia
+        spreadsheet = tempfile.TemporaryFile()
+        export.write_xlsx(spreadsheet, query, include_history=bool(request.args.get('include_history')))
+        spreadsheet.seek(0)
+        return send_file(spreadsheet, as_attachment=True, download_name=f'atendimentos_{stamp}.xlsx',
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    # CSV é enviado aos poucos, conforme as linhas saem do banco
+    if request.args.get('dataset') == 'history':
+        header, rows, name = export.HISTORY_HEADER, export.history_rows(query), 'historico'
+    else:
+        header, rows, name = export.INTERACTION_HEADER, export.interaction_rows(query), 'atendimentos'
 
-    return render_template('admin/all_interactions.html', interactions=interactions)
+    return Response(stream_with_context(export.csv_chunks(header, rows)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={name}_{stamp}.csv'})
 
 @bp.route('/admin/reports')
 @login_required
+@replica.read_only
 def reports():
     # Acesso restrito para administradores
     if not current_user.is_supervisor:
         flash('Acesso negado.', 'danger')
         return redirect(url_for('main.index'))
 
-    # Query 1: Atendimentos por Categoria
-    category_data = db.session.query(
-        Interaction.category, 
-        func.count(Interaction.id)
-    ).group_by(Interaction.category).order_by(func.count(Interaction.id).desc()).all()
+    # Atendimentos por Categoria e por Atendente (apenas atendentes, não admins), em cache
+    category_data, agent_data = caching.get_or_compute(
+        'reports', lambda: (stats.category_counts(), stats.agent_counts())
+    )
 
     category_labels = [row[0] for row in category_data]
     category_values = [row[1] for row in category_data]
 
     # Query 2: Atendimentos por Atendente (apenas atendentes, não admins)
-    agent_data = db.session.query(
-        User.username,
-        func.count(Interaction.id)
-    ).join(Interaction, User.id == Interaction.user_id).filter(User.is_supervisor == False).group_by(User.username).order_by(func.count(Interaction.id).desc()).all()
-
     agent_labels = [row[0] for row in agent_data]
     agent_values = [row[1] for row in agent_data]
 
+    # Séries por período (volume, taxa de resolução e AnyDesk), por atendente e por categoria
+    try:
+        start, end, granularity = trends.range_from_args(request.args)
+        trend = trends.trend_series(start, end, granularity)
+    except ValueError as e:
+        flash(f'Período inválido: {e}', 'danger')
+        start, end, granularity = trends.range_from_args({})
+        trend = trends.trend_series(start, end, granularity)
+
     return render_template(
         'admin/reports.html',
         title='Relatórios',
         category_labels=category_labels,
         category_values=category_values,
         agent_labels=agent_labels,
-        agent_values=agent_values
-    )
\ No newline at end of file
+        agent_values=agent_values,
+        trend=trend
+    )
+
+@bp.route('/admin/sla')
+@login_required
+@replica.read_only
+def sla_report():
+    # Acesso restrito para administradores
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+
+    # Mediana e p90 dos tempos em cada status, pelos atendimentos abertos no período
+    try:
+        start, end, _ = trends.range_from_args(request.args)
+        if end < start:
+            raise ValueError('A data final é anterior à inicial.')
+    except ValueError as e:
+        flash(f'Período inválido: {e}', 'danger')
+        start, end, _ = trends.range_from_args({})
+
+    return render_template('admin/sla.html', title='Tempos de Atendimento',
+                           summary=sla.summary(start, end),
+                           start=start.isoformat(), end=end.isoformat())
+
+@bp.route('/admin/cache_stats')
+@login_required
+def cache_stats():
+    # Contadores de acertos/falhas do cache dos painéis (por processo), para monitoramento
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+
+    return jsonify(caching.counters())
+
+@bp.route('/admin/audit_stats')
+@login_required
+def audit_stats():
+    # Profundidade da fila e latência das gravações do histórico em lotes (por processo)
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+
+    return jsonify(audit.metrics())
+
+@bp.route('/admin/replica_stats')
+@login_required
+def replica_stats():
+    # Defasagem da réplica de leitura e quantas leituras foram para ela ou para o principal (por processo)
+    if not current_user.is_supervisor:
+        flash('Acesso negado.', 'danger')
+        return redirect(url_for('main.index'))
+
+    return jsonify(replica.metrics())
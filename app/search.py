@@ -0,0 +1,187 @@
+import re
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Client, Interaction
+from app.phones import normalize_phone
+
+# Índice FTS5 com conteúdo externo (a própria tabela interactions), sincronizado por triggers.
+# As mesmas instruções estão na migração; ensure_index() serve para bancos criados com create_all().
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+        client_name, client_phone_normalized, description,
+        content='interactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS interactions_fts_ai AFTER INSERT ON interactions BEGIN
+        INSERT INTO interactions_fts(rowid, client_name, client_phone_normalized, description)
+        VALUES (new.id, new.client_name, new.client_phone_normalized, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS interactions_fts_ad AFTER DELETE ON interactions BEGIN
+        INSERT INTO interactions_fts(interactions_fts, rowid, client_name, client_phone_normalized, description)
+        VALUES ('delete', old.id, old.client_name, old.client_phone_normalized, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS interactions_fts_au
+    AFTER UPDATE OF client_name, client_phone_normalized, description ON interactions BEGIN
+        INSERT INTO interactions_fts(interactions_fts, rowid, client_name, client_phone_normalized, description)
+        VALUES ('delete', old.id, old.client_name, old.client_phone_normalized, old.description);
+        INSERT INTO interactions_fts(rowid, client_name, client_phone_normalized, description)
+        VALUES (new.id, new.client_name, new.client_phone_normalized, new.description);
+    END""",
+]
+
+# No PostgreSQL, uma coluna tsvector gerada pelo próprio banco com índice GIN
+POSTGRES_FTS_DDL = [
+    """ALTER TABLE interactions ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('portuguese', coalesce(client_name, '')), 'A') ||
+            setweight(to_tsvector('portuguese', coalesce(description, '')), 'B')
+        ) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_interactions_search_vector ON interactions USING gin (search_vector)""",
+]
+
+SEARCH_PER_PAGE = 20
+# Resultados mais recentes que entram no ranking por relevância do SQLite (ver _fts_ids)
+RANK_WINDOW = 2000
+_WORDS = re.compile(r'\w+', re.UNICODE)
+_PHONE_CHARS = re.compile(r'[\d\s()+.-]+')
+
+
+def ensure_index(rebuild=False):
+    """Cria o índice de busca do banco atual se ainda não existir (idempotente)."""
+    dialect = db.engine.dialect.name
+    statements = SQLITE_FTS_DDL if dialect == 'sqlite' else POSTGRES_FTS_DDL if dialect == 'postgresql' else []
+    for statement in statements:
+        db.session.execute(text(statement))
+    if rebuild and dialect == 'sqlite':
+        db.session.execute(text("INSERT INTO interactions_fts(interactions_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def _looks_like_phone(q):
+    # Só dígitos e pontuação comum de telefone, com ao menos 4 dígitos
+    return bool(_PHONE_CHARS.fullmatch(q)) and len(normalize_phone(q)) >= 4
+
+
+def _fts5_query(q):
+    """Transforma o texto digitado numa query FTS5 segura: termos entre aspas e prefixo no último."""
+    words = _WORDS.findall(q)
+    if not words:
+        return None
+    terms = ['"{}"'.format(word.replace('"', '""')) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _phone_ids(digits, user_id, limit, offset):
+    """Atendimentos cujo telefone começa ou termina com `digits`, dos mais recentes aos mais antigos.
+
+    O início usa um intervalo no índice B-tree de client_phone_normalized; o
+    final (ex.: os últimos dígitos do número) é procurado no cadastro de
+    clientes, bem menor que a tabela de atendimentos, e chega aos atendimentos
+    pelo índice de client_id.
+    """
+    upper = digits[:-1] + chr(ord(digits[-1]) + 1)
+    suffix_clients = select(Client.id).where(Client.phone_normalized.like('%' + digits))
+    query = db.session.query(Interaction.id).filter(or_(
+        (Interaction.client_phone_normalized >= digits) & (Interaction.client_phone_normalized < upper),
+        Interaction.client_id.in_(suffix_clients),
+    ))
+    if user_id:
+        query = query.filter(Interaction.user_id == user_id)
+    rows = query.order_by(Interaction.start_time.desc()).limit(limit).offset(offset).all()
+    return [row[0] for row in rows]
+
+
+def _fts_ids(q, user_id, limit, offset):
+    """Resultados do FTS5 do SQLite: os RANK_WINDOW mais recentes por relevância, depois os demais por data.
+
+    Calcular o bm25 de todos os resultados custa caro com termos comuns (centenas
+    de ms quando o termo aparece em 1/4 de 1M de atendimentos), então o ranking é
+    feito só sobre os RANK_WINDOW resultados de maior rowid, os mais recentes, que
+    o FTS5 entrega em ordem e sem ler o resto. Páginas além dessa janela seguem
+    com os resultados mais antigos em ordem de data, sem ranking: nada fica de
+    fora da busca, mas um resultado antigo muito relevante aparece depois dos
+    recentes.
+    """
+    user_join = 'JOIN interactions ON interactions.id = interactions_fts.rowid' if user_id else ''
+    user_filter = 'AND interactions.user_id = :user_id' if user_id else ''
+    matches = f"""
+        FROM interactions_fts {user_join}
+        WHERE interactions_fts MATCH :q {user_filter}
+        ORDER BY interactions_fts.rowid DESC"""
+    params = {'q': _fts5_query(q), 'user_id': user_id, 'window': RANK_WINDOW}
+    if not params['q']:
+        return []
+
+    ids = []
+    if offset < RANK_WINDOW:
+        # Nome pesa mais que telefone e descrição; empates ficam com o mais recente
+        sql = f"""
+            SELECT id FROM (
+                SELECT interactions_fts.rowid AS id, bm25(interactions_fts, 10.0, 5.0, 1.0) AS score {matches}
+                LIMIT :window
+            )
+            ORDER BY score, id DESC LIMIT :limit OFFSET :offset"""
+        ids = [row[0] for row in db.session.execute(text(sql), dict(params, limit=limit, offset=offset))]
+    if offset + limit > RANK_WINDOW:
+        older = dict(params, limit=offset + limit - max(offset, RANK_WINDOW), offset=max(offset, RANK_WINDOW))
+        sql = f"SELECT interactions_fts.rowid AS id {matches} LIMIT :limit OFFSET :offset"
+        ids += [row[0] for row in db.session.execute(text(sql), older)]
+    return ids
+
+
+def _text_ids(q, user_id, limit, offset):
+    dialect = db.engine.dialect.name
+    user_filter = 'AND interactions.user_id = :user_id' if user_id else ''
+    params = {'limit': limit, 'offset': offset, 'user_id': user_id}
+
+    if dialect == 'sqlite':
+        return _fts_ids(q, user_id, limit, offset)
+
+    if dialect == 'postgresql':
+        params['q'] = q
+        sql = f"""
+            SELECT id FROM interactions
+            WHERE search_vector @@ websearch_to_tsquery('portuguese', :q) {user_filter}
+            ORDER BY ts_rank(search_vector, websearch_to_tsquery('portuguese', :q)) DESC, start_time DESC
+            LIMIT :limit OFFSET :offset"""
+        return [row[0] for row in db.session.execute(text(sql), params)]
+
+    # Outros bancos: LIKE simples, sem ranking
+    pattern = f'%{q}%'
+    query = db.session.query(Interaction.id).filter(
+        or_(Interaction.client_name.ilike(pattern), Interaction.description.ilike(pattern))
+    )
+    if user_id:
+        query = query.filter(Interaction.user_id == user_id)
+    rows = query.order_by(Interaction.start_time.desc()).limit(limit).offset(offset).all()
+    return [row[0] for row in rows]
+
+
+def search_interactions(q, page=1, per_page=SEARCH_PER_PAGE, user_id=None):
+    """Busca atendimentos por nome do cliente, telefone ou descrição, em ordem de relevância.
+
+    Retorna (atendimentos, tem_proxima_pagina). `user_id` restringe aos atendimentos de um atendente.
+    """
+    q = (q or '').strip()
+    if not q:
+        return [], False
+
+    offset = (page - 1) * per_page
+    if _looks_like_phone(q):
+        ids = _phone_ids(normalize_phone(q), user_id, per_page + 1, offset)
+    else:
+        ids = _text_ids(q, user_id, per_page + 1, offset)
+
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    if not ids:
+        return [], False
+
+    # Carrega os atendimentos de uma vez e mantém a ordem de relevância
+    by_id = {i.id: i for i in Interaction.query.options(joinedload(Interaction.user))
+             .filter(Interaction.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id], has_next
@@ -0,0 +1,161 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import insert
+
+from app import db, stats, caching, sla, clients
+from app.forms import CHANNEL_CHOICES, CATEGORY_CHOICES, STATUS_CHOICES
+from app.models import User, Interaction, InteractionHistory, InteractionChange
+from app.phones import normalize_phone
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elaine', 'Fábio', 'Gabriela', 'Hugo', 'Íris', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória', 'Wagner']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Ferreira', 'Almeida',
+              'Ribeiro', 'Carvalho', 'Gomes', 'Martins', 'Araújo', 'Barbosa', 'Rocha', 'Dias', 'Moura']
+WORDS = ['impressora', 'sistema', 'senha', 'acesso', 'nota', 'fiscal', 'erro', 'instalação', 'atualização',
+         'backup', 'certificado', 'rede', 'internet', 'lento', 'travando', 'relatório', 'boleto', 'cadastro',
+         'estoque', 'venda', 'cupom', 'servidor', 'licença', 'configuração', 'cliente', 'pedido', 'integração']
+
+# Distribuições aproximadas do atendimento real: a maioria resolvida, mais dúvidas técnicas que suporte,
+# picos no fim da manhã e no meio da tarde e pouco movimento no fim de semana
+STATUS_WEIGHTS = {'Resolvido': 60, 'Aberto': 15, 'Em Andamento': 15, 'Pendente': 10}
+CATEGORY_WEIGHTS = {'Dúvida Técnica': 65, 'Suporte': 35}
+HOUR_WEIGHTS = [0] * 7 + [2, 6, 10, 12, 11, 5, 7, 11, 12, 10, 7, 3, 1] + [0] * 4
+WEEKDAY_WEIGHTS = [10, 10, 10, 10, 9, 3, 1]
+# Caminho de status até o final de cada atendimento (gera as linhas de histórico)
+STATUS_PATHS = {
+    'Aberto': ['Aberto'],
+    'Em Andamento': ['Aberto', 'Em Andamento'],
+    'Pendente': ['Aberto', 'Em Andamento', 'Pendente'],
+    'Resolvido': ['Aberto', 'Em Andamento', 'Resolvido'],
+}
+SEED_PASSWORD = 'senha123'
+
+
+def _weighted(choices, weights):
+    """Valores e pesos acumulados (cum_weights evita o random.choices recalcular a cada sorteio)."""
+    values = [value for value, _ in choices]
+    return values, list(accumulate(weights.get(value, 1) for value in values))
+
+
+def _ensure_users(agents):
+    """Cria o supervisor e os atendentes que faltarem (todos com a senha SEED_PASSWORD)."""
+    template = User(username='-')
+    template.set_password(SEED_PASSWORD)
+    existing = {username for username, in db.session.query(User.username)}
+    usernames = ['supervisor'] + [f'atendente_{n:03d}' for n in range(1, agents + 1)]
+    db.session.add_all(User(username=username, password_hash=template.password_hash,
+                            is_supervisor=username == 'supervisor')
+                       for username in usernames if username not in existing)
+    db.session.commit()
+    return [user_id for user_id, in db.session.query(User.id)
+            .filter(User.username.in_(usernames[1:])).order_by(User.id)]
+
+
+class _Generator:
+    def __init__(self, user_ids, days, rnd, now):
+        self.rnd = rnd
+        self.now = now
+        self.days = days
+        self.user_ids = user_ids
+        # Poucos atendentes concentram boa parte dos atendimentos (pesos ~ 1/posição)
+        self.user_weights = list(accumulate(1 / (i + 1) ** 0.5 for i in range(len(user_ids))))
+        self.statuses, self.status_weights = _weighted(STATUS_CHOICES, STATUS_WEIGHTS)
+        self.categories, self.category_weights = _weighted(CATEGORY_CHOICES, CATEGORY_WEIGHTS)
+        self.channels = [value for value, _ in CHANNEL_CHOICES]
+        # Carteira de clientes: a maioria volta mais de uma vez
+        self.clients = [
+            (f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {n}', f'(11) 9{rnd.randrange(10 ** 8):08d}')
+            for n in range(max(100, days * 20))
+        ]
+        self.day_offsets = list(range(days))
+        start = now.date()
+        self.day_weights = list(accumulate(WEEKDAY_WEIGHTS[(start - timedelta(days=d)).weekday()]
+                                           for d in self.day_offsets))
+        self.hours, self.hour_weights = range(24), list(accumulate(HOUR_WEIGHTS))
+
+    def start_time(self):
+        rnd = self.rnd
+        day = self.now.date() - timedelta(days=rnd.choices(self.day_offsets, cum_weights=self.day_weights)[0])
+        hour = rnd.choices(self.hours, cum_weights=self.hour_weights)[0]
+        start = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, seconds=rnd.randrange(3600))
+        return min(start, self.now)
+
+    def interaction(self):
+        rnd = self.rnd
+        client_name, client_phone = rnd.choice(self.clients)
+        category = rnd.choices(self.categories, cum_weights=self.category_weights)[0]
+        status = rnd.choices(self.statuses, cum_weights=self.status_weights)[0]
+        start_time = self.start_time()
+        # Duração log-normal (mediana ~15 min) só para os resolvidos
+        end_time = start_time + timedelta(minutes=rnd.lognormvariate(2.7, 0.8)) if status == 'Resolvido' else None
+        return dict(
+            user_id=rnd.choices(self.user_ids, cum_weights=self.user_weights)[0],
+            client_name=client_name,
+            client_phone=client_phone,
+            client_phone_normalized=normalize_phone(client_phone),
+            channel=rnd.choice(self.channels),
+            category=category,
+            description=' '.join(rnd.choices(WORDS, k=rnd.randint(4, 12))),
+            status=status,
+            had_anydesk_session=rnd.random() < (0.4 if category == 'Dúvida Técnica' else 0.1),
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+    def history(self, interaction_id, row):
+        path = STATUS_PATHS[row['status']]
+        rows = [dict(interaction_id=interaction_id, user_id=row['user_id'], timestamp=row['start_time'],
+                     field_changed='status', old_value='N/A', new_value=path[0])]
+        timestamp = row['start_time']
+        final_time = row['end_time'] or row['start_time'] + timedelta(hours=2)
+        # A última mudança cai em final_time (para os resolvidos, o end_time)
+        step = (final_time - timestamp) / max(len(path) - 1, 1)
+        for old_value, new_value in zip(path, path[1:]):
+            timestamp += step
+            rows.append(dict(interaction_id=interaction_id, user_id=row['user_id'], timestamp=timestamp,
+                             field_changed='Status', old_value=old_value, new_value=new_value))
+        return rows
+
+
+def seed(interactions, agents=20, days=180, batch_size=10000, random_seed=42, progress=print):
+    """Completa o banco com dados sintéticos até ter `interactions` atendimentos.
+
+    Cria o supervisor ('supervisor') e `agents` atendentes ('atendente_001'...),
+    todos com a senha SEED_PASSWORD, e insere atendimentos espalhados pelos
+    últimos `days` dias com histórico e log de alterações, em lotes do Core.
+    Com a mesma semente os sorteios se repetem (as datas são relativas a hoje).
+    Preenche o cadastro de clientes e recalcula os agregados e os tempos por status no fim.
+    """
+    user_ids = _ensure_users(agents)
+    existing = db.session.query(Interaction.id).count()
+    remaining = interactions - existing
+    if remaining <= 0:
+        return existing
+
+    rnd = random.Random(f'{random_seed}:{existing}')
+    generator = _Generator(user_ids, days, rnd, datetime.utcnow().replace(microsecond=0))
+    created = 0
+    while created < remaining:
+        rows = [generator.interaction() for _ in range(min(batch_size, remaining - created))]
+        ids = db.session.execute(
+            insert(Interaction).returning(Interaction.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        history, changes = [], []
+        for interaction_id, row in zip(ids, rows):
+            history.extend(generator.history(interaction_id, row))
+            changes.append(dict(interaction_id=interaction_id, day=row['start_time'].date(),
+                                action='created', timestamp=row['start_time']))
+        db.session.execute(insert(InteractionHistory), history)
+        db.session.execute(insert(InteractionChange), changes)
+        db.session.commit()
+        created += len(rows)
+        progress(f'{existing + created}/{interactions} atendimentos')
+
+    clients.backfill()
+    stats.rebuild()
+    sla.rebuild()
+    db.session.commit()
+    caching.invalidate_all()
+    return existing + created
@@ -0,0 +1,409 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, insert, select, tuple_, update
+
+from app import db
+from app.forms import STATUS_CHOICES
+from app.models import (User, Interaction, InteractionHistory, InteractionStatusTime, InteractionDurationStats,
+                        ArchivedInteraction)
+from app.stats import RESOLVED_STATUS, upsert_counters, upsert_counters_many
+
+# Pseudo-status com o tempo até a resolução (da abertura até o último 'Resolvido')
+RESOLUTION = 'Resolução'
+# Limites superiores (em segundos) das faixas do histograma; a última faixa é "acima de 30 dias"
+DURATION_BUCKETS = (
+    60, 5 * 60, 10 * 60, 15 * 60, 30 * 60,
+    3600, 2 * 3600, 4 * 3600, 8 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+)
+# Dimensões do histograma (a ordem segue a UniqueConstraint do modelo)
+KEY_FIELDS = ('day', 'user_id', 'category', 'status', 'bucket')
+# Atendimentos por lote no rebuild e nas operações em massa (também o tamanho dos IN (...))
+BATCH_SIZE = 5000
+
+
+def bucket_for(seconds):
+    """Índice da faixa de DURATION_BUCKETS que contém `seconds`."""
+    return bisect_left(DURATION_BUCKETS, seconds)
+
+
+def sla_key(interaction):
+    """Estado do atendimento que as durações dependem: (dia de abertura, atendente, categoria, status)."""
+    return (interaction.start_time.date(), interaction.user_id, interaction.category, interaction.status)
+
+
+def _count(key, status, seconds, delta):
+    day, user_id, category = key
+    upsert_counters(InteractionDurationStats, KEY_FIELDS,
+                    (day, user_id, category, status, bucket_for(seconds)), {'total': delta})
+
+
+def _times(interaction):
+    return {row.status: row for row in InteractionStatusTime.query.filter_by(interaction_id=interaction.id)}
+
+
+def _set_time(interaction, key, times, status, seconds):
+    """Troca o tempo de `status` do atendimento (None remove) e move a contagem no histograma."""
+    row = times.get(status)
+    if row is not None:
+        _count(key, status, row.seconds, -1)
+        if seconds is None:
+            db.session.delete(row)
+            del times[status]
+        else:
+            row.seconds = seconds
+    elif seconds is not None:
+        times[status] = row = InteractionStatusTime(interaction_id=interaction.id, status=status, seconds=seconds)
+        db.session.add(row)
+    if seconds is not None:
+        _count(key, status, seconds, 1)
+
+
+def record_created(interaction):
+    """Marca o início do status do atendimento novo. Deve ser chamado após o flush (start_time preenchido).
+
+    Atendimento já registrado como resolvido ganha end_time = start_time, mas
+    não entra no tempo até a resolução (a duração real não é conhecida).
+    """
+    interaction.status_since = interaction.start_time
+    if interaction.status == RESOLVED_STATUS and interaction.end_time is None:
+        interaction.end_time = interaction.start_time
+
+
+def _transition_times(current, old_status, new_status, start_time, status_since, when):
+    """Tempos que mudam quando o status passa de `old_status` a `new_status` em `when`.
+
+    `current` é {status: segundos} do atendimento. Retorna {status: segundos ou
+    None (remover)}: o tempo no status que terminou soma ao que já havia; ao
+    resolver, entra o tempo até a resolução, e ao reabrir um resolvido, sai.
+    """
+    changed = {}
+    if old_status != RESOLVED_STATUS:
+        spent = max((when - (status_since or start_time)).total_seconds(), 0)
+        changed[old_status] = current.get(old_status, 0) + spent
+    if new_status == RESOLVED_STATUS:
+        changed[RESOLUTION] = max((when - start_time).total_seconds(), 0)
+    elif old_status == RESOLVED_STATUS:
+        changed[RESOLUTION] = None
+    return changed
+
+
+def record_changed(old_key, interaction, when):
+    """Atualiza end_time, o início do status e os tempos por status após uma edição.
+
+    `old_key` é o sla_key() de antes da edição e `when`, o instante da mudança
+    (o mesmo gravado no histórico). Ao resolver, end_time = `when`; ao reabrir
+    um resolvido, end_time volta a vazio.
+    """
+    old_day, old_user_id, old_category, old_status = old_key
+    old_dims, new_dims = (old_day, old_user_id, old_category), sla_key(interaction)[:3]
+    if old_status == interaction.status and old_dims == new_dims:
+        return
+
+    times = _times(interaction)
+    if old_dims != new_dims:
+        for status, row in times.items():
+            _count(old_dims, status, row.seconds, -1)
+            _count(new_dims, status, row.seconds, 1)
+
+    if old_status == interaction.status:
+        return
+    current = {status: row.seconds for status, row in times.items()}
+    for status, seconds in _transition_times(current, old_status, interaction.status, interaction.start_time,
+                                             interaction.status_since, when).items():
+        _set_time(interaction, new_dims, times, status, seconds)
+    if interaction.status == RESOLVED_STATUS:
+        interaction.end_time = when
+    elif old_status == RESOLVED_STATUS:
+        interaction.end_time = None
+    interaction.status_since = when
+
+
+def record_deleted(interaction):
+    """Tira do histograma os tempos do atendimento (as linhas saem junto com ele, em cascata)."""
+    dims = sla_key(interaction)[:3]
+    for status, row in _times(interaction).items():
+        _count(dims, status, row.seconds, -1)
+
+
+def forget_user(user_id):
+    """Remove os tempos de um atendente cujos atendimentos serão apagados."""
+    InteractionDurationStats.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    InteractionStatusTime.query.filter(
+        InteractionStatusTime.interaction_id.in_(select(Interaction.id).where(Interaction.user_id == user_id))
+    ).delete(synchronize_session=False)
+
+
+# --- Operações em massa (app/bulk.py) ---
+# `rows` são linhas com id, user_id, category, status, start_time e status_since,
+# lidas antes do UPDATE/DELETE; estas funções não alteram a tabela de atendimentos.
+
+def _load_times(interaction_ids):
+    times = defaultdict(dict)
+    for start in range(0, len(interaction_ids), BATCH_SIZE):
+        chunk = interaction_ids[start:start + BATCH_SIZE]
+        for interaction_id, status, seconds in db.session.execute(
+            select(InteractionStatusTime.interaction_id, InteractionStatusTime.status, InteractionStatusTime.seconds)
+            .where(InteractionStatusTime.interaction_id.in_(chunk))
+        ):
+            times[interaction_id][status] = seconds
+    return times
+
+
+def _apply_histogram(deltas):
+    upsert_counters_many(InteractionDurationStats, KEY_FIELDS,
+                         {key: {'total': delta} for key, delta in deltas.items() if delta})
+
+
+def bulk_status_change(rows, new_status, when):
+    """record_changed() para vários atendimentos que passam a `new_status` em `when`.
+
+    Substitui os tempos alterados com um DELETE e um INSERT de várias linhas e
+    soma as mudanças do histograma por chave. O end_time e o status_since ficam
+    no UPDATE de app/bulk.py.
+    """
+    times = _load_times([row.id for row in rows])
+    histogram, replaced, inserted = Counter(), [], []
+    for row in rows:
+        dims = (row.start_time.date(), row.user_id, row.category)
+        current = times.get(row.id, {})
+        changed = _transition_times(current, row.status, new_status, row.start_time, row.status_since, when)
+        for status, seconds in changed.items():
+            if status in current:
+                histogram[dims + (status, bucket_for(current[status]))] -= 1
+                replaced.append((row.id, status))
+            if seconds is not None:
+                histogram[dims + (status, bucket_for(seconds))] += 1
+                inserted.append({'interaction_id': row.id, 'status': status, 'seconds': seconds})
+
+    for start in range(0, len(replaced), BATCH_SIZE):
+        InteractionStatusTime.query.filter(
+            tuple_(InteractionStatusTime.interaction_id, InteractionStatusTime.status)
+            .in_(replaced[start:start + BATCH_SIZE])
+        ).delete(synchronize_session=False)
+    if inserted:
+        db.session.execute(insert(InteractionStatusTime), inserted)
+    _apply_histogram(histogram)
+
+
+def bulk_reassign(rows, new_user_id):
+    """Move para o novo atendente as contagens do histograma dos atendimentos."""
+    times = _load_times([row.id for row in rows])
+    histogram = Counter()
+    for row in rows:
+        day = row.start_time.date()
+        for status, seconds in times.get(row.id, {}).items():
+            histogram[(day, row.user_id, row.category, status, bucket_for(seconds))] -= 1
+            histogram[(day, new_user_id, row.category, status, bucket_for(seconds))] += 1
+    _apply_histogram(histogram)
+
+
+def bulk_delete(rows):
+    """Tira do histograma e apaga os tempos dos atendimentos que serão excluídos."""
+    ids = [row.id for row in rows]
+    times = _load_times(ids)
+    histogram = Counter()
+    for row in rows:
+        for status, seconds in times.get(row.id, {}).items():
+            histogram[(row.start_time.date(), row.user_id, row.category, status, bucket_for(seconds))] -= 1
+    _apply_histogram(histogram)
+    for start in range(0, len(ids), BATCH_SIZE):
+        InteractionStatusTime.query.filter(
+            InteractionStatusTime.interaction_id.in_(ids[start:start + BATCH_SIZE])
+        ).delete(synchronize_session=False)
+
+
+def replay(start_time, transitions):
+    """Reconstitui os tempos de um atendimento a partir das mudanças de status do histórico.
+
+    `transitions` é uma lista de (timestamp, antigo, novo) em ordem cronológica,
+    com a criação como ('N/A', status). Retorna ({status: segundos}, início do
+    status atual, instante da resolução ou None), com as mesmas regras de
+    record_changed().
+    """
+    times = Counter()
+    since, resolved_at = start_time, None
+    for timestamp, old, new in transitions:
+        if timestamp is None or old == new:
+            continue
+        if old == 'N/A':
+            # Criação: o status inicial começa em start_time, como em record_created()
+            continue
+        if old != RESOLVED_STATUS:
+            times[old] += max((timestamp - since).total_seconds(), 0)
+        if new == RESOLVED_STATUS:
+            resolved_at = timestamp
+        elif old == RESOLVED_STATUS:
+            resolved_at = None
+        since = timestamp
+    if resolved_at is not None:
+        times[RESOLUTION] = max((resolved_at - start_time).total_seconds(), 0)
+    return dict(times), since, resolved_at
+
+
+def _status_transitions(interaction_ids):
+    """{interaction_id: [(timestamp, antigo, novo)]} das mudanças de status ('status' na criação, 'Status' nas edições)."""
+    rows = db.session.execute(
+        select(InteractionHistory.interaction_id, InteractionHistory.timestamp,
+               InteractionHistory.old_value, InteractionHistory.new_value)
+        .where(InteractionHistory.interaction_id.in_(interaction_ids),
+               func.lower(InteractionHistory.field_changed) == 'status')
+        .order_by(InteractionHistory.interaction_id, InteractionHistory.timestamp, InteractionHistory.id)
+    )
+    transitions = defaultdict(list)
+    for interaction_id, timestamp, old, new in rows:
+        transitions[interaction_id].append((timestamp, old, new))
+    return transitions
+
+
+def rebuild(day=None):
+    """Recalcula tempos por status, status_since, end_time e o histograma a partir do histórico.
+
+    Todos os atendimentos ou só os abertos em `day`; o histograma inclui os
+    arquivados, a partir dos tempos guardados no arquivo. O end_time só é preenchido
+    quando está vazio (o importado ou gerado é mantido). Usado no backfill e
+    para corrigir divergências; não faz commit.
+    """
+    conditions = [Interaction.start_time.is_not(None)]
+    histogram_delete = InteractionDurationStats.query
+    if day is not None:
+        conditions += [Interaction.start_time >= datetime.combine(day, time.min),
+                       Interaction.start_time < datetime.combine(day + timedelta(days=1), time.min)]
+        histogram_delete = histogram_delete.filter(InteractionDurationStats.day == day)
+    histogram_delete.delete(synchronize_session=False)
+    InteractionStatusTime.query.filter(
+        InteractionStatusTime.interaction_id.in_(select(Interaction.id).where(*conditions))
+    ).delete(synchronize_session=False)
+
+    histogram = Counter()
+    last_id = 0
+    while True:
+        # Paginação por id, para não manter um cursor aberto sobre a tabela que está sendo atualizada
+        batch = db.session.execute(
+            select(Interaction.id, Interaction.user_id, Interaction.category, Interaction.status,
+                   Interaction.start_time, Interaction.end_time)
+            .where(*conditions, Interaction.id > last_id)
+            .order_by(Interaction.id).limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        transitions = _status_transitions([row.id for row in batch])
+
+        time_rows, updates = [], []
+        for row in batch:
+            times, since, resolved_at = replay(row.start_time, transitions.get(row.id, ()))
+            end_time = row.end_time
+            if row.status == RESOLVED_STATUS and end_time is None:
+                end_time = resolved_at or row.start_time
+            updates.append({'id': row.id, 'status_since': since, 'end_time': end_time})
+            for status, seconds in times.items():
+                time_rows.append({'interaction_id': row.id, 'status': status, 'seconds': seconds})
+                histogram[(row.start_time.date(), row.user_id, row.category, status, bucket_for(seconds))] += 1
+
+        db.session.execute(update(Interaction), updates)
+        if time_rows:
+            db.session.execute(insert(InteractionStatusTime), time_rows)
+
+    # Arquivados (app/archive.py): os tempos já vêm calculados, sem reprocessar o histórico
+    archived = ArchivedInteraction
+    archive_conditions = []
+    if day is not None:
+        archive_conditions = [archived.start_time >= datetime.combine(day, time.min),
+                              archived.start_time < datetime.combine(day + timedelta(days=1), time.min)]
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(archived.id, archived.user_id, archived.category, archived.start_time, archived.status_times)
+            .where(*archive_conditions, archived.id > last_id)
+            .order_by(archived.id).limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for row in batch:
+            for status, seconds in row.status_times.items():
+                histogram[(row.start_time.date(), row.user_id, row.category, status, bucket_for(seconds))] += 1
+
+    if histogram:
+        db.session.execute(insert(InteractionDurationStats),
+                           [dict(zip(KEY_FIELDS, key), total=total) for key, total in histogram.items()])
+
+
+# --- Leitura ---
+
+def percentile(counts, q):
+    """Estimativa do quantil `q` (0-1) a partir das contagens por faixa, interpolando dentro da faixa."""
+    total = sum(counts)
+    if not total:
+        return None
+    target, accumulated = q * total, 0
+    for i, count in enumerate(counts):
+        if count and accumulated + count >= target:
+            lower = DURATION_BUCKETS[i - 1] if i else 0
+            upper = DURATION_BUCKETS[i] if i < len(DURATION_BUCKETS) else lower
+            return lower + (upper - lower) * (target - accumulated) / count
+        accumulated += count
+    return DURATION_BUCKETS[-1]
+
+
+def _summarize(counts):
+    return {'count': sum(counts), 'median': percentile(counts, 0.5), 'p90': percentile(counts, 0.9)}
+
+
+def status_order():
+    """Status na ordem do formulário (sem o final, 'Resolvido'), seguidos do tempo até a resolução."""
+    return [value for value, _ in STATUS_CHOICES if value != RESOLVED_STATUS] + [RESOLUTION]
+
+
+def summary(start, end):
+    """Mediana, p90 e quantidade de atendimentos por status, no geral e por atendente e categoria.
+
+    Considera os atendimentos abertos entre `start` e `end` (inclusive). Lê só o
+    histograma (uma linha por dia/atendente/categoria/status/faixa).
+    """
+    stats = InteractionDurationStats
+    rows = db.session.execute(
+        select(stats.user_id, stats.category, stats.status, stats.bucket, func.sum(stats.total))
+        .where(stats.day >= start, stats.day <= end)
+        .group_by(stats.user_id, stats.category, stats.status, stats.bucket)
+    ).all()
+    usernames = dict(db.session.query(User.id, User.username))
+
+    size = len(DURATION_BUCKETS) + 1
+    overall = defaultdict(lambda: [0] * size)
+    detailed = defaultdict(lambda: [0] * size)
+    for user_id, category, status, bucket, total in rows:
+        if not total:
+            continue
+        overall[status][bucket] += int(total)
+        detailed[(usernames.get(user_id, '?'), category, status)][bucket] += int(total)
+
+    order = {status: i for i, status in enumerate(status_order())}
+    return {
+        'overall': [dict(status=status, **_summarize(overall[status]))
+                    for status in status_order() if status in overall],
+        'rows': [dict(username=username, category=category, status=status, **_summarize(counts))
+                 for (username, category, status), counts in
+                 sorted(detailed.items(), key=lambda item: (item[0][0], item[0][1], order.get(item[0][2], len(order))))],
+    }
+
+
+def format_duration(seconds):
+    """Duração legível ('45 s', '12 min', '3,5 h', '2,0 dias'); '-' quando não há dado."""
+    if seconds is None:
+        return '-'
+    if seconds < 60:
+        return f'{seconds:.0f} s'
+    if seconds < 3600:
+        return f'{seconds / 60:.0f} min'
+    if seconds < 86400:
+        return f'{seconds / 3600:.1f} h'.replace('.', ',')
+    return f'{seconds / 86400:.1f} dias'.replace('.', ',')
+
+
+def init_app(app):
+    """Registra o filtro `duration` dos templates."""
+    app.add_template_filter(format_duration, 'duration')
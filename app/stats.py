@@ -0,0 +1,217 @@
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from sqlalchemy import case, func, insert, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import User, Interaction, ArchivedInteraction, InteractionDailyStats, InteractionDailyTotals
+
+# Dimensões da tabela de agregados diários (a ordem segue a UniqueConstraint do modelo)
+KEY_FIELDS = ('day', 'user_id', 'status', 'category', 'channel', 'had_anydesk_session')
+# Dimensões dos totais diários (InteractionDailyTotals), um resumo dos agregados acima
+TOTALS_KEY_FIELDS = ('day', 'user_id', 'category')
+RESOLVED_STATUS = 'Resolvido'
+
+
+def stats_key(interaction):
+    """Retorna a chave de agregação de um atendimento (uma tupla na ordem de KEY_FIELDS)."""
+    return (
+        interaction.start_time.date(),
+        interaction.user_id,
+        interaction.status,
+        interaction.category,
+        interaction.channel,
+        bool(interaction.had_anydesk_session),
+    )
+
+
+@lru_cache(maxsize=None)
+def _upsert_statement(dialect, model, key_fields, columns):
+    """INSERT ... ON CONFLICT que soma as colunas `columns`, montado uma vez por tabela."""
+    dialect_insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+    stmt = dialect_insert(model)
+    return stmt.on_conflict_do_update(
+        index_elements=list(key_fields),
+        set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in columns},
+    )
+
+
+def upsert_counters(model, key_fields, key, deltas):
+    """Soma `deltas` ({coluna: valor}) à linha da chave, criando-a se ainda não existir."""
+    upsert_counters_many(model, key_fields, {key: deltas})
+
+
+def upsert_counters_many(model, key_fields, changes):
+    """upsert_counters() para várias chaves ({chave: deltas}, todas com as mesmas colunas) num só comando."""
+    if not changes:
+        return
+    rows = [dict(zip(key_fields, key), **deltas) for key, deltas in changes.items()]
+    columns = list(next(iter(changes.values())))
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        # Um INSERT ... ON CONFLICT executado com a lista de parâmetros (executemany), pela
+        # conexão: o caminho de bulk insert do ORM só acrescentaria custo por chamada
+        db.session.connection().execute(_upsert_statement(dialect, model, tuple(key_fields), tuple(columns)), rows)
+        return
+
+    # Outros bancos: tenta atualizar e, se não houver linha, insere
+    for row in rows:
+        values = {field: row[field] for field in key_fields}
+        updated = model.query.filter_by(**values).update(
+            {getattr(model, column): getattr(model, column) + row[column] for column in columns},
+            synchronize_session=False,
+        )
+        if not updated:
+            db.session.execute(insert(model).values(**row))
+
+
+def _apply_deltas(deltas):
+    """Soma cada `delta` de {chave: delta} aos agregados diários e aos totais diários."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    totals = {}
+    for (day, user_id, status, category, _channel, had_anydesk_session), delta in deltas.items():
+        current = totals.setdefault((day, user_id, category), {'total': 0, 'resolved': 0, 'anydesk': 0})
+        current['total'] += delta
+        current['resolved'] += delta if status == RESOLVED_STATUS else 0
+        current['anydesk'] += delta if had_anydesk_session else 0
+    upsert_counters_many(InteractionDailyStats, KEY_FIELDS, {key: {'total': delta} for key, delta in deltas.items()})
+    upsert_counters_many(InteractionDailyTotals, TOTALS_KEY_FIELDS,
+                         {key: values for key, values in totals.items() if any(values.values())})
+
+
+def _apply_delta(key, delta):
+    """Soma `delta` ao contador da chave nos agregados diários e nos totais diários."""
+    _apply_deltas({key: delta})
+
+
+def record_created(interaction):
+    """Contabiliza um atendimento novo. Deve ser chamado após o flush (start_time preenchido)."""
+    _apply_delta(stats_key(interaction), 1)
+
+
+def record_changed(old_key, interaction):
+    """Move a contagem da chave antiga para a nova quando status/categoria/canal/AnyDesk mudam."""
+    new_key = stats_key(interaction)
+    if new_key != old_key:
+        _apply_delta(old_key, -1)
+        _apply_delta(new_key, 1)
+
+
+def record_deleted(interaction):
+    _apply_delta(stats_key(interaction), -1)
+
+
+def record_bulk(deltas):
+    """Aplica {chave: delta} de uma operação em massa (um comando por tabela, não um por chave)."""
+    _apply_deltas(deltas)
+
+
+def forget_user(user_id):
+    """Remove os agregados de um atendente cujos atendimentos foram apagados."""
+    InteractionDailyStats.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    InteractionDailyTotals.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+
+def _source_rows(model, day=None):
+    """Chave de agregação de cada atendimento de `model` (a tabela de atendimentos ou o arquivo)."""
+    query = select(
+        func.date(model.start_time).label('day'),
+        model.user_id,
+        model.status,
+        model.category,
+        model.channel,
+        func.coalesce(model.had_anydesk_session, False).label('had_anydesk_session'),
+    ).where(model.start_time.is_not(None))
+    if day is not None:
+        query = query.where(
+            model.start_time >= datetime.combine(day, time.min),
+            model.start_time < datetime.combine(day + timedelta(days=1), time.min),
+        )
+    return query
+
+
+def rebuild(day=None):
+    """Recalcula os agregados a partir dos atendimentos e do arquivo (todos os dias ou apenas `day`).
+
+    Usado no backfill inicial e para corrigir divergências; não faz commit.
+    """
+    # Os arquivados (app/archive.py) continuam contando nos agregados
+    rows = union_all(_source_rows(Interaction, day), _source_rows(ArchivedInteraction, day)).subquery()
+    key_columns = [rows.c[field] for field in KEY_FIELDS]
+    source = select(*key_columns, func.count()).group_by(*key_columns)
+
+    delete_query = InteractionDailyStats.query
+    if day is not None:
+        delete_query = delete_query.filter(InteractionDailyStats.day == day)
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(InteractionDailyStats).from_select(list(KEY_FIELDS) + ['total'], source)
+    )
+    _rebuild_totals(day)
+
+
+def _rebuild_totals(day=None):
+    """Recalcula os totais diários a partir dos agregados diários (já atualizados)."""
+    stats = InteractionDailyStats
+    delete_query = InteractionDailyTotals.query
+    source = select(
+        stats.day,
+        stats.user_id,
+        stats.category,
+        func.sum(stats.total),
+        func.sum(case((stats.status == RESOLVED_STATUS, stats.total), else_=0)),
+        func.sum(case((stats.had_anydesk_session == True, stats.total), else_=0)),
+    )
+    if day is not None:
+        delete_query = delete_query.filter(InteractionDailyTotals.day == day)
+        source = source.where(stats.day == day)
+    source = source.group_by(stats.day, stats.user_id, stats.category)
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(InteractionDailyTotals).from_select(
+            list(TOTALS_KEY_FIELDS) + ['total', 'resolved', 'anydesk'], source
+        )
+    )
+
+
+# --- Leitura dos agregados ---
+
+def status_counts(day=None, user_id=None):
+    """Retorna {status: quantidade}, opcionalmente filtrando por dia e/ou atendente."""
+    query = db.session.query(
+        InteractionDailyStats.status, func.sum(InteractionDailyStats.total)
+    )
+    if day is not None:
+        query = query.filter(InteractionDailyStats.day == day)
+    if user_id is not None:
+        query = query.filter(InteractionDailyStats.user_id == user_id)
+    rows = query.group_by(InteractionDailyStats.status).all()
+    return {status: int(total) for status, total in rows if total}
+
+
+def user_counts(day):
+    """Retorna {user_id: quantidade} do dia, pelos totais diários."""
+    rows = db.session.query(InteractionDailyTotals.user_id, func.sum(InteractionDailyTotals.total)) \
+        .filter(InteractionDailyTotals.day == day) \
+        .group_by(InteractionDailyTotals.user_id).all()
+    return {user_id: int(total) for user_id, total in rows if total}
+
+
+def category_counts():
+    """Lista de (categoria, quantidade) em ordem decrescente."""
+    total = func.sum(InteractionDailyStats.total)
+    rows = db.session.query(InteractionDailyStats.category, total) \
+        .group_by(InteractionDailyStats.category).order_by(total.desc()).all()
+    return [(category, int(count)) for category, count in rows if count]
+
+
+def agent_counts():
+    """Lista de (atendente, quantidade) em ordem decrescente, apenas para não supervisores."""
+    total = func.sum(InteractionDailyStats.total)
+    rows = db.session.query(User.username, total) \
+        .join(InteractionDailyStats, User.id == InteractionDailyStats.user_id) \
+        .filter(User.is_supervisor == False) \
+        .group_by(User.username).order_by(total.desc()).all()
+    return [(username, int(count)) for username, count in rows if count]
@@ -0,0 +1,163 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, String, case, func, select, type_coerce
+
+from app import db
+from app.stats import RESOLVED_STATUS
+from app.models import User, Interaction, ArchivedInteraction, InteractionDailyTotals
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Limite de pontos por série. Por hora a agregação varre os atendimentos (tabela quente e arquivo),
+# por isso o intervalo é curto (14 dias); por dia cabem ~2,7 anos
+MAX_BUCKETS = {'hour': 24 * 14, 'day': 1000, 'week': 1000, 'month': 1000}
+
+
+def _bucket_expression(column, granularity):
+    """Expressão SQL do início do período (como texto 'AAAA-MM-DD' ou 'AAAA-MM-DD HH:00')."""
+    if granularity == 'day' and isinstance(column.type, Date):
+        # A própria coluna: o GROUP BY segue a ordem do índice (day, user_id, category) sem ordenar.
+        # Lida como texto, para não converter cada valor em date só para formatá-lo de volta
+        return type_coerce(column, String)
+    if db.engine.dialect.name == 'postgresql':
+        pattern = 'YYYY-MM-DD HH24:00' if granularity == 'hour' else 'YYYY-MM-DD'
+        return func.to_char(func.date_trunc(granularity, column), pattern)
+    if granularity == 'hour':
+        return func.strftime('%Y-%m-%d %H:00', column)
+    if granularity == 'week':
+        # Volta 6 dias e avança até a segunda-feira: o início da semana (ISO)
+        return func.date(column, '-6 days', 'weekday 1')
+    if granularity == 'month':
+        return func.strftime('%Y-%m-01', column)
+    return func.date(column)
+
+
+def bucket_labels(start, end, granularity):
+    """Todos os períodos entre `start` e `end` (inclusive), no mesmo formato da expressão SQL."""
+    labels = []
+    if granularity == 'hour':
+        current, last = datetime.combine(start, time.min), datetime.combine(end, time(23))
+        while current <= last:
+            labels.append(current.strftime('%Y-%m-%d %H:00'))
+            current += timedelta(hours=1)
+        return labels
+    if granularity == 'week':
+        current, step = start - timedelta(days=start.weekday()), timedelta(days=7)
+    elif granularity == 'month':
+        current, step = start.replace(day=1), None
+    else:
+        current, step = start, timedelta(days=1)
+    while current <= end:
+        labels.append(current.isoformat())
+        if step is None:
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            current += step
+    return labels
+
+
+def _hourly_query(model, start, end):
+    """Agrupamento por hora direto nos atendimentos de `model` (tabela quente ou arquivo)."""
+    bucket = _bucket_expression(model.start_time, 'hour')
+    volume = func.count(model.id)
+    resolved = func.sum(case((model.status == RESOLVED_STATUS, 1), else_=0))
+    anydesk = func.sum(case((model.had_anydesk_session == True, 1), else_=0))
+    return select(bucket, model.user_id, model.category, volume, resolved, anydesk) \
+        .where(model.start_time >= datetime.combine(start, time.min),
+               model.start_time < datetime.combine(end + timedelta(days=1), time.min)) \
+        .group_by(bucket, model.user_id, model.category)
+
+
+def _grouped_rows(start, end, granularity):
+    """Linhas agrupadas por (período, user_id, categoria) com volume, resolvidos e AnyDesk."""
+    # Pela conexão, sem a camada do ORM (que só atrasaria as dezenas de milhares de tuplas)
+    connection = db.session.connection()
+    if granularity == 'hour':
+        # Os totais são diários; por hora a fonte são os próprios atendimentos, incluindo os
+        # arquivados (app/archive.py), que os totais diários também contam. Um mesmo período
+        # pode vir das duas tabelas; trend_series soma as linhas
+        return connection.execute(_hourly_query(Interaction, start, end)).all() + \
+            connection.execute(_hourly_query(ArchivedInteraction, start, end)).all()
+    totals = InteractionDailyTotals
+    bucket = _bucket_expression(totals.day, granularity)
+    query = select(bucket, totals.user_id, totals.category, func.sum(totals.total),
+                   func.sum(totals.resolved), func.sum(totals.anydesk)) \
+        .where(totals.day >= start, totals.day <= end) \
+        .group_by(bucket, totals.user_id, totals.category)
+    return connection.execute(query).all()
+
+
+def _empty_series(size):
+    return {'volume': [0] * size, 'resolved': [0] * size, 'anydesk': [0] * size}
+
+
+def _finish(series):
+    """Troca os contadores de resolvidos/AnyDesk pelas taxas (None nos períodos sem atendimentos)."""
+    volume = series['volume']
+    return {
+        'volume': volume,
+        'resolution_rate': [round(r / v, 4) if v else None for r, v in zip(series.pop('resolved'), volume)],
+        'anydesk_share': [round(a / v, 4) if v else None for a, v in zip(series.pop('anydesk'), volume)],
+    }
+
+
+def trend_series(start, end, granularity='day'):
+    """Séries temporais de volume, taxa de resolução e participação do AnyDesk.
+
+    Retorna os rótulos dos períodos, a série total e uma série por atendente
+    (sem supervisores, como em stats.agent_counts) e por categoria. O banco faz
+    a agregação; aqui só se distribuem as linhas agrupadas nas séries.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Granularidade inválida: {granularity!r}.')
+    if end < start:
+        raise ValueError('A data final é anterior à inicial.')
+    labels = bucket_labels(start, end, granularity)
+    if len(labels) > MAX_BUCKETS[granularity]:
+        raise ValueError('Intervalo longo demais para a granularidade escolhida '
+                         f'(máximo de {MAX_BUCKETS[granularity]} pontos).')
+
+    position = {label: i for i, label in enumerate(labels)}
+    # Nomes dos atendentes numa query à parte (a tabela de usuários é pequena), em vez de um JOIN por linha
+    agents = {user_id: username for user_id, username in
+              db.session.query(User.id, User.username).filter(User.is_supervisor == False)}
+    size = len(labels)
+    total = _empty_series(size)
+    by_agent, by_category = {}, {}
+    for bucket, user_id, category, volume, resolved, anydesk in _grouped_rows(start, end, granularity):
+        i = position.get(str(bucket))
+        if i is None:
+            continue
+        if category not in by_category:
+            by_category[category] = _empty_series(size)
+        targets = [total, by_category[category]]
+        username = agents.get(user_id)
+        if username is not None:
+            if username not in by_agent:
+                by_agent[username] = _empty_series(size)
+            targets.append(by_agent[username])
+        resolved, anydesk = int(resolved or 0), int(anydesk or 0)
+        for series in targets:
+            series['volume'][i] += volume
+            series['resolved'][i] += resolved
+            series['anydesk'][i] += anydesk
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'buckets': labels,
+        'total': _finish(total),
+        'by_agent': {name: _finish(series) for name, series in sorted(by_agent.items())},
+        'by_category': {name: _finish(series) for name, series in sorted(by_category.items())},
+    }
+
+
+def range_from_args(args, default_days=30):
+    """(início, fim, granularidade) a partir dos parâmetros start_date, end_date e granularity.
+
+    Sem datas, usa os últimos `default_days` dias até hoje. Datas inválidas geram ValueError.
+    """
+    end = date.fromisoformat(args['end_date']) if args.get('end_date') else date.today()
+    start = date.fromisoformat(args['start_date']) if args.get('start_date') \
+        else end - timedelta(days=default_days - 1)
+    return start, end, args.get('granularity') or 'day'
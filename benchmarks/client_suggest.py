@@ -0,0 +1,89 @@
+"""Benchmark do autocompletar de clientes (/api/clients/suggest).
+
+Popula o banco com o gerador de app/seed.py, mede a montagem do índice em
+memória (app/clients.py) e a latência de clients.suggest() para prefixos de
+nome e de telefone, além da requisição completa pela API. A meta é ficar
+abaixo de 1 ms por busca.
+
+Uso:
+    python benchmarks/client_suggest.py --database-url sqlite:////tmp/bench_suggest.db
+"""
+import argparse
+import os
+import statistics
+import sys
+import time as clock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from app import create_app, db, clients
+from app.seed import seed, SEED_PASSWORD
+
+QUERIES = {
+    'nome': ['a', 'Ma', 'Natália R', 'joao', 'Gabriela Souza 1', 'vito'],
+    'telefone': ['11', '(11) 91', '11 9876', '+55 11 955'],
+}
+
+
+def _summary(timings):
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 4),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 4),
+        'max_ms': round(timings[-1], 4),
+    }
+
+
+def measure(queries, repeat):
+    timings = []
+    for i in range(repeat):
+        started = clock.perf_counter()
+        clients.suggest(queries[i % len(queries)])
+        timings.append((clock.perf_counter() - started) * 1000)
+    return _summary(timings)
+
+
+def measure_api(app, queries, repeat):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'atendente_001', 'password': SEED_PASSWORD})
+    assert response.status_code == 302, 'login de atendente_001 falhou'
+    timings = []
+    for i in range(repeat):
+        started = clock.perf_counter()
+        response = client.get('/api/clients/suggest', query_string={'q': queries[i % len(queries)]})
+        timings.append((clock.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.status_code
+    return _summary(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL') or 'sqlite:////tmp/bench_suggest.db')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--agents', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        total = seed(args.rows, agents=args.agents, days=args.days)
+        print(f'{db.engine.dialect.name}: {total} atendimentos')
+
+    with app.test_request_context():
+        started = clock.perf_counter()
+        clients.warm_up()
+        print(f'montagem do índice: {(clock.perf_counter() - started) * 1000:.0f} ms')
+        for kind, queries in QUERIES.items():
+            print(f'{kind}: {measure(queries, args.repeat)}')
+    print(f'API: {measure_api(app, QUERIES["nome"], args.repeat // 10)}')
+
+
+if __name__ == '__main__':
+    main()
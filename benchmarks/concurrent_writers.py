@@ -0,0 +1,184 @@
+"""Teste de carga: N atendentes registrando atendimentos ao mesmo tempo.
+
+Sobe a aplicação no waitress (como em `python manage.py serve`) num banco SQLite
+novo, faz login de N atendentes e cada um envia POSTs para a página inicial
+(index()), que grava o atendimento, o histórico, o log de alterações e o agregado.
+O esquema é criado pelas migrações do Alembic, como em produção (com os
+triggers da busca textual). Mede a vazão de escrita e a latência; se alguma
+requisição falhar, a vazão não vale e o script termina com código 1.
+
+Uso:
+    python benchmarks/concurrent_writers.py
+    python benchmarks/concurrent_writers.py --journal-mode DELETE --synchronous FULL   # comparação
+"""
+import argparse
+import http.cookiejar
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time as clock
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask_migrate import upgrade
+from waitress.server import create_server
+
+from config import Config
+from app import create_app, db
+from app.models import User, Interaction
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Mede só o POST; o redirect para a listagem não entra na conta
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _post(opener, url, data):
+    body = urllib.parse.urlencode(data).encode()
+    try:
+        with opener.open(url, body, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        if e.code != 302:
+            raise
+        return e.code
+
+
+def _wait_until_listening(port, timeout=30):
+    deadline = clock.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            if clock.monotonic() > deadline:
+                raise
+            clock.sleep(0.05)
+
+
+def attendant(base_url, username, password, requests, timings, errors, ready, start):
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+    try:
+        status = _post(opener, base_url + '/login', {'username': username, 'password': password})
+        if status != 302:
+            raise RuntimeError(f'login de {username} respondeu {status}')
+    except (urllib.error.URLError, OSError, RuntimeError) as e:
+        errors.append(f'login: {e}')
+        requests = 0
+    finally:
+        # Logado (ou desistindo): libera o disparo quando todos chegarem aqui
+        ready.release()
+    start.wait()
+    for n in range(requests):
+        started = clock.perf_counter()
+        try:
+            _post(opener, base_url + '/', {
+                'client_name': f'Cliente {username} {n}',
+                'client_phone': f'(11) 9{n:08d}',
+                'channel': 'WhatsApp',
+                'category': 'Suporte',
+                'description': 'Atendimento do teste de carga.',
+                'status': 'Aberto',
+                'submit_interaction': 'Registrar Atendimento',
+            })
+        except (urllib.error.URLError, OSError) as e:
+            errors.append(str(e))
+            continue
+        timings.append((clock.perf_counter() - started) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attendants', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=40, help='Atendimentos registrados por atendente.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads do waitress.')
+    parser.add_argument('--journal-mode', default='WAL')
+    parser.add_argument('--synchronous', default='NORMAL')
+    parser.add_argument('--busy-timeout', type=int, default=5000)
+    parser.add_argument('--audit-write-behind', action='store_true', help='Grava o histórico em lotes (AUDIT_WRITE_BEHIND).')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_writers_')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        SQLITE_JOURNAL_MODE = args.journal_mode
+        SQLITE_SYNCHRONOUS = args.synchronous
+        SQLITE_BUSY_TIMEOUT = args.busy_timeout
+        AUDIT_WRITE_BEHIND = args.audit_write_behind
+        WTF_CSRF_ENABLED = False
+        CACHE_TYPE = 'NullCache'
+
+    app = create_app(BenchConfig)
+    password = 'carga123'
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+        template = User(username='modelo')
+        template.set_password(password)
+        db.session.add_all(User(username=f'atendente_{n}', password_hash=template.password_hash)
+                           for n in range(args.attendants))
+        db.session.commit()
+
+    port = _free_port()
+    server = create_server(app, host='127.0.0.1', port=port, threads=args.threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    base_url = f'http://127.0.0.1:{port}'
+    _wait_until_listening(port)
+
+    timings, errors = [], []
+    ready = threading.Semaphore(0)
+    start = threading.Event()
+    workers = [
+        threading.Thread(target=attendant, args=(base_url, f'atendente_{n}', password, args.requests,
+                                                 timings, errors, ready, start))
+        for n in range(args.attendants)
+    ]
+    for worker in workers:
+        worker.start()
+    # Espera todos os logins terminarem e dispara os atendentes juntos
+    for _ in workers:
+        ready.acquire()
+    started = clock.perf_counter()
+    start.set()
+    for worker in workers:
+        worker.join()
+    elapsed = clock.perf_counter() - started
+
+    with app.app_context():
+        stored = db.session.query(Interaction.id).count()
+
+    timings.sort()
+    print(f'journal_mode={args.journal_mode} synchronous={args.synchronous} busy_timeout={args.busy_timeout} '
+          f'threads={args.threads} atendentes={args.attendants} audit_write_behind={args.audit_write_behind}')
+    print({
+        'requests': len(timings) + len(errors),
+        'errors': len(errors),
+        'stored_interactions': stored,
+        'writes_per_second': round(stored / elapsed, 1),
+        'p50_ms': round(statistics.median(timings), 1) if timings else None,
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 1) if timings else None,
+    })
+    expected = args.attendants * args.requests
+    if errors or stored != expected:
+        print(f'FALHOU: {len(errors)} erro(s), {stored} de {expected} atendimentos gravados; a vazão acima não vale.')
+        print('Primeiros erros:', errors[:3])
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
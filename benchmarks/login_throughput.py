@@ -0,0 +1,117 @@
+"""Benchmark de login: N atendentes entrando ao mesmo tempo (troca de turno).
+
+Para cada esquema de hash (PASSWORD_HASH_METHOD / BCRYPT_LOG_ROUNDS) sobe a
+aplicação no waitress com um banco SQLite novo, cria N atendentes com a senha
+nesse esquema e dispara os N POSTs de /login juntos. Depois mede uma página
+autenticada para mostrar o efeito do cache do user_loader.
+
+Uso:
+    python benchmarks/login_throughput.py
+    python benchmarks/login_throughput.py --attendants 100 --schemes scrypt bcrypt:10 bcrypt:12
+"""
+import argparse
+import http.cookiejar
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time as clock
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from waitress.server import create_server
+
+from config import Config
+from app import create_app, db
+from app.models import User
+from concurrent_writers import _free_port, _post, _NoRedirect
+
+PASSWORD = 'turno123'
+
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(statistics.median(timings), 1),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 1),
+    }
+
+
+def run(scheme, attendants, threads, page_requests, user_cache_timeout):
+    method, _, rounds = scheme.partition(':')
+    workdir = tempfile.mkdtemp(prefix='bench_login_')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        PASSWORD_HASH_METHOD = method
+        BCRYPT_LOG_ROUNDS = int(rounds or 10)
+        USER_CACHE_TIMEOUT = user_cache_timeout
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        template = User(username='modelo')
+        template.set_password(PASSWORD)
+        db.session.add_all(User(username=f'atendente_{n}', password_hash=template.password_hash)
+                           for n in range(attendants))
+        db.session.commit()
+
+    port = _free_port()
+    server = create_server(app, host='127.0.0.1', port=port, threads=threads, connection_limit=attendants * 2)
+    threading.Thread(target=server.run, daemon=True).start()
+    base_url = f'http://127.0.0.1:{port}'
+
+    openers = [urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect) for _ in range(attendants)]
+    login_timings, page_timings = [], []
+    start = threading.Event()
+
+    def attendant(n):
+        start.wait()
+        started = clock.perf_counter()
+        _post(openers[n], base_url + '/login', {'username': f'atendente_{n}', 'password': PASSWORD})
+        login_timings.append((clock.perf_counter() - started) * 1000)
+
+    workers = [threading.Thread(target=attendant, args=(n,)) for n in range(attendants)]
+    for worker in workers:
+        worker.start()
+    started = clock.perf_counter()
+    start.set()
+    for worker in workers:
+        worker.join()
+    elapsed = clock.perf_counter() - started
+
+    # Páginas autenticadas em sequência: o user_loader é chamado em todas
+    for n in range(page_requests):
+        started_page = clock.perf_counter()
+        openers[n % attendants].open(base_url + '/', timeout=60).read()
+        page_timings.append((clock.perf_counter() - started_page) * 1000)
+
+    return {
+        'scheme': scheme,
+        'logins_per_second': round(attendants / elapsed, 1),
+        'login': _percentiles(login_timings),
+        'authenticated_page': _percentiles(page_timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attendants', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8, help='Threads do waitress.')
+    parser.add_argument('--schemes', nargs='+', default=['scrypt', 'bcrypt:12', 'bcrypt:10'],
+                        help="Esquemas no formato 'método' ou 'bcrypt:custo'.")
+    parser.add_argument('--page-requests', type=int, default=200)
+    parser.add_argument('--user-cache-timeout', type=int, default=60, help='0 desativa o cache do user_loader.')
+    args = parser.parse_args()
+
+    for scheme in args.schemes:
+        print(run(scheme, args.attendants, args.threads, args.page_requests, args.user_cache_timeout), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark da busca de atendimentos (/search).
+
+Popula o banco com o gerador de app/seed.py (o mesmo do `manage.py seed`), cria
+o índice de busca e mede a latência de buscas por nome, telefone e descrição.
+
+Uso:
+    python benchmarks/search_latency.py --database-url sqlite:////tmp/bench_search.db
+"""
+import argparse
+import os
+import statistics
+import sys
+import time as clock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from app import create_app, db, search
+from app.seed import seed
+
+QUERIES = {
+    'nome': ['Marcos', 'Natália Ribeiro', 'joao', 'Gabr'],
+    'telefone': ['11 9123', '(11) 98765-43', '+55 11 955'],
+    'final do telefone': ['4321', '0099', '65-4321'],
+    'descrição': ['impressora travando', 'nota fiscal', 'instalacao', 'certific'],
+}
+
+
+def measure(queries, repeat):
+    timings = []
+    for i in range(repeat):
+        started = clock.perf_counter()
+        search.search_interactions(queries[i % len(queries)])
+        timings.append((clock.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL') or 'sqlite:////tmp/bench_search.db')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--agents', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        search.ensure_index()
+        total = seed(args.rows, agents=args.agents, days=args.days)
+        print(f'{db.engine.dialect.name}: {total} atendimentos')
+
+        for kind, queries in QUERIES.items():
+            print(f'{kind}: {measure(queries, args.repeat)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Suíte de benchmarks das páginas principais, para comparar antes/depois de uma mudança.
+
+Para cada tamanho (10k, 100k e 1M atendimentos por padrão) popula um banco SQLite
+com o gerador do `manage.py seed` (reaproveitado entre execuções) e percorre
+index, admin_dashboard, all_interactions, user_details, reports (e as séries
+de um ano da API) e edit_interaction pelo test client do Flask, medindo
+latência p50/p95, queries por requisição e pico de memória alocada
+(tracemalloc). O resultado sai em JSON.
+
+Uso:
+    python benchmarks/suite.py --output resultado.json
+    python benchmarks/suite.py --sizes 10000 100000 --baseline resultado.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time as clock
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from config import Config
+from app import create_app, db, search
+from app.models import User, Interaction
+from app.seed import seed, SEED_PASSWORD
+
+STATUSES = ['Aberto', 'Em Andamento', 'Resolvido', 'Pendente']
+
+
+def scenarios(attendant_id, interaction_ids):
+    """(nome, login, método, url, dados) de cada cenário; dados pode ser função da repetição."""
+    today = date.today().isoformat()
+    year_ago = (date.today() - timedelta(days=364)).isoformat()
+    # Muda a cada execução, para as edições alterarem de fato o atendimento (e gravarem histórico)
+    run = clock.strftime('%H%M%S')
+
+    def edit_data(n):
+        return {
+            'client_name': f'Cliente editado {run}-{n}',
+            'client_phone': '(11) 91234-5678',
+            'channel': 'WhatsApp',
+            'category': 'Suporte',
+            'description': 'Descrição alterada pelo benchmark.',
+            'status': STATUSES[n % len(STATUSES)],
+        }
+
+    return [
+        ('index', 'attendant', 'GET', lambda n: '/', None),
+        ('admin_dashboard', 'supervisor', 'GET', lambda n: f'/admin/dashboard?search_date={today}', None),
+        ('all_interactions', 'supervisor', 'GET', lambda n: '/admin/all_interactions', None),
+        ('all_interactions_filtered', 'supervisor', 'GET',
+         lambda n: f'/admin/all_interactions?status=Pendente&user_id={attendant_id}', None),
+        ('user_details', 'supervisor', 'GET', lambda n: f'/admin/user/{attendant_id}', None),
+        ('reports', 'supervisor', 'GET', lambda n: '/admin/reports', None),
+        ('report_trends_year', 'supervisor', 'GET',
+         lambda n: f'/api/reports/trends?start_date={year_ago}&end_date={today}&granularity=day', None),
+        ('edit_interaction', 'attendant', 'POST',
+         lambda n: f'/interaction/{interaction_ids[n % len(interaction_ids)]}/edit', edit_data),
+    ]
+
+
+def _login(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': SEED_PASSWORD})
+    assert response.status_code == 302, f'login de {username} falhou'
+    return client
+
+
+def _request(client, method, url, data):
+    response = client.open(url, method=method, data=data)
+    response.get_data()
+    assert response.status_code in (200, 302), f'{method} {url}: {response.status_code}'
+
+
+def measure(clients, scenario, repeat, warmup, query_counter):
+    name, role, method, url, data = scenario
+    client = clients[role]
+    timings, queries = [], []
+    for n in range(warmup + repeat):
+        query_counter[0] = 0
+        started = clock.perf_counter()
+        _request(client, method, url(n), data(n) if data else None)
+        elapsed = (clock.perf_counter() - started) * 1000
+        if n >= warmup:
+            timings.append(elapsed)
+            queries.append(query_counter[0])
+
+    # Pico de memória numa requisição extra, para o tracemalloc não distorcer as latências
+    tracemalloc.start()
+    _request(client, method, url(warmup + repeat), data(warmup + repeat) if data else None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[max(int(len(timings) * 0.95) - 1, 0)], 2),
+        'queries': int(statistics.median(queries)),
+        'peak_memory_kb': round(peak / 1024),
+    }
+
+
+def run_size(size, args):
+    database = os.path.join(args.data_dir, f'bench_suite_{size}.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database
+        WTF_CSRF_ENABLED = False
+        # Sem cache dos painéis, para medir o trabalho real de cada página
+        CACHE_TYPE = 'NullCache' if not args.cache else Config.CACHE_TYPE
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        search.ensure_index()
+        started = clock.perf_counter()
+        seed(size, agents=args.agents, days=args.days, progress=lambda message: None)
+        seed_seconds = clock.perf_counter() - started
+
+        # O atendente com mais atendimentos: o pior caso para index e user_details
+        attendant_id = db.session.query(Interaction.user_id).group_by(Interaction.user_id) \
+            .order_by(db.func.count().desc()).limit(1).scalar()
+        attendant = db.session.get(User, attendant_id)
+        interaction_ids = [i for i, in db.session.query(Interaction.id).filter_by(user_id=attendant_id)
+                           .order_by(Interaction.id.desc()).limit(args.repeat + args.warmup + 1)]
+        attendant_username = attendant.username
+        supervisor_username = 'supervisor'
+        engine = db.engine
+
+    query_counter = [0]
+
+    def count_query(*_):
+        query_counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_query)
+    clients = {
+        'supervisor': _login(app, supervisor_username),
+        'attendant': _login(app, attendant_username),
+    }
+    results = {}
+    for scenario in scenarios(attendant_id, interaction_ids):
+        results[scenario[0]] = measure(clients, scenario, args.repeat, args.warmup, query_counter)
+        print(f'{size:>8} {scenario[0]:<26} {results[scenario[0]]}', file=sys.stderr, flush=True)
+    event.remove(engine, 'before_cursor_execute', count_query)
+    return {'seed_seconds': round(seed_seconds, 1), 'scenarios': results}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    """Variação percentual do p50 e das queries em relação a um resultado anterior."""
+    lines = []
+    for size, data in result['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if not base:
+            continue
+        for name, current in data['scenarios'].items():
+            previous = base['scenarios'].get(name)
+            if not previous:
+                continue
+            change = (current['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 if previous['p50_ms'] else 0
+            lines.append(f'{size:>8} {name:<26} p50 {previous["p50_ms"]:>9} -> {current["p50_ms"]:>9} ms '
+                         f'({change:+.1f}%)  queries {previous["queries"]} -> {current["queries"]}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--agents', type=int, default=20)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cache', action='store_true', help='Mantém o cache dos painéis ligado.')
+    parser.add_argument('--data-dir', default=os.environ.get('BENCH_DATA_DIR') or '/tmp',
+                        help='Onde ficam os bancos gerados (reaproveitados entre execuções).')
+    parser.add_argument('--output', help='Grava o JSON neste arquivo (padrão: saída padrão).')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar.')
+    args = parser.parse_args()
+
+    result = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeat': args.repeat,
+        'cache': args.cache,
+        'sizes': {str(size): run_size(size, args) for size in args.sizes},
+    }
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as target:
+            target.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as source:
+            print(compare(result, json.load(source)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
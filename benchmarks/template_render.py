@@ -0,0 +1,113 @@
+"""Benchmark da renderização das listagens (badge de status e data por linha).
+
+Popula o banco com o gerador de app/seed.py, carrega N atendimentos (10k por
+padrão) e renderiza a mesma tabela de duas formas: a marcação antiga dos
+templates (cadeia de if/elif do status e start_time.strftime() em cada linha)
+e a atual, com os filtros `status_badge` e `datetime` de app/rendering.py.
+Confere que o HTML das duas é o mesmo, a menos de espaços em branco. Mede
+também a primeira carga dos templates num ambiente novo, com e sem o cache de
+bytecode do Jinja.
+
+Uso:
+    python benchmarks/template_render.py --database-url sqlite:////tmp/bench_render.db
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time as clock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.orm import joinedload
+
+from config import Config
+from app import create_app, db
+from app.models import Interaction
+from app.seed import seed
+
+# Linha de admin/all_interactions.html antes dos filtros
+LEGACY_ROWS = """{% for interaction in interactions %}<tr>
+<td>#{{ interaction.id }}</td>
+<td>{{ interaction.start_time.strftime('%d/%m/%Y %H:%M') }}</td>
+<td>{{ interaction.user.username }}</td>
+<td>{{ interaction.client_name }}</td>
+<td>
+{% if interaction.status == 'Resolvido' %}<span class="badge status-resolvido">{{ interaction.status }}</span>
+{% elif interaction.status == 'Pendente' %}<span class="badge status-pendente">{{ interaction.status }}</span>
+{% elif interaction.status == 'Em Andamento' %}<span class="badge status-andamento">{{ interaction.status }}</span>
+{% else %}<span class="badge status-aberto">{{ interaction.status }}</span>{% endif %}
+</td>
+</tr>{% endfor %}"""
+
+ROWS = """{% for interaction in interactions %}<tr>
+<td>#{{ interaction.id }}</td>
+<td>{{ interaction.start_time|datetime }}</td>
+<td>{{ interaction.user.username }}</td>
+<td>{{ interaction.client_name }}</td>
+<td>
+{{ interaction.status|status_badge }}
+</td>
+</tr>{% endfor %}"""
+
+TEMPLATES = ['index.html', 'search.html', 'view_interaction.html', 'client_timeline.html',
+             'admin/dashboard.html', 'admin/all_interactions.html', 'admin/user_details.html',
+             'admin/reports.html', 'admin/sla.html']
+
+
+def measure(template, interactions, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = clock.perf_counter()
+        html = template.render(interactions=interactions)
+        timings.append((clock.perf_counter() - started) * 1000)
+    return html, {
+        'p50_ms': round(statistics.median(timings), 1),
+        'min_ms': round(min(timings), 1),
+    }
+
+
+def cold_load(app, bytecode_cache):
+    """Milissegundos para carregar (compilar ou ler do cache) os templates num ambiente do Jinja novo."""
+    env = app.jinja_env.overlay(cache_size=0, bytecode_cache=bytecode_cache)
+    started = clock.perf_counter()
+    for name in TEMPLATES:
+        env.get_template(name)
+    return (clock.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL') or 'sqlite:////tmp/bench_render.db')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        total = seed(args.rows)
+        interactions = Interaction.query.options(joinedload(Interaction.user)) \
+            .order_by(Interaction.start_time.desc()).limit(args.rows).all()
+        print(f'{db.engine.dialect.name}: {total} atendimentos, {len(interactions)} linhas renderizadas')
+
+        legacy_html, legacy = measure(app.jinja_env.from_string(LEGACY_ROWS), interactions, args.repeat)
+        html, current = measure(app.jinja_env.from_string(ROWS), interactions, args.repeat)
+        assert html.split() == legacy_html.split(), 'o HTML dos filtros difere do da marcação antiga'
+        print(f'if/elif + strftime: {legacy}')
+        print(f'filtros:            {current}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        bytecode_cache = FileSystemBytecodeCache(directory)
+        print(f'templates sem cache de bytecode: {cold_load(app, None):.0f} ms')
+        cold_load(app, bytecode_cache)
+        print(f'templates com cache de bytecode: {cold_load(app, bytecode_cache):.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
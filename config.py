@@ -2,10 +2,114 @@ import os
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def _engine_options_from_env():
+    """Opções do engine do SQLAlchemy (pool) lidas do ambiente; só entra o que estiver definido."""
+    options = {}
+    for env_name, option, cast in (
+        ('DB_POOL_SIZE', 'pool_size', int),
+        ('DB_MAX_OVERFLOW', 'max_overflow', int),
+        ('DB_POOL_TIMEOUT', 'pool_timeout', int),
+        ('DB_POOL_RECYCLE', 'pool_recycle', int),
+    ):
+        if os.environ.get(env_name):
+            options[option] = cast(os.environ[env_name])
+    if os.environ.get('DB_POOL_PRE_PING'):
+        options['pool_pre_ping'] = os.environ['DB_POOL_PRE_PING'].lower() in ('1', 'true', 'sim', 'yes')
+    return options
+
+
 class Config:
 
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'opk6032'
 
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Hash das senhas: 'bcrypt' (custo em BCRYPT_LOG_ROUNDS) ou um método do werkzeug, como 'scrypt'.
+    # Hashes em outro esquema continuam válidos e são regravados no próximo login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'bcrypt'
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS') or 10)
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options_from_env()
+
+    # SQLite: pragmas aplicados a cada conexão nova (app/database.py)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -20000)
+
+    # Histórico dos atendimentos gravado em lotes por uma thread (write-behind); desligado grava na requisição
+    AUDIT_WRITE_BEHIND = os.environ.get('AUDIT_WRITE_BEHIND', '').lower() in ('1', 'true', 'sim', 'yes')
+    AUDIT_FLUSH_INTERVAL_MS = int(os.environ.get('AUDIT_FLUSH_INTERVAL_MS') or 200)
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE') or 500)
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE') or 10000)
+
+    # Instrumentação por requisição (app/instrumentation.py): /metrics, queries lentas e perfis do cProfile.
+    # /metrics responde a supervisores logados ou a quem mandar `Authorization: Bearer METRICS_TOKEN`
+    INSTRUMENTATION = os.environ.get('INSTRUMENTATION', '').lower() in ('1', 'true', 'sim', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS') or 100)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_THRESHOLD_MS = float(os.environ.get('PROFILE_THRESHOLD_MS') or 500)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(basedir, '.profiles')
+
+    # Operações em massa (app/bulk.py): máximo de atendimentos afetados por vez
+    BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS') or 10000)
+    # Exclusão de um atendente (app/deletion.py): atendimentos apagados por transação
+    DELETE_CHUNK_SIZE = int(os.environ.get('DELETE_CHUNK_SIZE') or 1000)
+    # Autocompletar de clientes (app/clients.py): segundos até remontar o índice (0 nunca remonta) e
+    # máximo de pares (nome, telefone) em memória; acima dele saem os usados há mais tempo
+    CLIENT_INDEX_TTL = int(os.environ.get('CLIENT_INDEX_TTL') or 300)
+    CLIENT_INDEX_MAX_ENTRIES = int(os.environ.get('CLIENT_INDEX_MAX_ENTRIES') or 50000)
+
+    # Réplica de leitura (app/replica.py) para relatórios, histórico geral e detalhes do atendente: a URL
+    # de uma réplica ou, com o principal em SQLite, um arquivo local copiado pela API de backup do SQLite.
+    # Defasagem acima de REPLICA_MAX_STALENESS segundos (verificada a cada REPLICA_CHECK_INTERVAL) volta ao principal
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    REPLICA_SNAPSHOT_PATH = os.environ.get('REPLICA_SNAPSHOT_PATH')
+    REPLICA_SNAPSHOT_INTERVAL = int(os.environ.get('REPLICA_SNAPSHOT_INTERVAL') or 60)
+    REPLICA_MAX_STALENESS = int(os.environ.get('REPLICA_MAX_STALENESS') or 300)
+    REPLICA_CHECK_INTERVAL = int(os.environ.get('REPLICA_CHECK_INTERVAL') or 5)
+    if REPLICA_DATABASE_URL or REPLICA_SNAPSHOT_PATH:
+        SQLALCHEMY_BINDS = {
+            'replica': REPLICA_DATABASE_URL or f'sqlite:///file:{os.path.abspath(REPLICA_SNAPSHOT_PATH)}?mode=ro&uri=true'
+        }
+
+    # Snapshots do painel de dias encerrados (app/dashboards.py): dias mantidos e intervalo (s) da thread
+    # do `manage.py serve` que monta os que faltam ou ficaram velhos; 0 deixa para o `manage.py snapshot-dashboards`
+    DASHBOARD_SNAPSHOT_DAYS = int(os.environ.get('DASHBOARD_SNAPSHOT_DAYS') or 35)
+    DASHBOARD_SNAPSHOT_INTERVAL = int(os.environ.get('DASHBOARD_SNAPSHOT_INTERVAL') or 600)
+
+    # Templates (app/rendering.py): compilados guardados em disco (vazio desativa); TEMPLATES_AUTO_RELOAD
+    # vazio segue o modo debug, e o `manage.py serve` não recarrega os arquivos a não ser que seja ligado aqui
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+    TEMPLATES_AUTO_RELOAD = os.environ.get('TEMPLATES_AUTO_RELOAD', '').lower() in ('1', 'true', 'sim', 'yes') or None
+
+    # Servidor de produção (python manage.py serve)
+    WAITRESS_THREADS = int(os.environ.get('WAITRESS_THREADS') or 8)
+
+    # Máximo de queries por requisição; usado nos testes para detectar N+1 (vazio desativa)
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET') or 0) or None
+
+    # Cache dos agregados dos painéis: LRU em memória por padrão ou 'FileSystemCache' (com CACHE_DIR)
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'app.caching.LRUCache'
+    CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(basedir, '.cache')
+    CACHE_THRESHOLD = int(os.environ.get('CACHE_THRESHOLD') or 500)
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT') or 300)
+    # Tempo (s) que o usuário logado fica em cache no user_loader; 0 desativa
+    USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT') or 60)
+
+    # Server-Sent Events: intervalo de leitura do log de alterações, heartbeat e fila por cliente.
+    # Em /api/events do waitress cada conexão ocupa uma thread enquanto a aba estiver aberta: acima
+    # de EVENTS_MAX_SUBSCRIBERS (padrão: um quarto das threads) o painel volta ao polling da API
+    EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL') or 1.0)
+    EVENTS_HEARTBEAT = int(os.environ.get('EVENTS_HEARTBEAT') or 15)
+    EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE') or 100)
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ['EVENTS_MAX_SUBSCRIBERS']) if os.environ.get('EVENTS_MAX_SUBSCRIBERS') else None
+    # Com EVENTS_PORT, o `manage.py serve` atende os eventos num servidor asyncio nessa porta
+    # (app/events_server.py), sem thread por conexão. EVENTS_URL é o endereço que o navegador usa
+    # quando um proxy encaminha os eventos (padrão: a mesma máquina do painel, na EVENTS_PORT)
+    EVENTS_PORT = int(os.environ['EVENTS_PORT']) if os.environ.get('EVENTS_PORT') else None
+    EVENTS_URL = os.environ.get('EVENTS_URL')
+    EVENTS_SERVER_MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_SERVER_MAX_SUBSCRIBERS') or 5000)
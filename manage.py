@@ -1,4 +1,6 @@
 import os
+import argparse
+from datetime import date
 from app import create_app, db
 from app.models import User
 from getpass import getpass
@@ -30,5 +32,207 @@ def create_admin():
         db.session.commit()
         print(f"Administrador '{username}' criado com sucesso!")
 
+def rebuild_stats(day=None):
+    """Recalcula os agregados diários e os tempos por status (backfill completo ou de um único dia)."""
+    from app import stats, sla
+
+    with app.app_context():
+        stats.rebuild(day)
+        sla.rebuild(day)
+        db.session.commit()
+        print(f"Agregados recalculados para {day.isoformat() if day else 'todo o histórico'}.")
+
+def export_interactions(output, export_format, dataset, include_history, filters):
+    """Exporta atendimentos (e opcionalmente o histórico) para CSV ou XLSX com memória constante."""
+    from werkzeug.datastructures import MultiDict
+    from app import export
+    from app.filters import filtered_interactions_query
+
+    with app.app_context():
+        query = filtered_interactions_query(MultiDict({k: v for k, v in filters.items() if v}))
+        if export_format == 'xlsx':
+            export.write_xlsx(output, query, include_history=include_history)
+        else:
+            if dataset == 'history':
+                header, rows = export.HISTORY_HEADER, export.history_rows(query)
+            else:
+                header, rows = export.INTERACTION_HEADER, export.interaction_rows(query)
+            with open(output, 'w', encoding='utf-8', newline='') as csv_file:
+                for chunk in export.csv_chunks(header, rows):
+                    csv_file.write(chunk)
+        print(f"Exportação salva em {output}.")
+
+def import_interactions(path, batch_size, resume, rejects_path):
+    """Importa atendimentos legados de CSV/JSONL em lotes, retomando do último checkpoint."""
+    from app import importer
+
+    with app.app_context():
+        result = importer.import_file(path, batch_size=batch_size, resume=resume, rejects_path=rejects_path)
+        print(f"Importação concluída: {result['imported']} importados, {result['rejected']} rejeitados "
+              f"em {result['seconds']}s ({result['rows_per_second']} linhas/s).")
+
+def archive_interactions(before, batch_size):
+    """Move os atendimentos resolvidos anteriores a `before` (e o histórico deles) para o arquivo."""
+    from app import archive
+
+    with app.app_context():
+        total = archive.archive_before(before, batch_size=batch_size,
+                                       progress=lambda archived: print(f"{archived} arquivados...", end='\r'))
+        print(f"{total} atendimentos resolvidos antes de {before.isoformat()} foram arquivados.")
+
+def backfill_clients():
+    """Cria o cadastro de clientes a partir dos atendimentos e liga os atendimentos sem cliente."""
+    from app import clients
+
+    with app.app_context():
+        linked = clients.backfill()
+        db.session.commit()
+        print(f"{linked} atendimentos ligados ao cadastro de clientes.")
+
+def snapshot_replica():
+    """Renova a cópia local do SQLite usada como réplica de leitura (REPLICA_SNAPSHOT_PATH)."""
+    from app import replica
+
+    with app.app_context():
+        elapsed = replica.refresh_snapshot()
+        print(f"Snapshot gravado em {app.config['REPLICA_SNAPSHOT_PATH']} ({elapsed:.1f}s).")
+
+def snapshot_dashboards(days):
+    """Monta os snapshots do painel que faltam ou ficaram velhos nos dias encerrados."""
+    from app import dashboards
+
+    with app.app_context():
+        built = dashboards.refresh(days, progress=lambda day: print(f"{day.isoformat()}...", end='\r'))
+        print(f"{built} snapshots do painel montados.")
+
+def rebuild_search():
+    """Cria (se necessário) e reconstrói o índice de busca textual."""
+    from app import search
+
+    with app.app_context():
+        search.ensure_index(rebuild=True)
+        print("Índice de busca reconstruído.")
+
+def seed_database(interactions, agents, days, random_seed):
+    """Popula o banco com atendentes, atendimentos e histórico sintéticos."""
+    from app import seed
+
+    with app.app_context():
+        total = seed.seed(interactions, agents=agents, days=days, random_seed=random_seed)
+        print(f"Banco com {total} atendimentos. Usuários 'supervisor' e 'atendente_NNN', senha '{seed.SEED_PASSWORD}'.")
+
+def serve(host, port, threads):
+    """Sobe a aplicação no waitress (servidor WSGI de produção)."""
+    import signal
+    import sys
+    from waitress import serve as waitress_serve
+
+    # SIGTERM vira uma saída normal, para os handlers de atexit (flush do histórico em lotes) rodarem
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    threads = threads or app.config['WAITRESS_THREADS']
+    # Em produção os templates não mudam: sem conferir a data dos arquivos a cada render
+    app.jinja_env.auto_reload = bool(app.config['TEMPLATES_AUTO_RELOAD'])
+    # Índice do autocompletar de clientes montado antes da primeira requisição
+    from app import clients, dashboards
+    with app.app_context():
+        clients.warm_up()
+    # Snapshots do painel dos dias encerrados, montados em segundo plano
+    dashboards.start_worker(app)
+    # Cada conexão SSE do waitress prende uma thread enquanto o painel estiver aberto; acima do limite,
+    # o painel usa polling. Com EVENTS_PORT, os painéis vão para o servidor asyncio de eventos
+    if app.config['EVENTS_MAX_SUBSCRIBERS'] is None:
+        app.config['EVENTS_MAX_SUBSCRIBERS'] = threads // 4
+    if app.config['EVENTS_PORT']:
+        from app import events_server
+        events_server.start(app, host, app.config['EVENTS_PORT'])
+        print(f"Eventos em http://{host}:{app.config['EVENTS_PORT']}{events_server.EVENTS_PATH} "
+              f"(até {app.config['EVENTS_SERVER_MAX_SUBSCRIBERS']} conexões).")
+    print(f"Servindo em http://{host}:{port} com {threads} threads "
+          f"(até {app.config['EVENTS_MAX_SUBSCRIBERS']} conexões de eventos no waitress).")
+    # Cada thread segura no máximo uma conexão do pool; connection_limit limita só os sockets abertos,
+    # não as requisições atendidas ao mesmo tempo, que continuam limitadas pelas threads
+    waitress_serve(app, host=host, port=port, threads=threads, connection_limit=max(100, threads * 4),
+                   channel_timeout=120, ident='monitor-atendimentos')
+
+def main():
+    parser = argparse.ArgumentParser(description='Tarefas administrativas do monitor de atendimentos.')
+    commands = parser.add_subparsers(dest='command')
+
+    commands.add_parser('create-admin', help='Cria o usuário administrador inicial (padrão).')
+
+    rebuild_parser = commands.add_parser('rebuild-stats', help='Recalcula os agregados diários dos painéis e os tempos por status.')
+    rebuild_parser.add_argument('--day', type=date.fromisoformat, help='Recalcula apenas este dia (AAAA-MM-DD).')
+
+    export_parser = commands.add_parser('export', help='Exporta atendimentos para CSV ou XLSX.')
+    export_parser.add_argument('output', help='Arquivo de saída.')
+    export_parser.add_argument('--format', dest='export_format', choices=['csv', 'xlsx'], default='csv')
+    export_parser.add_argument('--dataset', choices=['interactions', 'history'], default='interactions',
+                               help='No CSV, exporta os atendimentos ou o histórico de alterações.')
+    export_parser.add_argument('--include-history', action='store_true', help='No XLSX, adiciona a aba de histórico.')
+    export_parser.add_argument('--status')
+    export_parser.add_argument('--category')
+    export_parser.add_argument('--user-id')
+    export_parser.add_argument('--start-date', help='AAAA-MM-DD')
+    export_parser.add_argument('--end-date', help='AAAA-MM-DD')
+
+    commands.add_parser('backfill-clients', help='Preenche o cadastro de clientes (um por telefone) a partir dos atendimentos.')
+
+    commands.add_parser('snapshot-replica', help='Copia o banco SQLite para a réplica de leitura local (REPLICA_SNAPSHOT_PATH).')
+
+    dashboards_parser = commands.add_parser('snapshot-dashboards', help='Monta os snapshots do painel dos dias encerrados.')
+    dashboards_parser.add_argument('--days', type=int, help='Dias para trás (padrão: DASHBOARD_SNAPSHOT_DAYS).')
+
+    commands.add_parser('rebuild-search', help='Cria e reconstrói o índice de busca textual.')
+
+    seed_parser = commands.add_parser('seed', help='Gera dados sintéticos para desenvolvimento e benchmarks.')
+    seed_parser.add_argument('--interactions', type=int, default=10000, help='Total de atendimentos desejado.')
+    seed_parser.add_argument('--agents', type=int, default=20)
+    seed_parser.add_argument('--days', type=int, default=180)
+    seed_parser.add_argument('--seed', dest='random_seed', type=int, default=42, help='Semente do gerador.')
+
+    serve_parser = commands.add_parser('serve', help='Sobe o servidor de produção (waitress).')
+    serve_parser.add_argument('--host', default=os.environ.get('HOST') or '0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=int(os.environ.get('PORT') or 8080))
+    serve_parser.add_argument('--threads', type=int, help='Threads do waitress (padrão: WAITRESS_THREADS).')
+
+    import_parser = commands.add_parser('import', help='Importa atendimentos legados de CSV ou JSONL.')
+    import_parser.add_argument('path', help='Arquivo .csv ou .jsonl.')
+    import_parser.add_argument('--batch-size', type=int, default=5000)
+    import_parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint e começa do início.')
+    import_parser.add_argument('--rejects', help='Grava as linhas rejeitadas (JSONL) neste arquivo.')
+
+    archive_parser = commands.add_parser('archive', help='Move atendimentos resolvidos antigos para o arquivo.')
+    archive_parser.add_argument('--before', type=date.fromisoformat, required=True,
+                                help='Arquiva os abertos antes desta data (AAAA-MM-DD).')
+    archive_parser.add_argument('--batch-size', type=int, default=1000, help='Atendimentos por transação.')
+
+    args = parser.parse_args()
+
+    if args.command == 'rebuild-stats':
+        rebuild_stats(args.day)
+    elif args.command == 'rebuild-search':
+        rebuild_search()
+    elif args.command == 'backfill-clients':
+        backfill_clients()
+    elif args.command == 'snapshot-replica':
+        snapshot_replica()
+    elif args.command == 'snapshot-dashboards':
+        snapshot_dashboards(args.days)
+    elif args.command == 'seed':
+        seed_database(args.interactions, args.agents, args.days, args.random_seed)
+    elif args.command == 'serve':
+        serve(args.host, args.port, args.threads)
+    elif args.command == 'import':
+        import_interactions(args.path, args.batch_size, not args.restart, args.rejects)
+    elif args.command == 'archive':
+        archive_interactions(args.before, args.batch_size)
+    elif args.command == 'export':
+        filters = dict(status=args.status, category=args.category, user_id=args.user_id,
+                       start_date=args.start_date, end_date=args.end_date)
+        export_interactions(args.output, args.export_format, args.dataset, args.include_history, filters)
+    else:
+        create_admin()
+
 if __name__ == '__main__':
-    create_admin()
\ No newline at end of file
+    main()
@@ -0,0 +1,106 @@
+"""Busca textual (FTS5 / tsvector) e telefone normalizado
+
+Revision ID: d4b9e27f6c15
+Revises: c81f5a0d3e29
+Create Date: 2026-10-18 18:05:42.118630
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b9e27f6c15'
+down_revision = 'c81f5a0d3e29'
+branch_labels = None
+depends_on = None
+
+
+def _normalize_phone(phone):
+    # Cópia de app.phones.normalize_phone no momento desta migração
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('55') and (len(digits) in (12, 13) or (phone or '').lstrip().startswith('+')):
+        digits = digits[2:]
+    elif len(digits) in (11, 12) and digits.startswith('0'):
+        digits = digits[1:]
+    return digits
+
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+        client_name, client_phone_normalized, description,
+        content='interactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS interactions_fts_ai AFTER INSERT ON interactions BEGIN
+        INSERT INTO interactions_fts(rowid, client_name, client_phone_normalized, description)
+        VALUES (new.id, new.client_name, new.client_phone_normalized, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS interactions_fts_ad AFTER DELETE ON interactions BEGIN
+        INSERT INTO interactions_fts(interactions_fts, rowid, client_name, client_phone_normalized, description)
+        VALUES ('delete', old.id, old.client_name, old.client_phone_normalized, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS interactions_fts_au
+    AFTER UPDATE OF client_name, client_phone_normalized, description ON interactions BEGIN
+        INSERT INTO interactions_fts(interactions_fts, rowid, client_name, client_phone_normalized, description)
+        VALUES ('delete', old.id, old.client_name, old.client_phone_normalized, old.description);
+        INSERT INTO interactions_fts(rowid, client_name, client_phone_normalized, description)
+        VALUES (new.id, new.client_name, new.client_phone_normalized, new.description);
+    END""",
+    "INSERT INTO interactions_fts(interactions_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_FTS = [
+    """ALTER TABLE interactions ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('portuguese', coalesce(client_name, '')), 'A') ||
+            setweight(to_tsvector('portuguese', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_interactions_search_vector ON interactions USING gin (search_vector)",
+]
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('interactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_phone_normalized', sa.String(length=40), nullable=True))
+        batch_op.create_index(batch_op.f('ix_interactions_client_phone_normalized'), ['client_phone_normalized'], unique=False)
+
+    # ### end Alembic commands ###
+
+    # Preenche o telefone normalizado dos atendimentos existentes
+    bind = op.get_bind()
+    interactions = sa.table('interactions', sa.column('id', sa.Integer), sa.column('client_phone', sa.String),
+                            sa.column('client_phone_normalized', sa.String))
+    rows = bind.execute(sa.select(interactions.c.id, interactions.c.client_phone)).fetchall()
+    updates = [{'row_id': row_id, 'digits': _normalize_phone(phone)} for row_id, phone in rows]
+    if updates:
+        bind.execute(
+            interactions.update().where(interactions.c.id == sa.bindparam('row_id'))
+            .values(client_phone_normalized=sa.bindparam('digits')),
+            updates,
+        )
+
+    dialect = bind.dialect.name
+    for statement in SQLITE_FTS if dialect == 'sqlite' else POSTGRES_FTS if dialect == 'postgresql' else []:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for name in ('interactions_fts_ai', 'interactions_fts_ad', 'interactions_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+        op.execute('DROP TABLE IF EXISTS interactions_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_interactions_search_vector')
+        op.execute('ALTER TABLE interactions DROP COLUMN IF EXISTS search_vector')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('interactions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_interactions_client_phone_normalized'))
+        batch_op.drop_column('client_phone_normalized')
+
+    # ### end Alembic commands ###
@@ -0,0 +1,99 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from config import Config
+from app import create_app, db, audit, clients, sla, stats
+from app.models import User, Interaction
+
+PASSWORD = 'senha'
+AGENTS = ('ana', 'bia', 'caio')
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+    CACHE_TYPE = 'NullCache'
+    JINJA_BYTECODE_CACHE_DIR = None
+    BCRYPT_LOG_ROUNDS = 4
+
+
+@pytest.fixture
+def make_app():
+    """Fábrica de aplicações de teste com banco em memória; `overrides` entra na configuração."""
+    contexts = []
+
+    def factory(**overrides):
+        config = type('Config', (TestConfig,), overrides)
+        app = create_app(config)
+        context = app.app_context()
+        context.push()
+        db.create_all()
+        contexts.append(context)
+        return app
+
+    yield factory
+    for context in reversed(contexts):
+        db.session.remove()
+        db.drop_all()
+        context.pop()
+
+
+@pytest.fixture
+def populate():
+    """Cria o supervisor 'admin', os atendentes AGENTS e `interactions` atendimentos pelo ORM.
+
+    Os atendimentos se espalham pelas últimas horas (alguns caem no dia anterior)
+    e são gravados como em index(): cliente, histórico, agregados e tempos por
+    status. Retorna {username: user_id}.
+    """
+    def factory(interactions=50, agents=AGENTS):
+        users = [User(username='admin', is_supervisor=True)] + [User(username=name) for name in agents]
+        for user in users:
+            user.set_password(PASSWORD)
+        db.session.add_all(users)
+        db.session.commit()
+        agent_ids = [user.id for user in users[1:]]
+        rnd = random.Random(1)
+        now = datetime.now()
+        for i in range(interactions):
+            name, phone = f'Cliente {i % 17}', f'(11) 9{i % 17:04d}-{i % 17:04d}'
+            interaction = Interaction(
+                user_id=rnd.choice(agent_ids),
+                client_name=name,
+                client_phone=phone,
+                channel='WhatsApp',
+                category=rnd.choice(['Suporte', 'Dúvida Técnica']),
+                description=f'impressora travou no caixa {i}',
+                status=rnd.choice(['Aberto', 'Em Andamento', 'Resolvido', 'Pendente']),
+                had_anydesk_session=rnd.random() < 0.3,
+                start_time=now - timedelta(hours=i % 30, minutes=i),
+                client=clients.resolve(name, phone),
+            )
+            db.session.add(interaction)
+            db.session.flush()
+            audit.record(interaction, interaction.user_id, 'status', 'N/A', interaction.status)
+            stats.record_created(interaction)
+            sla.record_created(interaction)
+        db.session.commit()
+        return {user.username: user.id for user in users}
+
+    return factory
+
+
+@pytest.fixture
+def login():
+    """Entra com `username` (senha PASSWORD) no cliente de teste e o devolve."""
+    def factory(client, username='admin'):
+        response = client.post('/login', data={'username': username, 'password': PASSWORD})
+        assert response.status_code == 302, response.status_code
+        return client
+
+    return factory
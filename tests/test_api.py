@@ -0,0 +1,101 @@
+import pytest
+
+from app import changes, db
+from app.models import Interaction
+
+FORM = dict(client_name='Cliente Novo', client_phone='(11) 91111-1111', channel='WhatsApp',
+            category='Suporte', description='sem sinal no caixa', status='Aberto')
+
+
+@pytest.fixture
+def admin(make_app, populate, login):
+    app = make_app()
+    populate(interactions=20)
+    return login(app.test_client())
+
+
+@pytest.mark.parametrize('url', ['/api/dashboard/stats', '/api/interactions', '/api/interactions?since=5'])
+def test_etag_answers_304_until_something_changes(admin, url):
+    first = admin.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    cached = admin.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert cached.data == b''
+
+    assert admin.post('/', data=FORM).status_code == 302
+    changed = admin.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_dashboard_stats_etag_is_per_day(admin):
+    today = admin.get('/api/dashboard/stats')
+    other_day = admin.get('/api/dashboard/stats?search_date=2020-01-01',
+                          headers={'If-None-Match': today.headers['ETag']})
+    assert other_day.status_code == 200
+    assert other_day.get_json()['total'] == 0
+
+
+def test_interactions_etag_ignores_changes_before_the_cursor(admin):
+    assert admin.post('/', data=FORM).status_code == 302
+    latest = changes.latest_change_id()
+    url = f'/api/interactions?since={latest}'
+    etag = admin.get(url).headers['ETag']
+    assert admin.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    body = admin.get(f'/api/interactions?since={latest - 1}').get_json()
+    assert [change['change_id'] for change in body['changes']] == [latest]
+    assert body['cursor'] == latest
+
+
+@pytest.mark.parametrize('payload', [
+    'não é json',
+    [1, 2],
+    {'action': 'delete', 'ids': 1},
+    {'action': 'delete', 'ids': '1,2'},
+    {'action': 'delete', 'ids': ['1', '2']},
+    {'action': 'delete', 'ids': [1, 2.5]},
+    {'action': 'delete', 'ids': [True, False]},
+    {'action': 'delete', 'ids': [1, None]},
+])
+def test_bulk_rejects_malformed_ids(admin, payload):
+    total = Interaction.query.count()
+    if isinstance(payload, str):
+        response = admin.post('/api/interactions/bulk', data=payload, content_type='application/json')
+    else:
+        response = admin.post('/api/interactions/bulk', json=payload)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    db.session.expire_all()
+    assert Interaction.query.count() == total
+
+
+@pytest.mark.parametrize('payload, error', [
+    ({'action': 'archive', 'ids': [1]}, 'Ação inválida'),
+    ({'action': 'status', 'ids': [1], 'status': 'Fechado'}, 'Status inválido'),
+    ({'action': 'reassign', 'ids': [1], 'user_id': 999}, 'Atendente inválido'),
+])
+def test_bulk_rejects_invalid_actions(admin, payload, error):
+    response = admin.post('/api/interactions/bulk', json=payload)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+def test_bulk_ignores_unknown_ids(admin):
+    response = admin.post('/api/interactions/bulk',
+                          json={'action': 'status', 'ids': [1, 2, 999999], 'status': 'Resolvido'})
+    assert response.status_code == 200
+    assert response.get_json()['matched'] == 2
+
+
+def test_api_is_for_supervisors_only(make_app, populate, login):
+    app = make_app()
+    populate(interactions=5)
+    agent = login(app.test_client(), 'ana')
+    assert agent.get('/api/dashboard/stats').status_code == 403
+    assert agent.get('/api/interactions').status_code == 403
+    assert agent.post('/api/interactions/bulk', json={'action': 'delete', 'ids': [1]}).status_code == 403
+    assert Interaction.query.count() == 5
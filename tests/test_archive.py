@@ -0,0 +1,54 @@
+from datetime import date, datetime, timedelta
+
+from app import archive, cache, caching, changes, dashboards, db, stats
+from app.models import Interaction, InteractionChange
+
+PAST_DAY = date.today() - timedelta(days=5)
+
+
+def _move_to_past_day(count):
+    """Leva `count` atendimentos resolvidos para PAST_DAY, como se fossem antigos."""
+    moved = Interaction.query.filter_by(status='Resolvido').order_by(Interaction.id).limit(count).all()
+    for interaction in moved:
+        interaction.start_time = datetime.combine(PAST_DAY, interaction.start_time.time())
+    db.session.commit()
+    stats.rebuild()
+    db.session.commit()
+    return sorted(interaction.id for interaction in moved)
+
+
+def test_archiving_logs_a_change_per_interaction(make_app, populate, login):
+    app = make_app()
+    populate(interactions=40)
+    ids = _move_to_past_day(5)
+    version = changes.day_version(PAST_DAY)
+    since = changes.latest_change_id()
+
+    assert archive.archive_before(date.today() - timedelta(days=1)) == len(ids)
+    logged = InteractionChange.query.filter(InteractionChange.id > since).all()
+    assert sorted(change.interaction_id for change in logged) == ids
+    assert {(change.action, change.day) for change in logged} == {('archived', PAST_DAY)}
+    assert changes.day_version(PAST_DAY) > version
+
+    body = login(app.test_client()).get(f'/api/interactions?since={since}').get_json()
+    assert [change['action'] for change in body['changes']] == ['archived'] * len(ids)
+    assert all(change['interaction'] is None for change in body['changes'])
+
+
+def test_archiving_invalidates_the_day_and_its_snapshot(make_app, populate):
+    make_app(CACHE_TYPE='app.caching.LRUCache')
+    populate(interactions=40)
+    ids = _move_to_past_day(5)
+    dashboards.build(PAST_DAY)
+    db.session.commit()
+    key = caching.make_key('admin_dashboard', PAST_DAY, 'supervisor')
+    cache.set(key, {'Resolvido': len(ids)})
+
+    archive.archive_before(date.today() - timedelta(days=1))
+    assert cache.get(key) is None
+    assert dashboards.get(PAST_DAY) is None
+
+    # Remontado, o snapshot lista os arquivados que os cartões contam
+    snapshot = dashboards.build(PAST_DAY)
+    assert sorted(row[0] for row in snapshot.rows) == ids
+    assert sum(snapshot.stats.values()) == len(ids)
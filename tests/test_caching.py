@@ -0,0 +1,44 @@
+from app import cache, caching, db
+from app.models import User
+
+CACHED = {'CACHE_TYPE': 'app.caching.LRUCache'}
+
+
+def _reports_key():
+    return caching.make_key('reports', None, 'supervisor')
+
+
+def test_renaming_an_agent_invalidates_reports(make_app, populate, login):
+    app = make_app(**CACHED)
+    users = populate()
+    client = login(app.test_client())
+    assert b'ana' in client.get('/admin/reports').data
+    assert cache.get(_reports_key()) is not None
+
+    response = client.post(f"/admin/user/{users['ana']}/edit", data={'username': 'ana_maria'})
+    assert response.status_code == 302
+    assert cache.get(_reports_key()) is None
+    assert b'ana_maria' in client.get('/admin/reports').data
+
+
+def test_promoting_an_agent_invalidates_reports(make_app, populate, login):
+    app = make_app(**CACHED)
+    users = populate()
+    client = login(app.test_client())
+    client.get('/admin/reports')
+    assert 'bia' in dict(cache.get(_reports_key())[1])
+
+    client.post(f"/admin/user/{users['bia']}/toggle_admin")
+    assert db.session.get(User, users['bia']).is_supervisor
+    response = client.get('/admin/reports')
+    assert response.status_code == 200
+    assert 'bia' not in dict(cache.get(_reports_key())[1])
+
+
+def test_unrelated_user_changes_keep_the_cache(make_app, populate):
+    make_app(**CACHED)
+    users = populate()
+    cache.set(_reports_key(), 'valor')
+    db.session.get(User, users['ana']).set_password('outra')
+    db.session.commit()
+    assert cache.get(_reports_key()) == 'valor'
@@ -0,0 +1,117 @@
+import socket
+import time
+
+import pytest
+
+from app import changes, events, events_server
+
+NEW = dict(client_name='Cliente Novo', client_phone='(11) 91111-2222', channel='WhatsApp',
+           category='Suporte', description='x', status='Aberto')
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    """Hub novo por teste: o do módulo guarda a aplicação na primeira assinatura."""
+    fresh = events.EventHub()
+    monkeypatch.setattr(events, 'hub', fresh)
+    return fresh
+
+
+def _event(event_id):
+    return {'id': event_id, 'event': 'created', 'data': {}}
+
+
+def test_overflowed_queue_becomes_a_resync(make_app, hub):
+    app = make_app(EVENTS_QUEUE_SIZE=3, EVENTS_POLL_INTERVAL=3600)
+    subscriber = hub.subscribe(app)
+    hub.publish([_event(1), _event(2)])
+    assert [event['id'] for event in hub.take(subscriber)] == [1, 2]
+    hub.publish([_event(i) for i in range(3, 8)])
+    assert hub.take(subscriber) == [events.resync_event(7)]
+    hub.publish([_event(8)])
+    assert [event['id'] for event in hub.take(subscriber)] == [8]
+    hub.unsubscribe(subscriber)
+
+
+def test_replay_too_long_becomes_a_resync(make_app, populate):
+    make_app()
+    populate(interactions=10)
+    latest = changes.latest_change_id()
+    assert [event['id'] for event in events.replay(latest - 3, limit=5)] == [latest - 2, latest - 1, latest]
+    assert events.replay(0, limit=5) == [events.resync_event(latest)]
+
+
+def test_thread_and_async_subscribers_have_separate_limits(make_app, hub):
+    app = make_app(EVENTS_MAX_SUBSCRIBERS=1, EVENTS_SERVER_MAX_SUBSCRIBERS=2, EVENTS_POLL_INTERVAL=3600)
+    assert hub.subscribe(app) is not None
+    assert hub.subscribe(app) is None
+    notify = lambda: None
+    assert hub.subscribe(app, notify) is not None
+    assert hub.subscribe(app, notify) is not None
+    assert hub.subscribe(app, notify) is None
+
+
+@pytest.fixture
+def server(make_app, populate, hub, tmp_path):
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/events.db', EVENTS_POLL_INTERVAL=0.05,
+                   EVENTS_HEARTBEAT=1)
+    populate(interactions=5)
+    started = events_server.start(app, '127.0.0.1', 0)
+    yield app, started
+    started.stop()
+
+
+def _open(server, cookie=None, last_event_id=None):
+    connection = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+    headers = [f'GET {events_server.EVENTS_PATH} HTTP/1.1', 'Host: localhost:5000', 'Origin: http://localhost:5000']
+    if cookie:
+        headers.append(f'Cookie: session={cookie}')
+    if last_event_id is not None:
+        headers.append(f'Last-Event-ID: {last_event_id}')
+    connection.sendall(('\r\n'.join(headers) + '\r\n\r\n').encode())
+    return connection
+
+
+def _read_until(connection, marker, timeout=5):
+    data, deadline = b'', time.monotonic() + timeout
+    while marker not in data and time.monotonic() < deadline:
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data.decode()
+
+
+def _session(app, login, username):
+    client = login(app.test_client(), username)
+    return client, client.get_cookie('session').value
+
+
+def test_server_requires_a_supervisor_session(server, login):
+    app, events_server_ = server
+    assert ' 401 ' in _read_until(_open(events_server_), b'}')
+    _, agent_cookie = _session(app, login, 'ana')
+    assert ' 403 ' in _read_until(_open(events_server_, agent_cookie), b'}')
+
+
+def test_server_streams_replay_and_new_events(server, login):
+    app, events_server_ = server
+    client, cookie = _session(app, login, 'admin')
+    latest = changes.latest_change_id()
+    connection = _open(events_server_, cookie, last_event_id=latest - 1)
+    head = _read_until(connection, f'id: {latest}\n'.encode())
+    assert head.startswith('HTTP/1.1 200 ')
+    assert 'Access-Control-Allow-Origin: http://localhost:5000' in head
+    assert 'retry: 3000' in head and f'id: {latest - 1}\n' not in head
+
+    assert client.post('/', data=NEW).status_code == 302
+    body = _read_until(connection, b'event: created')
+    assert 'event: created' in body and '"client_name": "Cliente Novo"' in body
+    connection.close()
+
+
+def test_dashboard_points_to_the_async_server(server, login):
+    app, events_server_ = server
+    client, _ = _session(app, login, 'admin')
+    html = client.get('/admin/dashboard').get_data(as_text=True)
+    assert f'http://localhost:{events_server_.port}/api/events' in html
@@ -0,0 +1,115 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.models import Interaction
+from app.query_budget import QueryBudgetExceeded
+
+BUDGET = 3
+
+
+def _with_queries_view(app):
+    """Rota de teste que executa `n` queries."""
+    def run_queries(n):
+        for _ in range(n):
+            db.session.execute(text('SELECT 1'))
+        return 'ok'
+    app.add_url_rule('/_queries/<int:n>', 'run_queries', run_queries)
+    return app
+
+
+def test_within_budget_reports_count(make_app):
+    client = _with_queries_view(make_app(QUERY_BUDGET=BUDGET)).test_client()
+    response = client.get('/_queries/2')
+    assert response.status_code == 200
+    assert response.headers['X-Query-Count'] == '2'
+
+
+def test_over_budget_fails_in_testing(make_app):
+    client = _with_queries_view(make_app(QUERY_BUDGET=BUDGET)).test_client()
+    with pytest.raises(QueryBudgetExceeded, match='run_queries executou 5 queries'):
+        client.get('/_queries/5')
+
+
+def test_over_budget_fails_in_debug(make_app):
+    app = _with_queries_view(make_app(QUERY_BUDGET=BUDGET, TESTING=False))
+    app.debug = True
+    with pytest.raises(QueryBudgetExceeded):
+        app.test_client().get('/_queries/5')
+
+
+def test_over_budget_only_logs_in_production(make_app, caplog):
+    app = _with_queries_view(make_app(QUERY_BUDGET=BUDGET, TESTING=False, DEBUG=False))
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = app.test_client().get('/_queries/5')
+    assert response.status_code == 200
+    assert response.headers['X-Query-Count'] == '5'
+    assert 'run_queries executou 5 queries (orçamento: 3)' in caplog.text
+
+
+def test_counter_resets_per_request(make_app):
+    client = _with_queries_view(make_app(QUERY_BUDGET=BUDGET)).test_client()
+    # Juntas passariam do orçamento; cada requisição conta só as suas
+    for _ in range(3):
+        response = client.get('/_queries/2')
+        assert response.headers['X-Query-Count'] == '2'
+
+
+def test_disabled_without_budget(make_app):
+    client = _with_queries_view(make_app(QUERY_BUDGET=None)).test_client()
+    response = client.get('/_queries/10')
+    assert response.status_code == 200
+    assert 'X-Query-Count' not in response.headers
+
+
+# Orçamento das páginas principais; não depende da quantidade de atendimentos listados
+PAGE_BUDGET = 5
+
+
+def _pages(users):
+    interaction_id = Interaction.query.filter_by(user_id=users['ana']).first().id
+    return [
+        ('ana', '/'),
+        ('admin', '/admin/dashboard'),
+        ('admin', '/admin/all_interactions'),
+        ('admin', f"/admin/user/{users['ana']}"),
+        ('admin', f'/interaction/{interaction_id}/view'),
+        ('ana', f'/interaction/{interaction_id}/view'),
+    ]
+
+
+@pytest.mark.parametrize('interactions', [10, 50])
+def test_pages_stay_within_budget(make_app, populate, login, interactions):
+    app = make_app(QUERY_BUDGET=PAGE_BUDGET)
+    users = populate(interactions=interactions)
+    clients = {username: login(app.test_client(), username) for username in ('admin', 'ana')}
+    for username, url in _pages(users):
+        response = clients[username].get(url)
+        assert response.status_code == 200, url
+        assert int(response.headers['X-Query-Count']) <= PAGE_BUDGET, url
+
+
+def test_streamed_page_is_checked_when_closed(make_app, populate, login):
+    app = make_app(QUERY_BUDGET=PAGE_BUDGET)
+    populate(interactions=10)
+    client = login(app.test_client())
+    response = client.get('/admin/all_interactions?stream=1')
+    assert response.status_code == 200
+    assert 'X-Query-Count' not in response.headers
+    assert b'#1<' in response.get_data()
+    response.close()
+
+
+def test_streamed_page_counts_queries_run_while_streaming(make_app, populate, login, caplog):
+    # Até o after_request só roda a lista de usuários dos filtros; a dos atendimentos roda no stream
+    app = make_app(QUERY_BUDGET=1, TESTING=False, DEBUG=False)
+    populate(interactions=10)
+    client = login(app.test_client())
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = client.get('/admin/all_interactions?stream=1')
+        assert 'executou' not in caplog.text
+        response.get_data()
+        response.close()
+    assert 'main.all_interactions executou 2 queries (orçamento: 1)' in caplog.text
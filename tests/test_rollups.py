@@ -0,0 +1,66 @@
+from app import db, sla, stats
+from app.models import (Interaction, InteractionDailyStats, InteractionDailyTotals, InteractionDurationStats,
+                        InteractionStatusTime)
+
+FORM = dict(client_name='Cliente Novo', client_phone='(11) 91111-1111', channel='WhatsApp',
+            category='Suporte', description='sem sinal no caixa')
+
+
+def _snapshot():
+    """Agregados e tempos por status como estão no banco (linhas zeradas não contam)."""
+    db.session.expire_all()
+    return {
+        'daily_stats': sorted((s.day, s.user_id, s.status, s.category, s.channel, s.had_anydesk_session, s.total)
+                              for s in InteractionDailyStats.query if s.total),
+        'daily_totals': sorted((t.day, t.user_id, t.category, t.total, t.resolved, t.anydesk)
+                               for t in InteractionDailyTotals.query if t.total),
+        'durations': sorted((h.day, h.user_id, h.category, h.status, h.bucket, h.total)
+                            for h in InteractionDurationStats.query if h.total),
+        'status_times': sorted((t.interaction_id, t.status, round(t.seconds, 3))
+                               for t in InteractionStatusTime.query),
+    }
+
+
+def _ids(status=None, limit=None):
+    query = Interaction.query.order_by(Interaction.id)
+    if status is not None:
+        query = query.filter_by(status=status)
+    return [interaction.id for interaction in query.limit(limit)]
+
+
+def test_incremental_rollups_match_a_rebuild(make_app, populate, login):
+    app = make_app()
+    users = populate(interactions=60)
+    admin = login(app.test_client())
+    stats.rebuild()
+    sla.rebuild()
+    db.session.commit()
+
+    # Criação, edições com troca de status e categoria, exclusão
+    assert admin.post('/', data=dict(FORM, status='Aberto')).status_code == 302
+    created = db.session.query(db.func.max(Interaction.id)).scalar()
+    for status in ('Em Andamento', 'Pendente', 'Resolvido'):
+        response = admin.post(f'/interaction/{created}/edit', data=dict(FORM, status=status, category='Dúvida Técnica'))
+        assert response.status_code == 302
+    assert admin.post(f'/interaction/{_ids("Aberto", 1)[0]}/delete').status_code == 302
+
+    # Ações em massa: status, troca de atendente e exclusão
+    for payload in ({'action': 'status', 'ids': _ids('Aberto', 5), 'status': 'Resolvido'},
+                    {'action': 'status', 'ids': _ids('Resolvido', 3), 'status': 'Em Andamento'},
+                    {'action': 'reassign', 'ids': _ids('Pendente', 6), 'user_id': users['bia']},
+                    {'action': 'delete', 'ids': _ids('Em Andamento', 4)}):
+        response = admin.post('/api/interactions/bulk', json=payload)
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()['affected'] > 0
+
+    # Exclusão de um atendente leva os atendimentos dele
+    assert admin.post(f'/admin/user/{users["caio"]}/delete').status_code == 302
+    assert Interaction.query.filter_by(user_id=users['caio']).count() == 0
+
+    incremental = _snapshot()
+    stats.rebuild()
+    sla.rebuild()
+    db.session.commit()
+    rebuilt = _snapshot()
+    for table in incremental:
+        assert incremental[table] == rebuilt[table], table
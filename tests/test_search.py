@@ -0,0 +1,98 @@
+import pytest
+
+from app import search
+from app.models import Interaction
+
+NEW = dict(client_name='Joaquim Açaí', client_phone='+55 (21) 98888-7777', channel='WhatsApp',
+           category='Suporte', description='leitor de código de barras sem sinal', status='Aberto')
+
+
+@pytest.fixture
+def searchable(make_app, populate, login):
+    """Aplicação com o índice de busca criado antes dos atendimentos e um supervisor logado."""
+    app = make_app()
+    search.ensure_index()
+    populate(interactions=40)
+    return login(app.test_client())
+
+
+def _ids(q, **kwargs):
+    return [interaction.id for interaction in search.search_interactions(q, **kwargs)[0]]
+
+
+def _new_id():
+    return Interaction.query.order_by(Interaction.id.desc()).first().id
+
+
+def test_created_interaction_is_indexed(searchable):
+    assert searchable.post('/', data=NEW).status_code == 302
+    new_id = _new_id()
+    assert _ids('acai') == [new_id]
+    assert _ids('leitor barras') == [new_id]
+
+
+def test_edited_interaction_is_reindexed(searchable):
+    searchable.post('/', data=NEW)
+    new_id = _new_id()
+    edited = dict(NEW, client_name='Joana Prado', description='balança não imprime etiqueta')
+    assert searchable.post(f'/interaction/{new_id}/edit', data=edited).status_code == 302
+    assert _ids('joaquim') == []
+    assert _ids('leitor') == []
+    assert _ids('joana') == [new_id]
+    assert _ids('etiqueta') == [new_id]
+
+
+def test_deleted_interaction_leaves_the_index(searchable):
+    searchable.post('/', data=NEW)
+    new_id = _new_id()
+    assert searchable.post(f'/interaction/{new_id}/delete').status_code == 302
+    assert _ids('acai') == []
+
+
+def test_phone_prefix_and_suffix(searchable):
+    searchable.post('/', data=NEW)
+    new_id = _new_id()
+    for q in ('21 9888', '(21) 98888-77', '+55 21 98888', '021988887777'):
+        assert new_id in _ids(q), q
+    for q in ('7777', '8-7777', '988887777'):
+        assert new_id in _ids(q), q
+    assert new_id not in _ids('8888')
+
+
+def test_phone_search_orders_by_recency(searchable):
+    expected = [i.id for i in Interaction.query.filter(Interaction.client_phone_normalized.like('1190003%'))
+                .order_by(Interaction.start_time.desc())]
+    assert expected
+    assert _ids('11 90003', per_page=100) == expected
+
+
+def test_pages_past_the_rank_window_keep_older_matches(searchable, monkeypatch):
+    monkeypatch.setattr(search, 'RANK_WINDOW', 7)
+    everything = {i.id for i in Interaction.query}
+    ranked = _ids('impressora', per_page=7)
+    assert len(ranked) == 7
+    # As sete do ranking são as de maior id; as páginas seguintes vêm por id decrescente
+    assert set(ranked) == set(sorted(everything)[-7:])
+    seen, page = list(ranked), 2
+    while True:
+        results, has_next = search.search_interactions('impressora', page=page, per_page=7)
+        seen += [interaction.id for interaction in results]
+        if not has_next:
+            break
+        page += 1
+    assert len(seen) == len(set(seen)) and set(seen) == everything
+    assert seen[7:] == sorted(seen[7:], reverse=True)
+
+
+def test_pages_across_the_window_boundary(searchable, monkeypatch):
+    monkeypatch.setattr(search, 'RANK_WINDOW', 10)
+    first, _ = search.search_interactions('impressora', page=1, per_page=6)
+    second, _ = search.search_interactions('impressora', page=2, per_page=6)
+    ids = [i.id for i in first + second]
+    assert len(ids) == len(set(ids)) == 12
+
+
+def test_search_restricted_to_an_agent(searchable):
+    agent_id = Interaction.query.first().user_id
+    ids = _ids('impressora', per_page=100, user_id=agent_id)
+    assert ids and all(i.user_id == agent_id for i in Interaction.query.filter(Interaction.id.in_(ids)))
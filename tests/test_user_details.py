@@ -0,0 +1,37 @@
+import re
+
+from app.models import Interaction
+
+
+def _ids(html):
+    return [int(i) for i in re.findall(r'<td>#(\d+)</td>', html)]
+
+
+def _next_page(html):
+    match = re.search(r'href="([^"]*cursor=[^"]*)" class="btn btn-outline-primary btn-sm "', html)
+    return match.group(1).replace('&amp;', '&') if match else None
+
+
+def test_listing_is_paginated_by_cursor(make_app, populate, login):
+    app = make_app()
+    users = populate(interactions=60)
+    client = login(app.test_client())
+    expected = [i.id for i in Interaction.query.filter_by(user_id=users['ana'])
+                .order_by(Interaction.start_time.desc(), Interaction.id.desc())]
+    assert len(expected) > 10
+
+    seen, url = [], f"/admin/user/{users['ana']}?per_page=10"
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        page = _ids(html)
+        assert 0 < len(page) <= 10
+        seen.extend(page)
+        url = _next_page(html)
+    assert seen == expected
+
+
+def test_counts_are_labelled_as_including_archived(make_app, populate, login):
+    app = make_app()
+    users = populate(interactions=10)
+    html = login(app.test_client()).get(f"/admin/user/{users['bia']}").get_data(as_text=True)
+    assert 'com arquivados' in html